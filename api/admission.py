@@ -0,0 +1,147 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+# Request classes, in dispatch priority order
+CHEAP = 0  # /health, /track served from cache
+NORMAL = 1  # /track cache miss, /recommendations
+EXPENSIVE = 2  # /prompt_recommendations (Groq + Spotify)
+
+CLASS_NAMES = {CHEAP: 'cheap', NORMAL: 'normal', EXPENSIVE: 'expensive'}
+
+
+class Overloaded(Exception):
+    """The server is at capacity; the client should retry after ``retry_after`` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ('priority', 'granted')
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.granted = threading.Event()
+
+
+class AdmissionController:
+    """Bounds concurrent request work and sheds load before requests pile up.
+
+    At most ``max_in_flight`` normal and expensive requests run at once, and
+    expensive ones may take at most ``max_expensive`` of those slots. Requests
+    over the limit wait in a bounded queue, normal before expensive; a request
+    is refused with Overloaded when the queue is full, when its estimated wait
+    already exceeds ``max_queue_wait``, or when it actually waits that long.
+    Cheap requests skip the queue and have ``max_cheap`` slots of their own, so
+    health checks and cached lookups keep answering while expensive work backs up.
+    """
+
+    def __init__(self, max_in_flight: int = 16, max_expensive: int = None, max_cheap: int = 32,
+                 max_queue: int = 32, max_queue_wait: float = 2.0):
+        self.max_in_flight = max_in_flight
+        self.max_expensive = max_expensive or max(1, max_in_flight // 2)
+        self.max_cheap = max_cheap
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self._in_flight = {CHEAP: 0, NORMAL: 0, EXPENSIVE: 0}
+        self._queues = {NORMAL: deque(), EXPENSIVE: deque()}
+        self._service_time = 0.5  # EWMA seconds per admitted non-cheap request
+        self._lock = threading.Lock()
+        self.rejected = {name: 0 for name in CLASS_NAMES.values()}
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionController':
+        max_expensive = int(os.getenv('ADMISSION_MAX_EXPENSIVE', '0')) or None
+        return cls(
+            max_in_flight=int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '16')),
+            max_expensive=max_expensive,
+            max_cheap=int(os.getenv('ADMISSION_MAX_CHEAP', '32')),
+            max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', '32')),
+            max_queue_wait=float(os.getenv('ADMISSION_MAX_QUEUE_WAIT_S', '2.0')),
+        )
+
+    def _can_run(self, priority: int) -> bool:
+        running = self._in_flight[NORMAL] + self._in_flight[EXPENSIVE]
+        if running >= self.max_in_flight:
+            return False
+        return priority != EXPENSIVE or self._in_flight[EXPENSIVE] < self.max_expensive
+
+    def _queued(self) -> int:
+        return len(self._queues[NORMAL]) + len(self._queues[EXPENSIVE])
+
+    def _retry_after(self, waiting: int) -> int:
+        return max(1, math.ceil(waiting * self._service_time / self.max_in_flight))
+
+    def _reject(self, priority: int, reason: str, waiting: int) -> Overloaded:
+        self.rejected[CLASS_NAMES[priority]] += 1
+        return Overloaded(reason, self._retry_after(waiting))
+
+    def acquire(self, priority: int) -> None:
+        """Take a slot, waiting in the queue if needed; raises Overloaded instead of waiting too long."""
+        with self._lock:
+            if priority == CHEAP:
+                if self._in_flight[CHEAP] >= self.max_cheap:
+                    raise self._reject(priority, "too many requests in flight", 1)
+                self._in_flight[CHEAP] += 1
+                return
+            # Normal requests only wait behind other normal requests
+            ahead = len(self._queues[NORMAL]) if priority == NORMAL else self._queued()
+            if not ahead and self._can_run(priority):
+                self._in_flight[priority] += 1
+                return
+            if self._queued() >= self.max_queue:
+                raise self._reject(priority, "request queue is full", ahead + 1)
+            estimated_wait = (ahead + 1) * self._service_time / self.max_in_flight
+            if estimated_wait > self.max_queue_wait:
+                raise self._reject(priority, "estimated queue wait too long", ahead + 1)
+            ticket = _Ticket(priority)
+            self._queues[priority].append(ticket)
+
+        if ticket.granted.wait(self.max_queue_wait):
+            return
+        with self._lock:
+            if ticket.granted.is_set():
+                return
+            self._queues[priority].remove(ticket)
+            raise self._reject(priority, "timed out waiting for capacity", self._queued() + 1)
+
+    def release(self, priority: int, held_for: float = None) -> None:
+        with self._lock:
+            self._in_flight[priority] -= 1
+            if priority != CHEAP and held_for is not None:
+                self._service_time = 0.8 * self._service_time + 0.2 * held_for
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        for priority in (NORMAL, EXPENSIVE):
+            queue = self._queues[priority]
+            while queue and self._can_run(priority):
+                ticket = queue.popleft()
+                self._in_flight[priority] += 1
+                ticket.granted.set()
+
+    @contextmanager
+    def slot(self, priority: int):
+        self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(priority, time.monotonic() - start)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": {CLASS_NAMES[p]: n for p, n in self._in_flight.items()},
+                "queued": {CLASS_NAMES[p]: len(q) for p, q in self._queues.items()},
+                "max_in_flight": self.max_in_flight,
+                "service_time_s": round(self._service_time, 3),
+                "rejected": dict(self.rejected),
+            }
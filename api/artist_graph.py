@@ -0,0 +1,191 @@
+import heapq
+import math
+import threading
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from records import ArtistRecord, intern_str
+
+# Edge weights, stored as one unsigned byte per edge
+PROFILE_WEIGHT = 255  # the genre is on the artist's Spotify profile
+COOCCURRENCE_WEIGHT = 128  # the artist came back from a search for the genre
+
+
+class ArtistGraph:
+    """Related-artist graph built from artists the engine has already fetched.
+
+    Artists and genres are the two kinds of node, and each artist-genre edge
+    is weighted by where it came from: the artist's own profile genres, or
+    co-occurrence with the genre's other artists in a genre search. Two
+    artists are related through every genre they share, so the artist-artist
+    edge weight is implicit in the two adjacency lists rather than stored,
+    which keeps updates linear in the artist's genre count instead of in the
+    genre's size.
+
+    Adjacency is kept as per-node ``array`` buffers (genre ids and byte
+    weights per artist, artist ids and byte weights per genre) rather than
+    dicts of objects. At most ``max_artists`` artists are kept; past that,
+    known artists are still updated but new ones are ignored.
+
+    An optional precomputed ``neighbours`` table (ArtistNeighbours, built
+    offline from a crawl) is consulted before the walk, so a seed's related
+    artists can be known before this process has fetched any of them.
+    """
+
+    def __init__(self, max_artists: int = 20000, max_genre_scan: int = 200, neighbours=None):
+        self.max_artists = max_artists
+        self.max_genre_scan = max_genre_scan
+        self.neighbours = neighbours
+        self._artist_ids: Dict[str, int] = {}
+        self._records: List[ArtistRecord] = []
+        self._artist_genres: List[array] = []  # genre ids per artist
+        self._artist_weights: List[array] = []
+        self._genre_ids: Dict[str, int] = {}
+        self._genre_names: List[str] = []
+        self._members: List[array] = []  # artist ids per genre
+        self._member_weights: List[array] = []
+        self._edges = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _artist_node(self, record: ArtistRecord) -> Optional[int]:
+        node = self._artist_ids.get(record.id)
+        if node is not None:
+            self._records[node] = record  # newer popularity and image
+            return node
+        if not record.id or len(self._records) >= self.max_artists:
+            return None
+        node = len(self._records)
+        self._artist_ids[record.id] = node
+        self._records.append(record)
+        self._artist_genres.append(array('I'))
+        self._artist_weights.append(array('B'))
+        return node
+
+    def _genre_node(self, genre: str) -> int:
+        genre_id = self._genre_ids.get(genre)
+        if genre_id is None:
+            genre_id = len(self._genre_names)
+            self._genre_ids[genre] = genre_id
+            self._genre_names.append(intern_str(genre))
+            self._members.append(array('I'))
+            self._member_weights.append(array('B'))
+        return genre_id
+
+    def _link(self, node: int, genre: str, weight: int) -> None:
+        genre_id = self._genre_node(genre)
+        genres = self._artist_genres[node]
+        try:
+            position = genres.index(genre_id)
+        except ValueError:
+            genres.append(genre_id)
+            self._artist_weights[node].append(weight)
+            self._members[genre_id].append(node)
+            self._member_weights[genre_id].append(weight)
+            self._edges += 1
+            return
+        if weight > self._artist_weights[node][position]:
+            self._artist_weights[node][position] = weight
+            self._member_weights[genre_id][self._members[genre_id].index(node)] = weight
+
+    def add_artist(self, record: ArtistRecord) -> None:
+        """Add or refresh an artist and link it to its profile genres."""
+        with self._lock:
+            node = self._artist_node(record)
+            if node is None:
+                return
+            for genre in record.genres:
+                self._link(node, genre, PROFILE_WEIGHT)
+
+    def add_search_results(self, genre: str, records: Iterable[ArtistRecord]) -> None:
+        """Link every artist a genre search returned to that genre (and to their own genres)."""
+        with self._lock:
+            for record in records:
+                node = self._artist_node(record)
+                if node is None:
+                    continue
+                for profile_genre in record.genres:
+                    self._link(node, profile_genre, PROFILE_WEIGHT)
+                self._link(node, genre, COOCCURRENCE_WEIGHT)
+
+    def _precomputed_related(self, seed: ArtistRecord, genres: Sequence[str], k: int,
+                             min_popularity: int, max_popularity: int,
+                             lookup: Optional[Callable[[str], Optional[ArtistRecord]]]) -> List[Tuple[ArtistRecord, str]]:
+        """The seed's neighbours from the offline table, in table order, whose records are known here or to ``lookup``."""
+        related = []
+        for artist_id, _ in self.neighbours.neighbours(seed.id):
+            with self._lock:
+                node = self._artist_ids.get(artist_id)
+                record = self._records[node] if node is not None else None
+            if record is None and lookup is not None:
+                record = lookup(artist_id)
+            if record is None or not min_popularity <= (record.popularity or 0) <= max_popularity:
+                continue
+            label = next((genre for genre in genres if genre in record.genres), genres[0] if genres else None)
+            related.append((record, label))
+            if len(related) == k:
+                break
+        return related
+
+    def related(self, seed: ArtistRecord, genres: Sequence[str], k: int = 5,
+                min_popularity: int = 25, max_popularity: int = 75,
+                lookup: Optional[Callable[[str], Optional[ArtistRecord]]] = None) -> List[Tuple[ArtistRecord, str]]:
+        """The ``k`` artists most strongly connected to the seed through ``genres``.
+
+        If the precomputed neighbour table has ``k`` neighbours of the seed
+        that pass the popularity filter and whose records the graph or
+        ``lookup`` knows, those are returned, labelled with the first of
+        ``genres`` they share.
+
+        Otherwise, a two-step walk, seed -> genre -> artist: each genre
+        counts less the later it comes in ``genres`` and the more artists it
+        has, and only the ``max_genre_scan`` most recently linked artists of
+        each genre are visited. Candidates outside the popularity range are skipped, and
+        ties go to the artist closest to the seed's popularity. Each result
+        carries the genre that contributed most to it.
+        """
+        if self.neighbours is not None:
+            precomputed = self._precomputed_related(seed, genres, k, min_popularity, max_popularity, lookup)
+            if len(precomputed) >= k:
+                return precomputed
+        seed_popularity = seed.popularity or 0
+        scores: Dict[int, float] = {}
+        best_genre: Dict[int, Tuple[float, str]] = {}
+        with self._lock:
+            seed_node = self._artist_ids.get(seed.id)
+            for rank, genre in enumerate(genres):
+                genre_id = self._genre_ids.get(genre)
+                if genre_id is None:
+                    continue
+                members = self._members[genre_id]
+                weights = self._member_weights[genre_id]
+                genre_weight = 1.0 / ((rank + 1) * math.sqrt(len(members)))
+                for i in range(max(0, len(members) - self.max_genre_scan), len(members)):
+                    node = members[i]
+                    if node == seed_node:
+                        continue
+                    popularity = self._records[node].popularity or 0
+                    if not min_popularity <= popularity <= max_popularity:
+                        continue
+                    contribution = genre_weight * weights[i] / PROFILE_WEIGHT
+                    scores[node] = scores.get(node, 0.0) + contribution
+                    if contribution > best_genre.get(node, (0.0, None))[0]:
+                        best_genre[node] = (contribution, genre)
+            records = self._records
+            top = heapq.nlargest(
+                k, scores,
+                key=lambda node: (scores[node], -abs((records[node].popularity or 0) - seed_popularity), -node),
+            )
+            return [(records[node], best_genre[node][1]) for node in top]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "artists": len(self._records),
+                "genres": len(self._genre_names),
+                "edges": self._edges,
+                "max_artists": self.max_artists,
+                "precomputed": self.neighbours.snapshot() if self.neighbours is not None else None,
+            }
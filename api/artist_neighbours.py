@@ -0,0 +1,132 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'VCAN'
+FORMAT_VERSION = 1
+NO_NEIGHBOUR = 0xFFFFFFFF  # pads rows of artists with fewer than k neighbours
+
+# Layout (little-endian): header, an id reference per artist, count * k u32
+# neighbour indices, count * k f32 scores, then the UTF-8 string table.
+# magic, format, artist count, k, string table size
+_HEADER = struct.Struct('<4sHIII')
+# artist id (string ref)
+_ID_REF = struct.Struct('<IH')
+
+
+class NeighboursFormatError(Exception):
+    """The neighbour table is truncated or from an incompatible build."""
+
+
+def compile_neighbours(ids: Sequence[str], k: int, neighbours: bytes, scores: bytes) -> bytes:
+    """Encode neighbour rows built by tools/build_artist_neighbours.py.
+
+    ``ids`` must be sorted; ``neighbours`` and ``scores`` hold ``len(ids) * k``
+    little-endian u32 artist indices and f32 scores, row by row.
+    """
+    strings = bytearray()
+    refs = bytearray()
+    for artist_id in ids:
+        encoded = artist_id.encode('utf-8')
+        refs += _ID_REF.pack(len(strings), len(encoded))
+        strings += encoded
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(ids), k, len(strings))
+    return header + bytes(refs) + neighbours + scores + bytes(strings)
+
+
+class ArtistNeighbours:
+    """Read-only, memory-mapped table of each artist's precomputed related artists.
+
+    Built offline from a crawl (tools/build_artist_neighbours.py), so it
+    knows artists this process has never fetched. Artists are stored in id
+    order and found by binary search over the string table in place; only
+    the rows that are read are decoded.
+    """
+
+    def __init__(self, buffer, source: str = '<memory>'):
+        if len(buffer) < _HEADER.size:
+            raise NeighboursFormatError(f"{source}: truncated header")
+        magic, fmt, count, k, strings_size = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise NeighboursFormatError(f"{source}: not a version {FORMAT_VERSION} artist neighbour table")
+        self._refs_offset = _HEADER.size
+        self._neighbours_offset = self._refs_offset + count * _ID_REF.size
+        self._scores_offset = self._neighbours_offset + count * k * 4
+        self._strings_offset = self._scores_offset + count * k * 4
+        if len(buffer) < self._strings_offset + strings_size:
+            raise NeighboursFormatError(f"{source}: truncated table")
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._row = struct.Struct(f'<{k}I')
+        self._row_scores = struct.Struct(f'<{k}f')
+        self.source = source
+        self.artist_count = count
+        self.k = k
+
+    @classmethod
+    def open(cls, path: str) -> 'ArtistNeighbours':
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, source=path)
+
+    def __len__(self) -> int:
+        return self.artist_count
+
+    def _id_bytes(self, index: int) -> bytes:
+        offset, length = _ID_REF.unpack_from(self._buffer, self._refs_offset + index * _ID_REF.size)
+        start = self._strings_offset + offset
+        return bytes(self._view[start:start + length])
+
+    def _index(self, artist_id: str) -> Optional[int]:
+        # UTF-8 byte order is code point order, so the ids sort the same way as bytes
+        key = artist_id.encode('utf-8')
+        lo, hi = 0, self.artist_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._id_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.artist_count and self._id_bytes(lo) == key else None
+
+    def neighbours(self, artist_id: str) -> List[Tuple[str, float]]:
+        """(artist id, score) of the artist's related artists, most related first; [] if unknown."""
+        index = self._index(artist_id)
+        if index is None:
+            return []
+        rows = self._row.unpack_from(self._buffer, self._neighbours_offset + index * self._row.size)
+        scores = self._row_scores.unpack_from(self._buffer, self._scores_offset + index * self._row_scores.size)
+        return [(self._id_bytes(other).decode('utf-8'), score)
+                for other, score in zip(rows, scores) if other != NO_NEIGHBOUR]
+
+    def snapshot(self) -> Dict:
+        return {"artists": self.artist_count, "k": self.k, "source": self.source}
+
+
+_neighbours: Optional[ArtistNeighbours] = None
+_neighbours_loaded = False
+_neighbours_lock = threading.Lock()
+
+
+def load_neighbours() -> Optional[ArtistNeighbours]:
+    """The process-wide neighbour table at ARTIST_NEIGHBOURS_PATH, or None if unset or unreadable."""
+    global _neighbours, _neighbours_loaded
+    if _neighbours_loaded:
+        return _neighbours
+    with _neighbours_lock:
+        if not _neighbours_loaded:
+            path = os.getenv('ARTIST_NEIGHBOURS_PATH', '')
+            if path:
+                try:
+                    _neighbours = ArtistNeighbours.open(path)
+                    logger.info(f"Mapped artist neighbour table: {_neighbours.artist_count} artists, "
+                                f"k={_neighbours.k}")
+                except (OSError, ValueError, NeighboursFormatError) as e:
+                    logger.warning(f"Artist neighbour table unavailable ({e}); using the live graph only")
+            _neighbours_loaded = True
+    return _neighbours
@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from call_budget import CallBudget
+from circuit_breaker import CircuitOpenError
+from popularity import GENRE, PROMPT, SEED_ARTIST, PopularityTracker
+from records import RecordCache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """Keeps the most requested prompts, genres and seed artists in the engine's caches.
+
+    Runs once at startup (after loading the popularity snapshot a previous
+    process saved) and then every ``interval`` seconds. Entries that are
+    missing, or would expire before the next run, are fetched again, hottest
+    first, for as long as ``budget`` allows.
+    """
+
+    def __init__(self, engine, tracker: PopularityTracker, budget: CallBudget, interval: float = 300.0,
+                 top_n: int = 20, snapshot_path: Optional[str] = None):
+        self.engine = engine
+        self.tracker = tracker
+        self.budget = budget
+        self.interval = interval
+        self.top_n = top_n
+        self.snapshot_path = snapshot_path
+        self.last_run_at: Optional[float] = None
+        self.last_warmed = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        if self.snapshot_path and self.tracker.load(self.snapshot_path):
+            logger.info(f"Loaded popularity snapshot from {self.snapshot_path}")
+        while not self._stop.is_set():
+            try:
+                self.warm_once()
+            except Exception as e:
+                logger.warning(f"Cache warming failed: {type(e).__name__} - {e}")
+            if self.snapshot_path:
+                self.tracker.save(self.snapshot_path)
+            self._stop.wait(self.interval)
+
+    def _due(self, cache: RecordCache, key) -> bool:
+        """Missing, or expiring before the next run."""
+        expires_in = cache.expires_in(key)
+        if expires_in is None:
+            return key not in cache
+        return expires_in < self.interval
+
+    def warm_once(self) -> int:
+        """Refresh hot entries within the budget; returns how many upstream calls were made."""
+        warmed = self._warm_prompts() + self._warm_genres()
+        self.last_run_at = time.time()
+        self.last_warmed = warmed
+        if warmed:
+            logger.info(f"Cache warmer refreshed {warmed} hot entries")
+        return warmed
+
+    def _warm_prompts(self) -> int:
+        engine = self.engine
+        if not engine.groq_client:
+            return 0
+        warmed = 0
+        for prompt in self.tracker.top(PROMPT, self.top_n):
+            if not self._due(engine.prompt_genre_cache, engine.prompt_cache_key(prompt)):
+                continue
+            if not self.budget.try_spend():
+                break
+            # Writes prompt_genre_cache when Groq answers
+            engine._classify_genre_single(prompt)
+            warmed += 1
+        return warmed
+
+    def _warm_genres(self) -> int:
+        engine = self.engine
+        spotify_client = engine.spotify_client
+        if not spotify_client:
+            return 0
+        warmed = 0
+        genres: List[str] = self.tracker.top(GENRE, self.top_n)
+        fanout = max(1, int(os.getenv('RECOMMENDATION_GENRE_FANOUT', '1')))
+        try:
+            for artist_id in self.tracker.top(SEED_ARTIST, self.top_n):
+                artist = engine._cached_artist(artist_id)
+                if artist is None:
+                    if not self.budget.try_spend():
+                        return warmed
+                    warmed += 1
+                    artist = self._attempt(f"artist {artist_id}",
+                                           lambda: engine._get_artist_record(spotify_client, artist_id))
+                    if artist is None:
+                        continue
+                genres.extend(genre for genre in artist.genres[:fanout] if genre not in genres)
+
+            for genre in genres:
+                if not self._due(engine.genre_artist_cache, genre):
+                    continue
+                if not self.budget.try_spend():
+                    break
+                warmed += 1
+                self._attempt(f"genre '{genre}'",
+                              lambda: engine._search_genre_artists(spotify_client, genre, use_cache=False))
+        except CircuitOpenError as e:
+            logger.info(f"Cache warming paused: {e}")
+        return warmed
+
+    def _attempt(self, what: str, fetch):
+        """Run one warming fetch; failures are logged and skipped, open circuits stop the run."""
+        try:
+            return fetch()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.info(f"Cache warmer could not refresh {what}: {type(e).__name__} - {e}")
+            return None
+
+    def snapshot(self) -> Dict:
+        return {
+            "interval_s": self.interval,
+            "last_run_at": self.last_run_at,
+            "last_warmed": self.last_warmed,
+            "budget_remaining": round(self.budget.remaining(), 1),
+        }
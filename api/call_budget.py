@@ -0,0 +1,39 @@
+import threading
+import time
+
+
+class CallBudget:
+    """Token bucket limiting how many optional upstream calls background work may make.
+
+    Holds up to ``per_minute`` calls and refills continuously at that rate, so
+    a burst can spend the whole minute's allowance but no more.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self._tokens = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.spent = 0
+        self.denied = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.per_minute, self._tokens + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+    def try_spend(self, calls: int = 1) -> bool:
+        """Take ``calls`` from the budget; False (and nothing taken) if it can't cover them."""
+        with self._lock:
+            self._refill()
+            if self._tokens < calls:
+                self.denied += 1
+                return False
+            self._tokens -= calls
+            self.spent += calls
+            return True
+
+    def remaining(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
@@ -0,0 +1,57 @@
+import heapq
+from itertools import count
+from typing import Iterable, List, Sequence, Tuple
+
+from records import ArtistRecord
+
+# Weights of the two ranking signals; popularity closeness dominates
+POPULARITY_WEIGHT = 0.6
+GENRE_OVERLAP_WEIGHT = 0.4
+
+
+def candidate_score(candidate: ArtistRecord, seed_popularity: int, seed_genres: Sequence[str]) -> float:
+    """Rank a candidate artist by popularity closeness and genre overlap with the seed."""
+    closeness = 1.0 - abs((candidate.popularity or 0) - (seed_popularity or 0)) / 100.0
+    if seed_genres:
+        overlap = len(set(candidate.genres) & set(seed_genres)) / len(seed_genres)
+    else:
+        overlap = 0.0
+    return POPULARITY_WEIGHT * closeness + GENRE_OVERLAP_WEIGHT * overlap
+
+
+class TopCandidates:
+    """Bounded min-heap keeping the best ``k`` distinct candidates seen so far."""
+
+    def __init__(self, k: int, seed_popularity: int, seed_genres: Sequence[str]):
+        self.k = k
+        self.seed_popularity = seed_popularity
+        self.seed_genres = tuple(seed_genres)
+        self._heap: List[Tuple[float, int, ArtistRecord, str]] = []
+        self._seen = set()
+        self._order = count()
+
+    def offer(self, candidate: ArtistRecord, genre: str) -> None:
+        if candidate.id in self._seen:
+            return
+        self._seen.add(candidate.id)
+        # Earlier offers win ties, so the seed's primary genre keeps priority
+        entry = (candidate_score(candidate, self.seed_popularity, self.seed_genres), -next(self._order), candidate, genre)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def offer_all(self, candidates: Iterable[ArtistRecord], genre: str) -> None:
+        for candidate in candidates:
+            self.offer(candidate, genre)
+
+    @property
+    def full(self) -> bool:
+        return len(self._heap) >= self.k
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def ranked(self) -> List[Tuple[ArtistRecord, str]]:
+        """Best candidates first, each with the genre search that found it."""
+        return [(record, genre) for _, _, record, genre in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
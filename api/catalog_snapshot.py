@@ -0,0 +1,272 @@
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+
+from records import ArtistRecord, AudioFeatures, TrackRecord
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'VCCS'
+FORMAT_VERSION = 2
+NO_STRING = 0xFFFFFFFF  # string reference offset for None
+
+# magic, format, digest, track count, artist count, track index slots, artist index slots, string table size
+_HEADER = struct.Struct('<4sH16sIIIII')
+# id, name, artist, album, image prefix, image suffix, artist id (string refs),
+# tempo, energy, danceability, valence (doubles, so they read back exactly as Spotify
+# sent them; NaN when unknown), has-features flag
+_TRACK = struct.Struct('<' + 'IH' * 7 + '4dB')
+# id, name, genres ("\n"-joined), image prefix, image suffix (string refs), popularity
+_ARTIST = struct.Struct('<' + 'IH' * 5 + 'B')
+_SLOT = struct.Struct('<I')
+
+
+class SnapshotFormatError(Exception):
+    """The snapshot file is truncated or from an incompatible build."""
+
+
+def _slots_for(count: int) -> int:
+    """Hash index size: a power of two at least twice the record count."""
+    size = 1
+    while size < 2 * max(1, count):
+        size <<= 1
+    return size
+
+
+def _hash(key: bytes) -> int:
+    return zlib.crc32(key)
+
+
+def _image_parts(record) -> Tuple[Optional[str], Optional[str]]:
+    return record._image_prefix, record._image_suffix
+
+
+def compile_snapshot(tracks: Iterable[TrackRecord], artists: Iterable[ArtistRecord],
+                     features: Optional[Dict[str, AudioFeatures]] = None) -> bytes:
+    """Encode tracks, artists and audio features into the snapshot format.
+
+    Records are written in id order and repeated strings (artist names,
+    image URL prefixes, genres lists) are stored once, so the output is
+    deterministic and compact.
+    """
+    tracks = sorted({t.id: t for t in tracks if t.id}.values(), key=lambda t: t.id)
+    artists = sorted({a.id: a for a in artists if a.id}.values(), key=lambda a: a.id)
+    features = features or {}
+
+    strings = bytearray()
+    offsets: Dict[str, Tuple[int, int]] = {}
+
+    def ref(text: Optional[str]) -> Tuple[int, int]:
+        if text is None:
+            return NO_STRING, 0
+        if text not in offsets:
+            encoded = text.encode('utf-8')
+            if len(encoded) > 0xFFFF:
+                # Lengths are u16; cut on a character boundary so the string still decodes
+                encoded = encoded[:0xFFFF].decode('utf-8', 'ignore').encode('utf-8')
+            offsets[text] = (len(strings), len(encoded))
+            strings.extend(encoded)
+        return offsets[text]
+
+    body = bytearray()
+    for track in tracks:
+        found = features.get(track.id)
+        values = [math.nan] * 4
+        if found is not None:
+            values = [math.nan if v is None else v for v in (found.tempo, found.energy, found.danceability, found.valence)]
+        refs = [ref(track.id), ref(track.name), ref(track.artist), ref(track.album),
+                *map(ref, _image_parts(track)), ref(track.artist_id)]
+        body += _TRACK.pack(*(part for pair in refs for part in pair), *values, found is not None)
+    for artist in artists:
+        refs = [ref(artist.id), ref(artist.name), ref('\n'.join(artist.genres)), *map(ref, _image_parts(artist))]
+        body += _ARTIST.pack(*(part for pair in refs for part in pair), max(0, min(100, artist.popularity or 0)))
+
+    def index(records) -> bytes:
+        size = _slots_for(len(records))
+        slots = [0] * size
+        for position, record in enumerate(records):
+            slot = _hash(record.id.encode('utf-8')) & (size - 1)
+            while slots[slot]:
+                slot = (slot + 1) & (size - 1)
+            slots[slot] = position + 1
+        return struct.pack(f'<{size}I', *slots)
+
+    track_index = index(tracks)
+    artist_index = index(artists)
+    payload = bytes(body) + track_index + artist_index + bytes(strings)
+    digest = hashlib.sha256(payload).digest()[:16]
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, digest, len(tracks), len(artists),
+                          len(track_index) // _SLOT.size, len(artist_index) // _SLOT.size, len(strings))
+    return header + payload
+
+
+class SnapshotTrack:
+    """A track record read in place from the snapshot; fields are decoded on access."""
+
+    __slots__ = ('_snapshot', '_fields')
+
+    def __init__(self, snapshot: 'CatalogSnapshot', fields: tuple):
+        self._snapshot = snapshot
+        self._fields = fields
+
+    def _text(self, field: int) -> Optional[str]:
+        return self._snapshot._string(self._fields[2 * field], self._fields[2 * field + 1])
+
+    id = property(lambda self: self._text(0))
+    name = property(lambda self: self._text(1))
+    artist = property(lambda self: self._text(2))
+    album = property(lambda self: self._text(3))
+    artist_id = property(lambda self: self._text(6))
+
+    @property
+    def image_url(self) -> Optional[str]:
+        prefix = self._text(4)
+        return None if prefix is None else prefix + (self._text(5) or '')
+
+    def to_dict(self) -> Dict:
+        return TrackRecord.to_dict(self)
+
+
+class SnapshotArtist:
+    """An artist record read in place from the snapshot; fields are decoded on access."""
+
+    __slots__ = ('_snapshot', '_fields')
+
+    def __init__(self, snapshot: 'CatalogSnapshot', fields: tuple):
+        self._snapshot = snapshot
+        self._fields = fields
+
+    def _text(self, field: int) -> Optional[str]:
+        return self._snapshot._string(self._fields[2 * field], self._fields[2 * field + 1])
+
+    id = property(lambda self: self._text(0))
+    name = property(lambda self: self._text(1))
+    popularity = property(lambda self: self._fields[10])
+
+    @property
+    def genres(self) -> Tuple[str, ...]:
+        joined = self._text(2)
+        return tuple(joined.split('\n')) if joined else ()
+
+    @property
+    def image_url(self) -> Optional[str]:
+        prefix = self._text(3)
+        return None if prefix is None else prefix + (self._text(4) or '')
+
+    def to_dict(self, genre: str) -> Dict:
+        return ArtistRecord.to_dict(self, genre)
+
+
+class CatalogSnapshot:
+    """Read-only, memory-mapped catalogue of tracks, artists and audio features.
+
+    Every worker process maps the same file, so the OS keeps one copy of its
+    pages however many workers run. Lookups hash the id into an
+    open-addressing index and compare it against the string table in place;
+    records are returned as views that decode a field only when it is read,
+    rather than being copied into per-process caches.
+    """
+
+    def __init__(self, buffer, source: str = '<memory>'):
+        if len(buffer) < _HEADER.size:
+            raise SnapshotFormatError(f"{source}: truncated header")
+        (magic, fmt, digest, track_count, artist_count,
+         track_slots, artist_slots, strings_size) = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise SnapshotFormatError(f"{source}: not a version {FORMAT_VERSION} catalog snapshot")
+        self._tracks_offset = _HEADER.size
+        self._artists_offset = self._tracks_offset + track_count * _TRACK.size
+        self._track_index_offset = self._artists_offset + artist_count * _ARTIST.size
+        self._artist_index_offset = self._track_index_offset + track_slots * _SLOT.size
+        self._strings_offset = self._artist_index_offset + artist_slots * _SLOT.size
+        if len(buffer) < self._strings_offset + strings_size:
+            raise SnapshotFormatError(f"{source}: truncated snapshot")
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self.source = source
+        self.version = digest.hex()[:12]
+        self.track_count = track_count
+        self.artist_count = artist_count
+        self._track_slots = track_slots
+        self._artist_slots = artist_slots
+
+    @classmethod
+    def open(cls, path: str) -> 'CatalogSnapshot':
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, source=path)
+
+    def _string(self, offset: int, length: int) -> Optional[str]:
+        if offset == NO_STRING:
+            return None
+        start = self._strings_offset + offset
+        return str(self._view[start:start + length], 'utf-8')
+
+    def _find(self, key: str, slots: int, index_offset: int, records_offset: int, record_struct) -> Optional[tuple]:
+        if not slots or not key:
+            return None
+        encoded = key.encode('utf-8')
+        mask = slots - 1
+        slot = _hash(encoded) & mask
+        for _ in range(slots):
+            position = _SLOT.unpack_from(self._buffer, index_offset + slot * _SLOT.size)[0]
+            if not position:
+                return None
+            fields = record_struct.unpack_from(self._buffer, records_offset + (position - 1) * record_struct.size)
+            start = self._strings_offset + fields[0]
+            if fields[1] == len(encoded) and self._view[start:start + fields[1]] == encoded:
+                return fields
+            slot = (slot + 1) & mask
+        return None
+
+    def track(self, track_id: str) -> Optional[SnapshotTrack]:
+        fields = self._find(track_id, self._track_slots, self._track_index_offset, self._tracks_offset, _TRACK)
+        return None if fields is None else SnapshotTrack(self, fields)
+
+    def artist(self, artist_id: str) -> Optional[SnapshotArtist]:
+        fields = self._find(artist_id, self._artist_slots, self._artist_index_offset, self._artists_offset, _ARTIST)
+        return None if fields is None else SnapshotArtist(self, fields)
+
+    def features(self, track_id: str) -> Optional[AudioFeatures]:
+        fields = self._find(track_id, self._track_slots, self._track_index_offset, self._tracks_offset, _TRACK)
+        if fields is None or not fields[18]:
+            return None
+        values = [None if math.isnan(v) else v for v in fields[14:18]]
+        return AudioFeatures(*values)
+
+    def __contains__(self, track_id: str) -> bool:
+        return self.track(track_id) is not None
+
+    def snapshot(self) -> Dict:
+        return {"version": self.version, "tracks": self.track_count, "artists": self.artist_count,
+                "source": self.source}
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_snapshot_loaded = False
+_snapshot_lock = threading.Lock()
+
+
+def load_snapshot() -> Optional[CatalogSnapshot]:
+    """The process-wide catalog snapshot at CATALOG_SNAPSHOT_PATH, or None if unset or unreadable."""
+    global _snapshot, _snapshot_loaded
+    if _snapshot_loaded:
+        return _snapshot
+    with _snapshot_lock:
+        if not _snapshot_loaded:
+            path = os.getenv('CATALOG_SNAPSHOT_PATH', '')
+            if path:
+                try:
+                    _snapshot = CatalogSnapshot.open(path)
+                    logger.info(f"Mapped catalog snapshot {_snapshot.version}: "
+                                f"{_snapshot.track_count} tracks, {_snapshot.artist_count} artists")
+                except (OSError, ValueError, SnapshotFormatError) as e:
+                    logger.warning(f"Catalog snapshot unavailable ({e}); using the API only")
+            _snapshot_loaded = True
+    return _snapshot
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"circuit '{name}' is open; retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for one upstream endpoint class.
+
+    Closed: calls flow and outcomes fill a sliding window. Once the window holds
+    at least ``min_calls`` outcomes and the failure rate reaches
+    ``failure_rate``, the circuit opens and calls fail fast for
+    ``open_seconds``. Then it goes half-open and lets ``half_open_calls`` probe
+    calls through: one success closes it again, one failure re-opens it.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5,
+                 failure_rate: float = 0.5, open_seconds: float = 30.0, half_open_calls: int = 1):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # True for success
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Reserve a call slot or raise CircuitOpenError."""
+        with self._lock:
+            if self.state == OPEN:
+                elapsed = time.monotonic() - self._opened_at
+                if elapsed < self.open_seconds:
+                    raise CircuitOpenError(self.name, self.open_seconds - elapsed)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_calls:
+                    raise CircuitOpenError(self.name, 0.0)
+                self._half_open_in_flight += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._outcomes.clear()
+                self._transition(CLOSED)
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            if len(self._outcomes) >= self.min_calls and self._current_failure_rate() >= self.failure_rate:
+                self._open()
+
+    def release(self) -> None:
+        """Give back a half-open slot for a call whose outcome says nothing about upstream health."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._half_open_in_flight:
+                self._half_open_in_flight -= 1
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"Circuit '{self.name}' {self.state} -> {state}")
+        self.state = state
+        self._half_open_in_flight = 0
+
+    def _current_failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            snapshot = {
+                "state": self.state,
+                "calls_in_window": len(self._outcomes),
+                "failure_rate": round(self._current_failure_rate(), 3),
+            }
+            if self.state == OPEN:
+                snapshot["retry_in_s"] = round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1)
+            return snapshot
+
+
+class BreakerRegistry:
+    """Creates one breaker per upstream endpoint class on first use."""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name, **self.breaker_options))
+        return breaker
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {name: breaker.snapshot() for name, breaker in sorted(self._breakers.items())}
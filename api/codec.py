@@ -0,0 +1,109 @@
+import json
+import os
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib codec produces the same compact output
+    orjson = None
+
+# Request bodies larger than this are rejected with 413 before they are read
+MAX_BODY_BYTES = int(os.getenv('MAX_REQUEST_BODY_BYTES', '16384'))
+
+
+class RequestBodyError(Exception):
+    """A request body that can't be accepted; carries the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON bytes, ready to write to the socket."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dumps_pretty(obj: Any) -> str:
+    """Indented JSON text for log lines."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_json_body(handler, max_bytes: int = MAX_BODY_BYTES) -> Dict:
+    """Read and decode a JSON object request body.
+
+    Content-Length is checked before anything is read, so oversized bodies are
+    refused without buffering them. Raises RequestBodyError (400, 411 or 413).
+    """
+    raw_length = handler.headers.get('Content-Length')
+    if raw_length is None:
+        raise RequestBodyError(411, "Content-Length required")
+    try:
+        length = int(raw_length)
+    except ValueError:
+        raise RequestBodyError(400, "Invalid Content-Length")
+    if length < 0:
+        raise RequestBodyError(400, "Invalid Content-Length")
+    if length > max_bytes:
+        # The unread body would be parsed as the next request on a kept-alive connection
+        handler.close_connection = True
+        raise RequestBodyError(413, f"Request body exceeds {max_bytes} bytes")
+
+    body = handler.rfile.read(length)
+    if len(body) != length:
+        handler.close_connection = True
+        raise RequestBodyError(400, "Incomplete request body")
+    try:
+        data = loads(body)
+    except ValueError:  # covers JSONDecodeError and bad UTF-8 for both codecs
+        raise RequestBodyError(400, "Invalid JSON body")
+    if not isinstance(data, dict):
+        raise RequestBodyError(400, "JSON object required")
+    return data
+
+
+def read_query(handler) -> Dict[str, str]:
+    """Query-string parameters of a GET request; a repeated parameter keeps its last value."""
+    query = urlsplit(handler.path).query
+    return {name: values[-1] for name, values in parse_qs(query, keep_blank_values=True).items()}
+
+
+def optional_str(data: Dict, field: str) -> Optional[str]:
+    """An optional string field of a request body; raises RequestBodyError(400) if it isn't one."""
+    value = data.get(field)
+    if value is not None and not isinstance(value, str):
+        raise RequestBodyError(400, f"{field} must be a string")
+    return value
+
+
+def optional_int(data: Dict, field: str, minimum: int = None, text: bool = False) -> Optional[int]:
+    """An optional integer field of a request body; raises RequestBodyError(400) if it isn't one.
+
+    With ``text``, decimal strings are accepted too, for query-string parameters.
+    """
+    value = data.get(field)
+    if value is None:
+        return None
+    if text and isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            raise RequestBodyError(400, f"{field} must be an integer")
+    # bool is an int subclass, but true/false is not a count
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise RequestBodyError(400, f"{field} must be an integer")
+    if minimum is not None and value < minimum:
+        raise RequestBodyError(400, f"{field} must be at least {minimum}")
+    return value
@@ -0,0 +1,203 @@
+import contextvars
+import heapq
+import ipaddress
+import itertools
+import logging
+import math
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from admission import Overloaded
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_USER = 'background'
+# Batched Groq calls answer several users at once, so none of them is charged
+BATCH_USER = 'batch'
+
+# Who the current request's upstream calls are attributed to. Threads that
+# never set it (prefetch, cache warming) count as background work.
+current_user = contextvars.ContextVar('current_user', default=BACKGROUND_USER)
+
+
+def _parse_networks(spec: str) -> List:
+    networks = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(part, strict=False))
+        except ValueError:
+            logger.warning(f"Ignoring invalid TRUSTED_PROXIES entry: {part!r}")
+    return networks
+
+
+# Reverse proxies (addresses or CIDR networks) whose X-Forwarded-For is
+# believed. Empty by default: the header is client-controlled, so it is
+# ignored unless the socket peer is one of these.
+TRUSTED_PROXIES = _parse_networks(os.getenv('TRUSTED_PROXIES', ''))
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_address(handler) -> str:
+    """The caller's address: the socket peer, unless that peer is a trusted proxy.
+
+    Behind trusted proxies, X-Forwarded-For is read from the right and the
+    first hop that is not itself a trusted proxy is the client; entries to
+    its left were written by the client and are ignored.
+    """
+    peer = handler.client_address[0]
+    if not _is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for hop in (handler.headers.get('X-Forwarded-For') or '').split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+def peer_key(address: Optional[str]) -> str:
+    """Scheduling key shared by every unauthenticated request from one address."""
+    return f"ip:{address or 'unknown'}"
+
+
+def verified_user_key(user_id: str) -> str:
+    """Scheduling key of a Spotify user whose token has been checked with Spotify."""
+    return f"user:{user_id}"
+
+
+def bind_request_user(handler) -> str:
+    """Attribute this request thread's upstream calls to the caller's address.
+
+    A token in the request is not trusted here: the engine moves the request
+    to the token owner's key once Spotify has confirmed who that is.
+    """
+    key = peer_key(client_address(handler))
+    current_user.set(key)
+    return key
+
+
+class SchedulerTimeout(Overloaded):
+    """No upstream slot became free within the scheduler's max wait; answered with 503."""
+
+
+class _Waiter:
+    __slots__ = ('user', 'granted')
+
+    def __init__(self, user: str):
+        self.user = user
+        self.granted = threading.Event()
+
+
+class FairScheduler:
+    """Weighted fair queuing of upstream calls across users.
+
+    At most ``slots`` calls run at once, and one user may hold at most
+    ``max_per_user`` of them. When calls have to wait, a free slot goes to the
+    waiting call with the smallest virtual finish tag. Each call advances its
+    user's tag by ``1 / weight``, so under contention every active user gets a
+    share of calls proportional to their weight, however many requests they
+    send.
+    """
+
+    def __init__(self, name: str, slots: int = 8, max_per_user: Optional[int] = None,
+                 weights: Optional[Dict[str, float]] = None, max_wait: Optional[float] = None):
+        self.name = name
+        self.slots = slots
+        self.max_per_user = max_per_user or max(1, slots // 2)
+        self.weights = weights or {}
+        self.max_wait = max_wait
+        self._running = 0
+        self._running_by_user: Dict[str, int] = {}
+        self._finish_tags: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._queue = []  # (finish_tag, seq, waiter)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _can_run(self, user: str) -> bool:
+        return self._running < self.slots and self._running_by_user.get(user, 0) < self.max_per_user
+
+    def _start(self, user: str) -> None:
+        self._running += 1
+        self._running_by_user[user] = self._running_by_user.get(user, 0) + 1
+
+    def _tag(self, user: str) -> float:
+        start = max(self._virtual_time, self._finish_tags.get(user, 0.0))
+        finish = start + 1.0 / self.weights.get(user, 1.0)
+        self._finish_tags[user] = finish
+        return finish
+
+    def acquire(self, user: str) -> None:
+        waiter = _Waiter(user)
+        with self._lock:
+            heapq.heappush(self._queue, (self._tag(user), next(self._seq), waiter))
+            # Runs at once if a slot is free and nobody with a lower tag may use it
+            self._dispatch()
+        if waiter.granted.wait(self.max_wait):
+            return
+        with self._lock:
+            if waiter.granted.is_set():  # granted just as the wait timed out
+                return
+            self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+            heapq.heapify(self._queue)
+        raise SchedulerTimeout(f"no {self.name} slot free within {self.max_wait}s",
+                               retry_after=max(1, math.ceil(self.max_wait)))
+
+    def release(self, user: str) -> None:
+        with self._lock:
+            self._running -= 1
+            remaining = self._running_by_user.get(user, 1) - 1
+            if remaining:
+                self._running_by_user[user] = remaining
+            else:
+                self._running_by_user.pop(user, None)
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the waiters with the lowest finish tags that may run."""
+        skipped = []
+        while self._queue and self._running < self.slots:
+            tag, seq, waiter = heapq.heappop(self._queue)
+            if not self._can_run(waiter.user):
+                skipped.append((tag, seq, waiter))
+                continue
+            self._virtual_time = max(self._virtual_time, tag - 1.0 / self.weights.get(waiter.user, 1.0))
+            self._start(waiter.user)
+            waiter.granted.set()
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        if not self._queue and not self._running:
+            # Idle: forget per-user history so it can't grow without bound
+            self._finish_tags.clear()
+        elif len(self._finish_tags) > 4096:
+            # Tags behind virtual time carry no priority; drop them
+            self._finish_tags = {u: t for u, t in self._finish_tags.items() if t > self._virtual_time}
+
+    @contextmanager
+    def slot(self, user: Optional[str] = None):
+        user = user or current_user.get()
+        self.acquire(user)
+        try:
+            yield
+        finally:
+            self.release(user)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "running": self._running,
+                "queued": len(self._queue),
+                "active_users": len(self._running_by_user),
+            }
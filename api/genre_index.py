@@ -0,0 +1,165 @@
+import re
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+# Model answers that mean "no genre"; they are rejected rather than searched for
+REJECTED_ANSWERS = {
+    '', '0', 'none', 'null', 'nil', 'n/a', 'na', 'unknown', 'no genre', 'nothing', 'other', 'misc', 'various',
+}
+
+# Words that don't change which genre is meant ("indie rock music", "the blues genre")
+FILLER_TOKENS = {'music', 'genre', 'genres', 'style', 'the', 'of', 'songs', 'song'}
+
+_SEPARATORS = re.compile(r"[\s_\-/]+")
+_STRIP = re.compile(r"[^a-z0-9&' ]+")
+_MEMO_LIMIT = 4096
+MAX_EDIT_DISTANCE = 2
+
+
+def _key(text: str) -> str:
+    """Lowercase, separators folded to single spaces, punctuation dropped."""
+    return _STRIP.sub('', _SEPARATORS.sub(' ', text.lower())).strip()
+
+
+def _compact(key: str) -> str:
+    return key.replace(' ', '').replace("'", '')
+
+
+def _token_set(key: str) -> Tuple[str, ...]:
+    return tuple(sorted(set(key.split()) - FILLER_TOKENS))
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or ``limit + 1`` as soon as it must exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            current.append(value)
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    """``word`` with up to ``depth`` characters removed, including ``word`` itself."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - variants
+        variants |= frontier
+    return variants
+
+
+class GenreIndex:
+    """Maps free-form model output onto a canonical genre, or rejects it.
+
+    Lookups try, in order: an exact match of the folded name, a known alias,
+    the same words in any order (ignoring filler like "music"), the closest
+    spelling within a small edit distance, and finally a canonical genre whose
+    words all appear in the answer. Misspellings are found through an index of
+    every canonical name with up to two characters deleted, so a lookup is a
+    few dozen dict probes rather than a scan. Nothing here touches the network,
+    and answers are memoized.
+
+    ``aliases`` maps other spellings to genre names; aliases for genres not in
+    ``genres`` are ignored.
+    """
+
+    def __init__(self, genres: Iterable[str], aliases: Optional[Dict[str, str]] = None):
+        self.genres = tuple(sorted(set(genres)))
+        by_folded = {_key(genre): genre for genre in self.genres}
+
+        self._exact: Dict[str, str] = {}
+        self._by_tokens: Dict[Tuple[str, ...], str] = {}
+        for key, genre in by_folded.items():
+            self._exact[key] = genre
+            self._exact[_compact(key)] = genre
+            self._by_tokens.setdefault(_token_set(key), genre)
+        for alias, target in (aliases or {}).items():
+            genre = by_folded.get(_key(target))
+            if genre is not None:
+                self._exact.setdefault(_key(alias), genre)
+                self._exact.setdefault(_compact(_key(alias)), genre)
+
+        # Longest first, so "indie rock" beats "rock" when both appear in an answer
+        self._token_sets = sorted(
+            ((tokens, genre) for tokens, genre in self._by_tokens.items() if tokens),
+            key=lambda item: -len(item[0]),
+        )
+        self._spelling = {_compact(key): genre for key, genre in by_folded.items()}
+        self._near: Dict[str, Set[str]] = {}
+        for spelling in self._spelling:
+            for variant in _deletes(spelling, MAX_EDIT_DISTANCE):
+                self._near.setdefault(variant, set()).add(spelling)
+        self._memo: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.genres)
+
+    def canonical(self, text: Optional[str]) -> Optional[str]:
+        """The canonical genre ``text`` names, or None if it names none of them."""
+        if not text:
+            return None
+        cached = self._memo.get(text, self)
+        if cached is not self:
+            return cached
+        genre = self._lookup(text)
+        with self._lock:
+            if len(self._memo) >= _MEMO_LIMIT:
+                self._memo.clear()
+            self._memo[text] = genre
+        return genre
+
+    def _lookup(self, text: str) -> Optional[str]:
+        # Models sometimes add a second guess or an explanation after the answer
+        first = re.split(r'[,;\n(]| - ', text.strip(), maxsplit=1)[0]
+        key = _key(first.strip(' ."`'))
+        if key in REJECTED_ANSWERS:
+            return None
+
+        genre = self._exact.get(key) or self._exact.get(_compact(key))
+        if genre:
+            return genre
+
+        tokens = _token_set(key)
+        if not tokens:
+            return None
+        genre = self._by_tokens.get(tokens)
+        if genre:
+            return genre
+        unfiltered = ' '.join(tokens)
+        genre = self._exact.get(unfiltered) or self._exact.get(_compact(unfiltered))
+        if genre:
+            return genre
+
+        genre = self._closest_spelling(_compact(unfiltered))
+        if genre:
+            return genre
+
+        present = set(tokens)
+        for genre_tokens, genre in self._token_sets:
+            if present.issuperset(genre_tokens):
+                return genre
+        return None
+
+    def _closest_spelling(self, compact: str) -> Optional[str]:
+        if len(compact) < 4:
+            return None  # too short to correct reliably
+        max_distance = 1 if len(compact) <= 6 else MAX_EDIT_DISTANCE
+        candidates = set()
+        for variant in _deletes(compact, max_distance):
+            candidates |= self._near.get(variant, set())
+        best = None
+        for candidate in sorted(candidates):
+            distance = edit_distance(compact, candidate, max_distance)
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, candidate)
+        return self._spelling[best[1]] if best else None
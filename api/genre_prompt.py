@@ -0,0 +1,109 @@
+import re
+from functools import cached_property, lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from genre_index import GenreIndex
+from genre_registry import load_registry
+
+_BATCH_LINE = re.compile(r'^\s*(\d+)\s*[:.)=-]\s*(.*)$')
+_PROMPT_PUNCTUATION = re.compile(r'[^\w\s&\'-]+')
+_WHITESPACE = re.compile(r'\s+')
+
+class GenreCatalogue:
+    """Genre list compiled once into a compact, code-numbered Groq prompt.
+
+    Each genre gets a short numeric code so the catalogue costs roughly one
+    token per genre name plus the code, instead of a quoted Python list repr.
+    The model may answer with either the code or the genre name.
+    """
+
+    def __init__(self, genres: Iterable[str]):
+        self.genres = tuple(sorted(set(genres)))
+        self._by_code = {str(code): genre for code, genre in enumerate(self.genres, 1)}
+        self._by_name = {genre.lower(): genre for genre in self.genres}
+        encoded = ';'.join(f"{code}={genre}" for code, genre in enumerate(self.genres, 1))
+        self.prompt_prefix = (
+            "Pick the one music genre that best fits the request.\n"
+            f"Genres (code=name): {encoded}\n"
+            "Reply with the code only. Reply 0 if nothing fits.\n"
+            "Request: "
+        )
+        self.batch_prompt_prefix = (
+            "Pick the one music genre that best fits each numbered request.\n"
+            f"Genres (code=name): {encoded}\n"
+            "Reply with one line per request as <request number>:<genre code>. Use 0 if nothing fits.\n"
+            "Requests:\n"
+        )
+
+    def __len__(self) -> int:
+        return len(self.genres)
+
+    @cached_property
+    def index(self) -> GenreIndex:
+        """Canonicalization index over this catalogue's genres, built on first use."""
+        return GenreIndex(self.genres, load_registry().aliases())
+
+    def build_prompt(self, user_prompt: str) -> str:
+        return self.prompt_prefix + user_prompt.strip().replace('\n', ' ')
+
+    def build_batch_prompt(self, user_prompts: List[str]) -> str:
+        lines = [f"{i}. {p.strip().replace(chr(10), ' ')}" for i, p in enumerate(user_prompts, 1)]
+        return self.batch_prompt_prefix + '\n'.join(lines)
+
+    def parse_batch(self, content: Optional[str], count: int) -> Dict[int, Optional[str]]:
+        """Parse '<n>:<code>' lines into {request index: genre}.
+
+        Requests the model did not answer are absent from the result.
+        """
+        answers = {}
+        for line in (content or '').splitlines():
+            match = _BATCH_LINE.match(line)
+            if not match:
+                continue
+            index = int(match.group(1)) - 1
+            if 0 <= index < count and index not in answers:
+                answers[index] = self.parse(match.group(2))
+        return answers
+
+    def match_in_text(self, text: Optional[str]) -> Optional[str]:
+        """Local fallback classifier: the longest genre named verbatim in the text."""
+        if not text:
+            return None
+        haystack = f" {re.sub(r'[^a-z0-9&]+', ' ', text.lower())} "
+        best = None
+        for name, genre in self._by_name.items():
+            needle = f" {re.sub(r'[^a-z0-9&]+', ' ', name)} "
+            if needle in haystack and (best is None or len(name) > len(best.lower())):
+                best = genre
+        return best
+
+    def parse(self, content: Optional[str]) -> Optional[str]:
+        """Map a model answer (code, name, or a "code=name" pair in either order) to a genre.
+
+        Returns None for "no genre" answers and for anything that can't be
+        resolved to one of the catalogue's genres.
+        """
+        if not content:
+            return None
+        answer = content.strip().split('\n')[0].strip(' ."\'`')
+        # Models echo catalogue entries as "code=name" or, less often, "name=code"
+        parts = [part.strip() for part in answer.split('=')]
+        for part in parts:
+            if part in self._by_code:
+                return self._by_code[part]
+        for part in parts:
+            genre = self.index.canonical(part)
+            if genre is not None:
+                return genre
+        return None
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Cache key for a free-text prompt: case, punctuation and spacing don't change the genre."""
+    return _WHITESPACE.sub(' ', _PROMPT_PUNCTUATION.sub(' ', prompt.lower())).strip()
+
+
+@lru_cache(maxsize=32)
+def compile_catalogue(genres: FrozenSet[str]) -> GenreCatalogue:
+    """Compile (and memoize) a catalogue for an arbitrary genre set."""
+    return GenreCatalogue(genres)
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_PATH = os.path.join(API_DIR, 'genres.bin')
+GENRES_SOURCE = os.path.join(API_DIR, 'genres.json')
+METADATA_SOURCE = os.path.join(API_DIR, 'genre_metadata.json')
+
+MAGIC = b'VCGR'
+FORMAT_VERSION = 2
+
+# magic, format, digest, genre count, alias count, string table offset, string table size
+_HEADER = struct.Struct('<4sH16sIIII')
+# display name, lowercase name, Spotify search term, keywords: (offset, length) into the string table
+_GENRE = struct.Struct('<IHIHIHIH')
+# alias (offset, length), genre id
+_ALIAS = struct.Struct('<IHH')
+
+
+class RegistryFormatError(Exception):
+    """The registry file is missing, truncated or from an incompatible build."""
+
+
+def compile_registry(genres: Iterable[str], aliases: Optional[Mapping[str, str]] = None,
+                     search_terms: Optional[Mapping[str, str]] = None,
+                     keywords: Optional[Mapping[str, str]] = None) -> bytes:
+    """Encode genres, aliases, search terms and descriptive keywords into the binary registry format.
+
+    Genre ids are positions in lowercase-name order, and the output is
+    byte-for-byte deterministic for the same input.
+    """
+    by_lower = {}
+    for genre in genres:
+        by_lower.setdefault(genre.lower(), genre)
+    lowers = sorted(by_lower)
+    ids = {lower: genre_id for genre_id, lower in enumerate(lowers)}
+    terms = {name.lower(): term for name, term in (search_terms or {}).items()}
+    words = {name.lower(): text for name, text in (keywords or {}).items()}
+    alias_ids = {}
+    for alias, target in (aliases or {}).items():
+        genre_id = ids.get(target.lower())
+        if genre_id is None:
+            logger.warning(f"Skipping alias '{alias}': unknown genre '{target}'")
+            continue
+        alias_ids.setdefault(alias.lower(), genre_id)
+
+    strings = bytearray()
+    offsets: Dict[str, Tuple[int, int]] = {}
+
+    def ref(text: str) -> Tuple[int, int]:
+        if text not in offsets:
+            encoded = text.encode('utf-8')
+            offsets[text] = (len(strings), len(encoded))
+            strings.extend(encoded)
+        return offsets[text]
+
+    body = bytearray()
+    for lower in lowers:
+        body += _GENRE.pack(*ref(by_lower[lower]), *ref(lower), *ref(terms.get(lower, lower)), *ref(words.get(lower, '')))
+    for alias in sorted(alias_ids):
+        body += _ALIAS.pack(*ref(alias), alias_ids[alias])
+
+    strings_offset = _HEADER.size + len(body)
+    digest = hashlib.sha256(bytes(body) + bytes(strings)).digest()[:16]
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, digest, len(lowers), len(alias_ids), strings_offset, len(strings))
+    return header + bytes(body) + bytes(strings)
+
+
+def compile_sources(genres_path: str = GENRES_SOURCE, metadata_path: str = METADATA_SOURCE) -> bytes:
+    """Compile the registry from genres.json and genre_metadata.json."""
+    with open(genres_path, 'r') as f:
+        data = json.load(f)
+    genres = data.get('categories', []) if isinstance(data, dict) else data
+    try:
+        with open(metadata_path, 'r') as f:
+            extras = json.load(f)
+    except FileNotFoundError:
+        extras = {}
+    return compile_registry(genres, extras.get('aliases'), extras.get('search_terms'), extras.get('keywords'))
+
+
+class GenreRegistry:
+    """Read-only view of a compiled genre registry.
+
+    Opening one only validates the header; names are decoded from the
+    underlying buffer on demand, so an mmap'd registry costs a page or two of
+    shared memory until it is used. ``version`` is a digest of the contents
+    and changes whenever genres, aliases, search terms or keywords do.
+    """
+
+    def __init__(self, buffer, source: str = '<memory>'):
+        if len(buffer) < _HEADER.size:
+            raise RegistryFormatError(f"{source}: truncated header")
+        magic, fmt, digest, genre_count, alias_count, strings_offset, strings_size = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise RegistryFormatError(f"{source}: not a version {FORMAT_VERSION} genre registry")
+        expected = _HEADER.size + genre_count * _GENRE.size + alias_count * _ALIAS.size
+        if strings_offset != expected or len(buffer) < strings_offset + strings_size:
+            raise RegistryFormatError(f"{source}: truncated registry")
+        self._buffer = buffer
+        self.source = source
+        self.version = digest.hex()[:12]
+        self._genre_count = genre_count
+        self._alias_count = alias_count
+        self._aliases_offset = _HEADER.size + genre_count * _GENRE.size
+        self._strings_offset = strings_offset
+        self._genres: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def open(cls, path: str = REGISTRY_PATH) -> 'GenreRegistry':
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, source=path)
+
+    def __len__(self) -> int:
+        return self._genre_count
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return self._buffer[start:start + length].decode('utf-8')
+
+    def _genre_field(self, genre_id: int, field: int) -> str:
+        if not 0 <= genre_id < self._genre_count:
+            raise IndexError(f"genre id {genre_id} out of range")
+        fields = _GENRE.unpack_from(self._buffer, _HEADER.size + genre_id * _GENRE.size)
+        return self._string(fields[2 * field], fields[2 * field + 1])
+
+    def display_name(self, genre_id: int) -> str:
+        return self._genre_field(genre_id, 0)
+
+    def lower_name(self, genre_id: int) -> str:
+        return self._genre_field(genre_id, 1)
+
+    def search_term(self, genre_id: int) -> str:
+        return self._genre_field(genre_id, 2)
+
+    def keywords(self, genre_id: int) -> str:
+        """Words describing the genre's mood and settings, for prompt matching."""
+        return self._genre_field(genre_id, 3)
+
+    def _alias(self, index: int) -> Tuple[str, int]:
+        offset, length, genre_id = _ALIAS.unpack_from(self._buffer, self._aliases_offset + index * _ALIAS.size)
+        return self._string(offset, length), genre_id
+
+    def find(self, name: str, aliases: bool = True) -> Optional[int]:
+        """Genre id for a name (or alias), case-insensitively; None if unknown."""
+        key = name.strip().lower()
+        lo, hi = 0, self._genre_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            lower = self.lower_name(mid)
+            if lower == key:
+                return mid
+            if lower < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if not aliases:
+            return None
+        lo, hi = 0, self._alias_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            alias, genre_id = self._alias(mid)
+            if alias == key:
+                return genre_id
+            if alias < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    @property
+    def genres(self) -> Tuple[str, ...]:
+        """Display names, in genre id order."""
+        if self._genres is None:
+            self._genres = tuple(self.display_name(i) for i in range(self._genre_count))
+        return self._genres
+
+    def aliases(self) -> Dict[str, str]:
+        """Alias -> display name."""
+        pairs = (self._alias(i) for i in range(self._alias_count))
+        return {alias: self.display_name(genre_id) for alias, genre_id in pairs}
+
+    def search_term_for(self, genre: str) -> str:
+        """Spotify search term for a registry genre; other genre strings are used as-is.
+
+        Aliases are not followed: Spotify's own genre names (from artist
+        profiles) must be searched for verbatim.
+        """
+        genre_id = self.find(genre, aliases=False)
+        return genre if genre_id is None else self.search_term(genre_id)
+
+    def snapshot(self) -> Dict:
+        return {"version": self.version, "genres": self._genre_count, "aliases": self._alias_count}
+
+
+_registry: Optional[GenreRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def load_registry() -> GenreRegistry:
+    """The process-wide registry, opened once and shared by every engine and handler.
+
+    Falls back to compiling genres.json in memory when genres.bin is missing
+    or unreadable, so a checkout without the build step still works.
+    """
+    global _registry
+    if _registry is not None:
+        return _registry
+    with _registry_lock:
+        if _registry is None:
+            path = os.getenv('GENRE_REGISTRY_PATH', REGISTRY_PATH)
+            try:
+                _registry = GenreRegistry.open(path)
+            except (OSError, ValueError, RegistryFormatError) as e:
+                logger.warning(f"Genre registry unavailable ({e}); compiling {GENRES_SOURCE} instead")
+                _registry = GenreRegistry(compile_sources(), source=GENRES_SOURCE)
+            logger.info(f"Loaded genre registry {_registry.version} with {len(_registry)} genres.")
+    return _registry
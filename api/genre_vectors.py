@@ -0,0 +1,140 @@
+import math
+import re
+import threading
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+DIMENSIONS = 1 << 20  # hashed feature buckets
+TRIGRAM_WEIGHT = 0.1  # character trigrams relative to whole words
+NAME_WEIGHT = 2.0  # a genre's own name and aliases relative to its keywords
+
+# Below this similarity a prompt has nothing in common with any genre (trigram noise)
+SHORTLIST_MIN_SCORE = 0.1
+# Similarity needed to answer from the shortlist alone, without the model
+FALLBACK_MIN_SCORE = 0.2
+
+_TOKEN = re.compile(r"[a-z0-9&']+")
+_STOPWORDS = {
+    'a', 'an', 'and', 'the', 'for', 'to', 'of', 'in', 'on', 'at', 'with', 'my', 'me', 'i', 'some', 'something',
+    'music', 'songs', 'song', 'play', 'playlist', 'give', 'want', 'need', 'like', 'vibe', 'vibes', 'mood',
+    'feel', 'feeling', 'good', 'really', 'very', 'while', 'during', 'that', 'this', 'is', 'it', 'be',
+}
+
+
+def _bucket(feature: str) -> int:
+    # crc32 rather than hash(): buckets must not change with PYTHONHASHSEED
+    return zlib.crc32(feature.encode('utf-8')) % DIMENSIONS
+
+
+def features(text: str, weight: float = 1.0) -> Dict[int, float]:
+    """Hashed bag of words plus character trigrams, so "drive" still meets "driving"."""
+    counts: Dict[int, float] = {}
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        bucket = _bucket('w:' + token)
+        counts[bucket] = counts.get(bucket, 0.0) + weight
+        if len(token) > 2:
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                bucket = _bucket('g:' + padded[i:i + 3])
+                counts[bucket] = counts.get(bucket, 0.0) + weight * TRIGRAM_WEIGHT
+    return counts
+
+
+class GenreVectors:
+    """TF-IDF weighted hashing-trick embeddings of every genre, for shortlisting.
+
+    Each genre is embedded from its name, aliases and descriptive keywords
+    into a sparse, L2-normalized vector over ``DIMENSIONS`` hashed buckets.
+    The genre matrix is stored as an inverted index (bucket -> genre ids and
+    weights in ``array`` buffers), so the cosine similarity of a prompt
+    against every genre costs one pass over the prompt's non-zero buckets.
+    """
+
+    def __init__(self, documents: Mapping[str, Iterable[Tuple[str, float]]]):
+        self.genres = tuple(sorted(documents))
+        counts = []
+        document_frequency: Dict[int, int] = {}
+        for genre in self.genres:
+            vector: Dict[int, float] = {}
+            for text, weight in documents[genre]:
+                for bucket, value in features(text, weight).items():
+                    vector[bucket] = vector.get(bucket, 0.0) + value
+            counts.append(vector)
+            for bucket in vector:
+                document_frequency[bucket] = document_frequency.get(bucket, 0) + 1
+
+        total = len(self.genres)
+        self._idf = {bucket: math.log((1 + total) / (1 + df)) + 1.0 for bucket, df in document_frequency.items()}
+        postings: Dict[int, Tuple[array, array]] = {}
+        for genre_id, vector in enumerate(counts):
+            weighted = {bucket: value * self._idf[bucket] for bucket, value in vector.items()}
+            norm = math.sqrt(sum(value * value for value in weighted.values())) or 1.0
+            for bucket, value in weighted.items():
+                ids, weights = postings.setdefault(bucket, (array('H'), array('f')))
+                ids.append(genre_id)
+                weights.append(value / norm)
+        self._postings = postings
+
+    @classmethod
+    def from_registry(cls, registry) -> 'GenreVectors':
+        aliases: Dict[str, List[str]] = {}
+        for alias, genre in registry.aliases().items():
+            aliases.setdefault(genre, []).append(alias)
+        documents = {}
+        for genre_id, genre in enumerate(registry.genres):
+            texts = [(genre, NAME_WEIGHT)] + [(alias, NAME_WEIGHT) for alias in aliases.get(genre, ())]
+            texts.append((registry.keywords(genre_id), 1.0))
+            documents[genre] = texts
+        return cls(documents)
+
+    def __len__(self) -> int:
+        return len(self.genres)
+
+    def similarities(self, text: str) -> Dict[int, float]:
+        """Cosine similarity of ``text`` with every genre it shares a bucket with, by genre id."""
+        query = {bucket: value * self._idf[bucket] for bucket, value in features(text).items() if bucket in self._idf}
+        norm = math.sqrt(sum(value * value for value in query.values()))
+        scores: Dict[int, float] = {}
+        if not norm:
+            return scores
+        for bucket, value in query.items():
+            ids, weights = self._postings[bucket]
+            value /= norm
+            for genre_id, weight in zip(ids, weights):
+                scores[genre_id] = scores.get(genre_id, 0.0) + value * weight
+        return scores
+
+    def shortlist(self, text: str, k: int, within: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Up to ``k`` (genre, similarity) pairs, best first; genres with no overlap are left out.
+
+        ``within`` restricts the result to a subset of genres.
+        """
+        allowed = None if within is None else set(within)
+        ranked = sorted(self.similarities(text).items(), key=lambda item: (-item[1], item[0]))
+        result = []
+        for genre_id, score in ranked:
+            genre = self.genres[genre_id]
+            if allowed is not None and genre not in allowed:
+                continue
+            result.append((genre, score))
+            if len(result) >= k:
+                break
+        return result
+
+
+_vectors: Dict[str, GenreVectors] = {}
+_vectors_lock = threading.Lock()
+
+
+def vectors_for(registry) -> GenreVectors:
+    """Genre embeddings for a registry, computed once per registry version and process."""
+    vectors = _vectors.get(registry.version)
+    if vectors is None:
+        with _vectors_lock:
+            vectors = _vectors.get(registry.version)
+            if vectors is None:
+                vectors = _vectors[registry.version] = GenreVectors.from_registry(registry)
+    return vectors
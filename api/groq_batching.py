@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingPrompt:
+    __slots__ = ('prompt', 'wake', 'lead', 'answered', 'genre', 'error')
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.wake = threading.Event()
+        self.lead = False  # set when promoted to lead the next batch
+        self.answered = False
+        self.genre = None
+        self.error: Optional[Exception] = None
+
+
+class GenreBatcher:
+    """Collects concurrent genre lookups into one Groq completion.
+
+    The first caller to arrive becomes the batch leader: it waits up to
+    ``window_ms`` (or until ``max_batch`` prompts are queued), sends one
+    structured completion for the whole batch and hands every caller its
+    answer. Prompts the batch call did not answer fall back to individual
+    ``classify_single`` calls. If the batch call raises, every caller in
+    the batch gets that exception: retrying each prompt alone would only
+    multiply calls to an upstream that just failed.
+    """
+
+    def __init__(
+        self,
+        classify_batch: Callable[[List[str]], Dict[int, Optional[str]]],
+        classify_single: Callable[[str], Optional[str]],
+        window_ms: float = 10,
+        max_batch: int = 8,
+        max_prompt_chars: int = 500,
+    ):
+        self.classify_batch = classify_batch
+        self.classify_single = classify_single
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_prompt_chars = max_prompt_chars
+        self._lock = threading.Condition()
+        self._queue: List[_PendingPrompt] = []
+        self._leader_active = False
+
+    def submit(self, prompt: str) -> Optional[str]:
+        if len(prompt) > self.max_prompt_chars or self.max_batch <= 1:
+            # Oversized prompts would crowd the shared completion; classify alone
+            return self.classify_single(prompt)
+
+        pending = _PendingPrompt(prompt)
+        with self._lock:
+            self._queue.append(pending)
+            is_leader = not self._leader_active
+            if is_leader:
+                self._leader_active = True
+            elif len(self._queue) >= self.max_batch:
+                self._lock.notify_all()
+
+        if not is_leader:
+            pending.wake.wait()
+            if pending.lead:
+                pending.wake.clear()
+                is_leader = True
+        if is_leader:
+            self._lead()
+            pending.wake.wait()
+
+        if pending.error is not None:
+            raise pending.error
+        if not pending.answered:
+            return self.classify_single(prompt)
+        return pending.genre
+
+    def _lead(self) -> None:
+        deadline = time.monotonic() + self.window
+        with self._lock:
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            batch = self._queue[:self.max_batch]
+            del self._queue[:self.max_batch]
+            if self._queue:
+                # Hand leadership to the oldest prompt still waiting
+                self._queue[0].lead = True
+                self._queue[0].wake.set()
+            else:
+                self._leader_active = False
+
+        error = None
+        try:
+            if len(batch) == 1:
+                answers = {0: self.classify_single(batch[0].prompt)}
+            else:
+                answers = self.classify_batch([p.prompt for p in batch])
+                logger.info(f"Groq batch classified {len(answers)}/{len(batch)} prompts in one call")
+        except Exception as e:
+            logger.warning(f"Groq batch classification of {len(batch)} prompts failed: {e}")
+            answers = {}
+            error = e
+
+        for index, pending in enumerate(batch):
+            pending.error = error
+            if index in answers:
+                pending.answered = True
+                pending.genre = answers[index]
+            pending.wake.set()
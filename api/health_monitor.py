@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROBE_TRACK_ID = '4iV5W9uYEdYUVa79Axb7Rh'  # Hotel California
+
+
+class UpstreamHealth:
+    """Rolling probe results for one upstream dependency."""
+
+    def __init__(self, name: str, window: int = 20):
+        self.name = name
+        self.results = deque(maxlen=window)  # (ok, latency_ms)
+        self.last_error: Optional[str] = None
+        self.last_checked_at: Optional[float] = None
+        self.last_success_at: Optional[float] = None
+
+    def record(self, ok: bool, latency_ms: float, error: Optional[str] = None) -> None:
+        now = time.time()
+        self.results.append((ok, latency_ms))
+        self.last_checked_at = now
+        if ok:
+            self.last_success_at = now
+        else:
+            self.last_error = error
+
+    def snapshot(self) -> Dict:
+        results = list(self.results)
+        if not results:
+            return {"ok": None, "probes": 0}
+        failures = sum(1 for ok, _ in results if not ok)
+        latencies = sorted(latency for _, latency in results)
+        return {
+            "ok": results[-1][0],
+            "probes": len(results),
+            "latency_ms": round(results[-1][1], 1),
+            "median_latency_ms": round(latencies[len(latencies) // 2], 1),
+            "error_rate": round(failures / len(results), 3),
+            "last_error": self.last_error,
+            "last_checked_at": self.last_checked_at,
+            "last_success_at": self.last_success_at,
+        }
+
+
+class HealthMonitor:
+    """Probes Spotify and Groq in a background thread and serves a cached snapshot.
+
+    ``/health`` reads ``snapshot()``, which never touches the network, so load
+    balancers can poll as often as they like without adding upstream traffic.
+    """
+
+    def __init__(self, engine, interval: float = 60.0, window: int = 20):
+        self.engine = engine
+        self.interval = interval
+        self.spotify = UpstreamHealth('spotify', window)
+        self.groq = UpstreamHealth('groq', window)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start periodic probing; the first probe runs immediately in the background."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.probe_once()
+            self._stop.wait(self.interval)
+
+    def probe_once(self) -> None:
+        if self.engine.spotify_client:
+            self._probe(self.spotify, lambda: self.engine.spotify_client.track(PROBE_TRACK_ID))
+        if self.engine.groq_client:
+            # Listing models is free and exercises auth and connectivity
+            self._probe(self.groq, lambda: self.engine.groq_client.models.list())
+
+    def _probe(self, upstream: UpstreamHealth, call: Callable) -> None:
+        start = time.perf_counter()
+        try:
+            call()
+            upstream.record(True, (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            upstream.record(False, (time.perf_counter() - start) * 1000, f"{type(e).__name__}: {e}")
+            logger.warning(f"Health probe for {upstream.name} failed: {e}")
+
+    def spotify_token_expires_in(self) -> Optional[float]:
+        """Seconds until the cached client-credentials token expires, if known."""
+        try:
+            auth_manager = self.engine.spotify_client.auth_manager
+            token_info = auth_manager.cache_handler.get_cached_token()
+        except Exception:
+            return None
+        if not token_info or 'expires_at' not in token_info:
+            return None
+        return round(token_info['expires_at'] - time.time(), 1)
+
+    def snapshot(self) -> Dict:
+        spotify = self.spotify.snapshot()
+        spotify["configured"] = self.engine.spotify_client is not None
+        if spotify["configured"]:
+            spotify["token_expires_in_s"] = self.spotify_token_expires_in()
+        groq = self.groq.snapshot()
+        groq["configured"] = self.engine.groq_client is not None
+
+        breakers = self.engine.breakers.snapshot()
+        any_open = any(b["state"] != "closed" for b in breakers.values())
+
+        checked = [u for u in (spotify, groq) if u["configured"] and u["ok"] is not None]
+        if any_open:
+            status = "degraded"
+        elif not checked:
+            status = "starting" if self._thread is not None else "unknown"
+        elif all(u["ok"] for u in checked):
+            status = "healthy"
+        else:
+            status = "degraded"
+
+        engine = self.engine
+        return {
+            "status": status,
+            "probe_interval_s": self.interval,
+            "upstreams": {"spotify": spotify, "groq": groq},
+            "circuit_breakers": breakers,
+            "prefetch": engine.prefetcher.snapshot() if engine.prefetcher is not None else None,
+            "artist_graph": engine.artist_graph.snapshot() if engine.artist_graph is not None else None,
+            "cache_warmer": engine.cache_warmer.snapshot(),
+            "schedulers": {
+                name: scheduler.snapshot()
+                for name, scheduler in (('spotify', engine.spotify_scheduler), ('groq', engine.groq_scheduler))
+                if scheduler is not None
+            },
+            "genre_registry": engine.genre_registry.snapshot(),
+            "catalog_snapshot": engine.catalog_snapshot.snapshot() if engine.catalog_snapshot is not None else None,
+        }
@@ -0,0 +1,194 @@
+import gzip
+import hashlib
+import os
+from typing import Dict, Optional
+
+from codec import RequestBodyError, dumps
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', '1024'))
+
+# Cache-Control per route for successful GET/HEAD responses. Errors and
+# responses to other methods (POST) are never cached.
+CACHE_POLICIES: Dict[str, str] = {
+    '/health': 'no-store',
+    '/track': 'public, max-age=300, s-maxage=86400',
+    '/recommendations': 'public, max-age=60, s-maxage=3600',
+    '/prompt_recommendations': 'public, max-age=60, s-maxage=600',
+}
+DEFAULT_CACHE_POLICY = 'no-cache'
+ERROR_CACHE_POLICY = 'no-store'
+UNSAFE_METHOD_CACHE_POLICY = 'private, no-store'
+
+# Only responses to these methods are validated with ETags and may be cached
+CACHEABLE_METHODS = ('GET', 'HEAD')
+
+
+def cache_policy_for(route: Optional[str], status_code: int, method: str = 'GET') -> str:
+    if status_code >= 400:
+        return ERROR_CACHE_POLICY
+    if method not in CACHEABLE_METHODS:
+        return UNSAFE_METHOD_CACHE_POLICY
+    return CACHE_POLICIES.get(route, DEFAULT_CACHE_POLICY)
+
+
+def compute_etag(body: bytes) -> str:
+    """Content-hash ETag of the uncompressed body.
+
+    Weak, because the same entity may be sent with different content codings.
+    """
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported content coding offered by the client."""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(','):
+        pieces = part.strip().split(';')
+        coding = pieces[0].strip().lower()
+        quality = 1.0
+        for param in pieces[1:]:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        offered[coding] = quality
+    if brotli is not None and offered.get('br', 0) > 0:
+        return 'br'
+    if offered.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def send_json(handler, status_code: int, data, route: Optional[str] = None,
+              headers: Optional[Dict[str, str]] = None) -> None:
+    """Write a JSON response with ETag revalidation, compression and Cache-Control.
+
+    Only GET and HEAD responses carry an ETag and answer a matching
+    If-None-Match with 304. For other methods a matching If-None-Match is a
+    failed precondition (412), as RFC 9110 requires, and the response is
+    never cacheable.
+    """
+    body = dumps(data)
+    method = handler.command
+    cacheable = method in CACHEABLE_METHODS
+    cache_control = cache_policy_for(route, status_code, method)
+    etag = compute_etag(body) if status_code == 200 else None
+
+    if etag and etag_matches(handler.headers.get('If-None-Match'), etag):
+        if not cacheable:
+            send_json(handler, 412, {"error": "Precondition failed"}, route=route)
+            return
+        handler.send_response(304)
+        handler.send_header('ETag', etag)
+        handler.send_header('Cache-Control', cache_control)
+        handler.send_header('Vary', 'Accept-Encoding')
+        handler.send_header('Access-Control-Allow-Origin', '*')
+        handler.end_headers()
+        return
+
+    encoding = None
+    if len(body) >= MIN_COMPRESS_BYTES:
+        encoding = negotiate_encoding(handler.headers.get('Accept-Encoding'))
+        if encoding:
+            body = compress(body, encoding)
+
+    handler.send_response(status_code)
+    handler.send_header('Content-type', 'application/json')
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    handler.send_header('Cache-Control', cache_control)
+    handler.send_header('Vary', 'Accept-Encoding')
+    if etag and cacheable:
+        handler.send_header('ETag', etag)
+    if encoding:
+        handler.send_header('Content-Encoding', encoding)
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    if method != 'HEAD':
+        handler.wfile.write(body)
+
+
+def send_overloaded(handler, retry_after: int, route: Optional[str] = None) -> None:
+    """503 telling the client when to retry, sent when admission control sheds a request."""
+    send_json(handler, 503, {"success": False, "error": "Server is busy, please retry shortly"},
+              route=route, headers={'Retry-After': str(retry_after)})
+
+
+STREAM_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
+
+def negotiate_stream_format(accept: Optional[str], requested=None) -> Optional[str]:
+    """Return 'ndjson' or 'sse' when the client asked for a streamed response.
+
+    Clients opt in with ``"stream": "ndjson" | "sse" | true`` in the request body
+    or with an ``Accept`` header naming one of the stream content types.
+    Any other ``stream`` value raises RequestBodyError(400).
+    """
+    if requested is not None and not isinstance(requested, bool) and (
+            not isinstance(requested, str) or requested not in STREAM_CONTENT_TYPES):
+        raise RequestBodyError(400, 'stream must be true, false, "ndjson" or "sse"')
+    if requested in STREAM_CONTENT_TYPES:
+        return requested
+    accept = (accept or '').lower()
+    if STREAM_CONTENT_TYPES['sse'] in accept:
+        return 'sse'
+    if STREAM_CONTENT_TYPES['ndjson'] in accept or requested is True:
+        return 'ndjson'
+    return None
+
+
+class EventStream:
+    """Writes a streamed response as NDJSON lines or Server-Sent Events."""
+
+    def __init__(self, handler, stream_format: str):
+        self.handler = handler
+        self.stream_format = stream_format
+        handler.send_response(200)
+        handler.send_header('Content-type', STREAM_CONTENT_TYPES[stream_format])
+        handler.send_header('Access-Control-Allow-Origin', '*')
+        handler.send_header('Cache-Control', 'no-store')
+        handler.send_header('X-Accel-Buffering', 'no')
+        handler.end_headers()
+
+    def send(self, event: str, payload: Dict) -> None:
+        if self.stream_format == 'sse':
+            chunk = b"event: " + event.encode() + b"\ndata: " + dumps(payload) + b"\n\n"
+        else:
+            chunk = dumps({"event": event, **payload}) + b"\n"
+        self.handler.wfile.write(chunk)
+        self.handler.wfile.flush()
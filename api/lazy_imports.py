@@ -0,0 +1,45 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Module proxy that defers the real import until the first attribute access.
+
+    Heavy client libraries (spotipy, groq, dotenv) cost tens of milliseconds to
+    import; deferring them keeps cold starts cheap for handlers that never use them.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+dotenv = LazyModule('dotenv')
+_env_loaded = False
+
+
+def load_environment():
+    """Load environment variables from .env once per process"""
+    global _env_loaded
+    if not _env_loaded:
+        dotenv.load_dotenv()
+        _env_loaded = True
@@ -0,0 +1,96 @@
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+GENRE = 'genre'
+SEED_ARTIST = 'seed_artist'
+PROMPT = 'prompt'
+KINDS = (GENRE, SEED_ARTIST, PROMPT)
+# Prompts are user free text: they are only held in memory, never written to the snapshot.
+# The genres they resolve to are recorded as GENRE hits, so those survive a restart instead.
+PERSISTED_KINDS = (GENRE, SEED_ARTIST)
+
+
+class PopularityTracker:
+    """Exponentially decaying request counts per genre, seed artist and normalized prompt.
+
+    A hit counts 1 and halves every ``half_life`` seconds, so the ranking
+    follows what is popular now rather than since the process started. Each
+    kind keeps at most ``max_keys`` entries; the coldest are dropped first.
+    Keys longer than ``max_key_chars`` are not tracked.
+    """
+
+    def __init__(self, half_life: float = 3600.0, max_keys: int = 1000, max_key_chars: int = 200):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self.max_key_chars = max_key_chars
+        self._scores: Dict[str, Dict[str, Tuple[float, float]]] = {kind: {} for kind in KINDS}  # key -> (score, at)
+        self._lock = threading.Lock()
+
+    def _decayed(self, score: float, at: float, now: float) -> float:
+        return score * math.pow(0.5, (now - at) / self.half_life)
+
+    def record(self, kind: str, key: str, weight: float = 1.0) -> None:
+        if not key or len(key) > self.max_key_chars:
+            return
+        now = time.time()
+        with self._lock:
+            scores = self._scores[kind]
+            score, at = scores.get(key, (0.0, now))
+            scores[key] = (self._decayed(score, at, now) + weight, now)
+            if len(scores) > 2 * self.max_keys:
+                self._prune(scores, now)
+
+    def _prune(self, scores: Dict[str, Tuple[float, float]], now: float) -> None:
+        ranked = sorted(scores.items(), key=lambda item: self._decayed(*item[1], now), reverse=True)
+        scores.clear()
+        scores.update(ranked[:self.max_keys])
+
+    def top(self, kind: str, n: int) -> List[str]:
+        """The ``n`` hottest keys of one kind, hottest first."""
+        now = time.time()
+        with self._lock:
+            items = list(self._scores[kind].items())
+        items.sort(key=lambda item: self._decayed(*item[1], now), reverse=True)
+        return [key for key, _ in items[:n]]
+
+    def save(self, path: str) -> None:
+        """Write the current genre and seed-artist scores to ``path`` atomically."""
+        with self._lock:
+            data = {kind: {key: list(entry) for key, entry in self._scores[kind].items()} for kind in PERSISTED_KINDS}
+        directory = os.path.dirname(path) or '.'
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.popularity-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not save popularity snapshot to {path}: {e}")
+
+    def load(self, path: str) -> bool:
+        """Merge scores saved by a previous process; False if there is no usable snapshot."""
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read popularity snapshot {path}: {e}")
+            return False
+        now = time.time()
+        with self._lock:
+            for kind in PERSISTED_KINDS:  # prompts in snapshots from older versions are dropped
+                scores = self._scores[kind]
+                for key, (score, at) in (data.get(kind) or {}).items():
+                    current, current_at = scores.get(key, (0.0, now))
+                    scores[key] = (self._decayed(current, current_at, now) + self._decayed(score, at, now), now)
+                if len(scores) > self.max_keys:
+                    self._prune(scores, now)
+        return True
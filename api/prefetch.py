@@ -0,0 +1,81 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable
+
+from call_budget import CallBudget
+from circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Best-effort background jobs that warm caches ahead of the requests that need them.
+
+    At most ``max_workers`` jobs run at once and ``max_pending`` wait; extra
+    jobs are dropped rather than queued. A job already running or waiting under
+    the same key isn't scheduled again. Jobs receive the shared ``budget`` and
+    must check it before every upstream call they make.
+    """
+
+    def __init__(self, budget: CallBudget, max_workers: int = 2, max_pending: int = 32):
+        self.budget = budget
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.scheduled = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def schedule(self, key: Hashable, job: Callable[[CallBudget], None]) -> bool:
+        """Queue ``job(budget)`` unless it is a duplicate or the queue is full."""
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            if len(self._in_flight) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._in_flight.add(key)
+            self.scheduled += 1
+        try:
+            self._executor.submit(self._run, key, job)
+        except RuntimeError:  # executor shut down at interpreter exit
+            self._finish(key)
+            return False
+        return True
+
+    def _run(self, key: Hashable, job: Callable[[CallBudget], None]) -> None:
+        try:
+            job(self.budget)
+        except CircuitOpenError as e:
+            logger.info(f"Prefetch {key} skipped: {e}")
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Prefetch {key} failed: {type(e).__name__} - {e}")
+        finally:
+            self._finish(key)
+
+    def _finish(self, key: Hashable) -> None:
+        with self._lock:
+            self._in_flight.discard(key)
+            if not self._in_flight:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Block until no job is pending or running; False on timeout."""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._in_flight, timeout)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {
+            "in_flight": in_flight,
+            "scheduled": self.scheduled,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "budget_remaining": round(self.budget.remaining(), 1),
+            "budget_denied": self.budget.denied,
+        }
@@ -1,76 +1,119 @@
 from http.server import BaseHTTPRequestHandler
-import json
 import os
 import sys
-from song_recommendations import SongRecommendationsEngine
+from urllib.parse import urlsplit
+from shared_engine import get_engine, health_status
+from codec import RequestBodyError, dumps_pretty, optional_int, optional_str, read_json_body, read_query
+from fair_scheduler import bind_request_user
+from http_responses import CACHEABLE_METHODS, EventStream, negotiate_stream_format, send_json, send_overloaded
+from admission import CHEAP, EXPENSIVE, NORMAL, AdmissionController, Overloaded
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize engine globally
-try:
-    engine = SongRecommendationsEngine()
-except Exception as e:
-    logger.error(f"Failed to initialize recommendations engine: {e}")
-    engine = None
+# Bounds concurrent work so overload sheds requests instead of timing them all out
+admission = AdmissionController.from_env()
 
 class handler(BaseHTTPRequestHandler):
+    @property
+    def route(self):
+        return urlsplit(self.path).path
+    
     def do_GET(self):
-        if self.path == '/health':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            response = {
-                "status": "healthy",
-                "engine_available": engine is not None,
-                "spotify_connected": engine.spotify_client is not None if engine else False
-            }
-            self.wfile.write(json.dumps(response).encode())
+        # GET /track?trackId= and GET /recommendations?songId= are the cacheable
+        # forms of the POST routes: shared caches key them by URL
+        if self.route == '/health':
+            try:
+                with admission.slot(CHEAP):
+                    response = health_status()
+                    response["admission"] = admission.snapshot()
+                    self.send_success_response(response)
+            except Overloaded as e:
+                send_overloaded(self, e.retry_after, route=self.route)
+        elif self.route == '/track':
+            self.handle_track_info()
+        elif self.route == '/recommendations':
+            self.handle_recommendations()
         else:
             self.send_response(404)
             self.end_headers()
     
+    do_HEAD = do_GET
+    
     def do_POST(self):
-        if self.path == '/track':
+        if self.route == '/track':
             self.handle_track_info()
-        elif self.path == '/recommendations':
+        elif self.route == '/recommendations':
             self.handle_recommendations()
-        elif self.path == '/prompt_recommendations':
+        elif self.route == '/prompt_recommendations':
             self.handle_prompt_recommendations()
         else:
             self.send_response(404)
             self.end_headers()
     
+    def read_request(self):
+        """Request parameters: the query string for GET/HEAD, else the JSON body."""
+        if self.command in CACHEABLE_METHODS:
+            return read_query(self)
+        return read_json_body(self)
+    
+    def user_token(self, data):
+        """The caller's Spotify token; raises RequestBodyError(400) if it isn't a string."""
+        # Never taken from a URL: cached GET responses are shared between users
+        return optional_str(data, "userToken") if self.command not in CACHEABLE_METHODS else None
+    
     def handle_track_info(self):
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            try:
+                data = self.read_request()
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"error": e.message})
+                return
             
             track_id = data.get("trackId")
+            bind_request_user(self)
             if not track_id:
                 self.send_error_response(400, {"error": "trackId required"})
                 return
             
-            track_info = engine.get_track_info(track_id)
+            engine = get_engine()
+            if not engine:
+                self.send_error_response(503, {"error": "Engine unavailable"})
+                return
+            
+            with admission.slot(CHEAP if engine.has_track(track_id) else NORMAL):
+                track_info = engine.get_track_info(track_id)
+            if track_info is None:
+                # Misses are sent as errors so shared caches never keep them
+                self.send_error_response(404, {"error": "Track not found"})
+                return
             self.send_success_response(track_info)
             
+        except Overloaded as e:
+            logger.warning(f"[SHED] /track: {e}")
+            send_overloaded(self, e.retry_after, route=self.route)
         except Exception as e:
             logger.error(f"Error in /track: {e}")
             self.send_error_response(500, {"error": "Internal server error"})
     
     def handle_recommendations(self):
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            try:
+                data = self.read_request()
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"error": e.message})
+                return
             
             song_id = data.get("songId")
-            user_token = data.get("userToken")
+            bind_request_user(self)
+            try:
+                user_token = self.user_token(data)
+                genre_fanout = optional_int(data, "genreFanout", minimum=1, text=self.command in CACHEABLE_METHODS)
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"error": e.message})
+                return
             
             logger.info(f"[RECV] /recommendations called. songId: {song_id}")
             
@@ -79,33 +122,46 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response(400, {"error": "songId required"})
                 return
             
+            engine = get_engine()
             if not engine:
                 logger.error("[ERROR] Engine unavailable.")
                 self.send_error_response(503, {"error": "Engine unavailable"})
                 return
             
-            result = engine.get_recommendations(selected_song_id=song_id, user_token=user_token)
-            logger.info(f"[SEND] Recommendations response: {json.dumps(result.get('songs', []), indent=2)}")
+            with admission.slot(NORMAL):
+                result = engine.get_recommendations(
+                    selected_song_id=song_id,
+                    user_token=user_token,
+                    genre_fanout=genre_fanout,
+                )
+            logger.info(f"[SEND] Recommendations response: {dumps_pretty(result.get('songs', []))}")
             
             status_code = 200 if result.get("success", False) else 500
-            self.send_response(status_code)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            send_json(self, status_code, result, route=self.route)
             
+        except Overloaded as e:
+            logger.warning(f"[SHED] /recommendations: {e}")
+            send_overloaded(self, e.retry_after, route=self.route)
         except Exception as e:
             logger.error(f"Error in /recommendations: {e}")
             self.send_error_response(500, {"error": "Internal server error"})
     
     def handle_prompt_recommendations(self):
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            try:
+                data = self.read_request()
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"success": False, "error": e.message})
+                return
             
             prompt = data.get("prompt")
-            user_token = data.get("userToken")
+            bind_request_user(self)
+            try:
+                user_token = self.user_token(data)
+                stream_format = negotiate_stream_format(self.headers.get('Accept'), data.get("stream"))
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"success": False, "error": e.message})
+                return
             
             logger.info(f"[RECV] /prompt_recommendations called. prompt: {prompt}")
             
@@ -113,16 +169,26 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response(400, {"success": False, "error": "prompt required"})
                 return
             
+            engine = get_engine()
             if not engine:
                 self.send_error_response(503, {"success": False, "error": "Engine unavailable"})
                 return
             
-            genre = engine._genre_from_prompt_via_groq(prompt)
-            if not genre:
-                self.send_error_response(500, {"success": False, "error": "Could not derive genre from prompt"})
+            with admission.slot(EXPENSIVE):
+                genre = engine._genre_from_prompt_via_groq(prompt)
+                if not genre:
+                    self.send_error_response(500, {"success": False, "error": "Could not derive genre from prompt"})
+                    return
+                if not stream_format:
+                    artists = engine.find_artists_by_genre(genre, user_token=user_token, limit=6)
+            
+            if stream_format:
+                # Send the genre now and each artist as soon as it is filtered. Streamed
+                # outside the slot, which would otherwise stay held for as long as the
+                # client takes to read; the Spotify scheduler still bounds the search.
+                self.stream_prompt_recommendations(genre, user_token, stream_format)
                 return
             
-            artists = engine.find_artists_by_genre(genre, user_token=user_token, limit=6)
             if not artists:
                 self.send_error_response(404, {"success": False, "error": f"No artists found for genre '{genre}'"})
                 return
@@ -134,23 +200,37 @@ class handler(BaseHTTPRequestHandler):
                 "selected": artists[0]
             }
             
-            logger.info(f"[SEND] Prompt recommendations response: {json.dumps(result, indent=2)[:400]}...")
+            logger.info(f"[SEND] Prompt recommendations response: {dumps_pretty(result)[:400]}...")
             self.send_success_response(result)
             
+        except Overloaded as e:
+            logger.warning(f"[SHED] /prompt_recommendations: {e}")
+            send_overloaded(self, e.retry_after, route=self.route)
         except Exception as e:
             logger.error(f"Error in /prompt_recommendations: {e}")
             self.send_error_response(500, {"success": False, "error": "Internal server error"})
     
+    def stream_prompt_recommendations(self, genre, user_token, stream_format):
+        engine = get_engine()
+        stream = EventStream(self, stream_format)
+        try:
+            stream.send("genre", {"genre": genre})
+            artists = []
+            for artist in engine.iter_artists_by_genre(genre, user_token=user_token, limit=6):
+                artists.append(artist)
+                stream.send("artist", {"artist": artist})
+            if not artists:
+                stream.send("error", {"success": False, "error": f"No artists found for genre '{genre}'"})
+                return
+            stream.send("done", {"success": True, "genre": genre, "count": len(artists), "selected": artists[0]})
+            logger.info(f"[SEND] Streamed {len(artists)} prompt recommendations for genre '{genre}'")
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error streaming /prompt_recommendations: {e}")
+            stream.send("error", {"success": False, "error": "Internal server error"})
+    
     def send_success_response(self, data):
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        send_json(self, 200, data, route=self.route)
     
     def send_error_response(self, status_code, data):
-        self.send_response(status_code)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        send_json(self, status_code, data, route=self.route)
@@ -1,30 +1,36 @@
 from http.server import BaseHTTPRequestHandler
-import json
 import os
 import sys
-from song_recommendations import SongRecommendationsEngine
+from shared_engine import get_engine
+from codec import RequestBodyError, dumps_pretty, optional_str, read_json_body
+from admission import Overloaded
+from fair_scheduler import bind_request_user
+from http_responses import EventStream, negotiate_stream_format, send_json, send_overloaded
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize engine globally
-try:
-    engine = SongRecommendationsEngine()
-except Exception as e:
-    logger.error(f"Failed to initialize recommendations engine: {e}")
-    engine = None
+ROUTE = '/prompt_recommendations'
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            try:
+                data = read_json_body(self)
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"success": False, "error": e.message})
+                return
             
             prompt = data.get("prompt")
-            user_token = data.get("userToken")
+            bind_request_user(self)
+            try:
+                user_token = optional_str(data, "userToken")
+                stream_format = negotiate_stream_format(self.headers.get('Accept'), data.get("stream"))
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"success": False, "error": e.message})
+                return
             
             logger.info(f"[RECV] /prompt_recommendations called. prompt: {prompt}")
             
@@ -32,6 +38,7 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response(400, {"success": False, "error": "prompt required"})
                 return
             
+            engine = get_engine()
             if not engine:
                 self.send_error_response(503, {"success": False, "error": "Engine unavailable"})
                 return
@@ -41,6 +48,11 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response(500, {"success": False, "error": "Could not derive genre from prompt"})
                 return
             
+            if stream_format:
+                # Send the genre now and each artist as soon as it is filtered
+                self.stream_prompt_recommendations(genre, user_token, stream_format)
+                return
+            
             artists = engine.find_artists_by_genre(genre, user_token=user_token, limit=6)
             if not artists:
                 self.send_error_response(404, {"success": False, "error": f"No artists found for genre '{genre}'"})
@@ -53,23 +65,37 @@ class handler(BaseHTTPRequestHandler):
                 "selected": artists[0]
             }
             
-            logger.info(f"[SEND] Prompt recommendations response: {json.dumps(result, indent=2)[:400]}...")
+            logger.info(f"[SEND] Prompt recommendations response: {dumps_pretty(result)[:400]}...")
             self.send_success_response(result)
             
+        except Overloaded as e:
+            logger.warning(f"[SHED] /prompt_recommendations: {e}")
+            send_overloaded(self, e.retry_after, route=ROUTE)
         except Exception as e:
             logger.error(f"Error in /prompt_recommendations: {e}")
             self.send_error_response(500, {"success": False, "error": "Internal server error"})
     
+    def stream_prompt_recommendations(self, genre, user_token, stream_format):
+        engine = get_engine()
+        stream = EventStream(self, stream_format)
+        try:
+            stream.send("genre", {"genre": genre})
+            artists = []
+            for artist in engine.iter_artists_by_genre(genre, user_token=user_token, limit=6):
+                artists.append(artist)
+                stream.send("artist", {"artist": artist})
+            if not artists:
+                stream.send("error", {"success": False, "error": f"No artists found for genre '{genre}'"})
+                return
+            stream.send("done", {"success": True, "genre": genre, "count": len(artists), "selected": artists[0]})
+            logger.info(f"[SEND] Streamed {len(artists)} prompt recommendations for genre '{genre}'")
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error streaming /prompt_recommendations: {e}")
+            stream.send("error", {"success": False, "error": "Internal server error"})
+    
     def send_success_response(self, data):
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        send_json(self, 200, data, route=ROUTE)
     
     def send_error_response(self, status_code, data):
-        self.send_response(status_code)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        send_json(self, status_code, data, route=ROUTE)
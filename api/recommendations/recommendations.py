@@ -1,30 +1,37 @@
 from http.server import BaseHTTPRequestHandler
-import json
 import os
 import sys
-from song_recommendations import SongRecommendationsEngine
+from shared_engine import get_engine
+from codec import RequestBodyError, dumps_pretty, optional_int, optional_str, read_json_body, read_query
+from admission import Overloaded
+from fair_scheduler import bind_request_user
+from http_responses import CACHEABLE_METHODS, send_json, send_overloaded
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize engine globally
-try:
-    engine = SongRecommendationsEngine()
-except Exception as e:
-    logger.error(f"Failed to initialize recommendations engine: {e}")
-    engine = None
+ROUTE = '/recommendations'
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            try:
+                data = self.read_request()
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"error": e.message})
+                return
             
             song_id = data.get("songId")
-            user_token = data.get("userToken")
+            bind_request_user(self)
+            try:
+                # Never taken from a URL: cached GET responses are shared between users
+                user_token = optional_str(data, "userToken") if self.command not in CACHEABLE_METHODS else None
+                genre_fanout = optional_int(data, "genreFanout", minimum=1, text=self.command in CACHEABLE_METHODS)
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"error": e.message})
+                return
             
             logger.info(f"[RECV] /recommendations called. songId: {song_id}")
             
@@ -33,28 +40,38 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error_response(400, {"error": "songId required"})
                 return
             
+            engine = get_engine()
             if not engine:
                 logger.error("[ERROR] Engine unavailable.")
                 self.send_error_response(503, {"error": "Engine unavailable"})
                 return
             
-            result = engine.get_recommendations(selected_song_id=song_id, user_token=user_token)
-            logger.info(f"[SEND] Recommendations response: {json.dumps(result.get('songs', []), indent=2)}")
+            result = engine.get_recommendations(
+                selected_song_id=song_id,
+                user_token=user_token,
+                genre_fanout=genre_fanout,
+            )
+            logger.info(f"[SEND] Recommendations response: {dumps_pretty(result.get('songs', []))}")
             
             status_code = 200 if result.get("success", False) else 500
-            self.send_response(status_code)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            send_json(self, status_code, result, route=ROUTE)
             
+        except Overloaded as e:
+            logger.warning(f"[SHED] /recommendations: {e}")
+            send_overloaded(self, e.retry_after, route=ROUTE)
         except Exception as e:
             logger.error(f"Error in /recommendations: {e}")
             self.send_error_response(500, {"error": "Internal server error"})
     
+    # GET/HEAD take the same fields from the query string and are cacheable
+    do_GET = do_POST
+    do_HEAD = do_POST
+    
+    def read_request(self):
+        """Request parameters: the query string for GET/HEAD, else the JSON body."""
+        if self.command in CACHEABLE_METHODS:
+            return read_query(self)
+        return read_json_body(self)
+    
     def send_error_response(self, status_code, data):
-        self.send_response(status_code)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        send_json(self, status_code, data, route=ROUTE)
@@ -1,50 +1,65 @@
 from http.server import BaseHTTPRequestHandler
-import json
 import os
 import sys
-from song_recommendations import SongRecommendationsEngine
+from shared_engine import get_engine
+from codec import RequestBodyError, read_json_body, read_query
+from admission import Overloaded
+from fair_scheduler import bind_request_user
+from http_responses import CACHEABLE_METHODS, send_json, send_overloaded
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize engine globally
-try:
-    engine = SongRecommendationsEngine()
-except Exception as e:
-    logger.error(f"Failed to initialize recommendations engine: {e}")
-    engine = None
+ROUTE = '/track'
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            try:
+                data = self.read_request()
+            except RequestBodyError as e:
+                self.send_error_response(e.status_code, {"error": e.message})
+                return
             
             track_id = data.get("trackId")
+            bind_request_user(self)
             if not track_id:
                 self.send_error_response(400, {"error": "trackId required"})
                 return
             
+            engine = get_engine()
+            if not engine:
+                self.send_error_response(503, {"error": "Engine unavailable"})
+                return
+            
             track_info = engine.get_track_info(track_id)
+            if track_info is None:
+                # Misses are sent as errors so shared caches never keep them
+                self.send_error_response(404, {"error": "Track not found"})
+                return
             self.send_success_response(track_info)
             
+        except Overloaded as e:
+            logger.warning(f"[SHED] /track: {e}")
+            send_overloaded(self, e.retry_after, route=ROUTE)
         except Exception as e:
             logger.error(f"Error in /track: {e}")
             self.send_error_response(500, {"error": "Internal server error"})
     
     def send_success_response(self, data):
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        send_json(self, 200, data, route=ROUTE)
+    
+    # GET/HEAD take the same fields from the query string and are cacheable
+    do_GET = do_POST
+    do_HEAD = do_POST
+    
+    def read_request(self):
+        """Request parameters: the query string for GET/HEAD, else the JSON body."""
+        if self.command in CACHEABLE_METHODS:
+            return read_query(self)
+        return read_json_body(self)
     
     def send_error_response(self, status_code, data):
-        self.send_response(status_code)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        send_json(self, status_code, data, route=ROUTE)
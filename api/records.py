@@ -0,0 +1,213 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+
+def intern_str(value: Optional[str]) -> Optional[str]:
+    """Intern repeated strings (genre names, URL prefixes) so records share one copy."""
+    if value is None:
+        return None
+    return sys.intern(value)
+
+
+def split_image_url(url: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Split an image URL into an interned prefix and its unique suffix."""
+    if not url:
+        return None, None
+    cut = url.rfind('/') + 1
+    return intern_str(url[:cut]), url[cut:]
+
+
+def first_image_url(images) -> Optional[str]:
+    """Return the URL of the first (largest) image in a Spotify images list."""
+    return images[0]['url'] if images else None
+
+
+class TrackRecord:
+    """Compact track entry; serializes to the front-end song shape."""
+
+    __slots__ = ('id', 'name', 'artist', 'album', '_image_prefix', '_image_suffix', 'artist_id')
+
+    def __init__(self, id: str, name: str, artist: str, album: str,
+                 image_url: Optional[str] = None, artist_id: Optional[str] = None):
+        self.id = id
+        self.name = name
+        self.artist = intern_str(artist)
+        self.album = album
+        self._image_prefix, self._image_suffix = split_image_url(image_url)
+        self.artist_id = artist_id
+
+    @classmethod
+    def from_spotify(cls, track: Dict) -> 'TrackRecord':
+        primary_artist = track['artists'][0]
+        return cls(
+            id=track['id'],
+            name=track['name'],
+            artist=primary_artist['name'],
+            album=track['album']['name'],
+            image_url=first_image_url(track['album']['images']),
+            artist_id=primary_artist.get('id'),
+        )
+
+    @property
+    def image_url(self) -> Optional[str]:
+        if self._image_prefix is None:
+            return None
+        return self._image_prefix + self._image_suffix
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "artist": self.artist,
+            "album": self.album,
+            "imageUrl": self.image_url,
+        }
+
+
+class ArtistRecord:
+    """Compact artist entry with interned genres."""
+
+    __slots__ = ('id', 'name', 'popularity', 'genres', '_image_prefix', '_image_suffix')
+
+    def __init__(self, id: str, name: str, popularity: int = 0,
+                 genres: Iterable[str] = (), image_url: Optional[str] = None):
+        self.id = id
+        self.name = name
+        self.popularity = popularity
+        self.genres = tuple(intern_str(g) for g in genres)
+        self._image_prefix, self._image_suffix = split_image_url(image_url)
+
+    @classmethod
+    def from_spotify(cls, artist: Dict) -> 'ArtistRecord':
+        return cls(
+            id=artist.get('id'),
+            name=artist.get('name'),
+            popularity=artist.get('popularity', 0),
+            genres=artist.get('genres') or (),
+            image_url=first_image_url(artist.get('images') or []),
+        )
+
+    @property
+    def image_url(self) -> Optional[str]:
+        if self._image_prefix is None:
+            return None
+        return self._image_prefix + self._image_suffix
+
+    def to_dict(self, genre: str) -> Dict:
+        # Artist recommendations reuse the song shape:
+        # - name: artist name
+        # - artist: genre string
+        # - album: empty for artists
+        return {
+            "id": self.id,
+            "name": self.name,
+            "artist": genre,
+            "album": "",
+            "imageUrl": self.image_url,
+            "popularity": self.popularity,
+        }
+
+
+class AudioFeatures:
+    """Compact subset of Spotify audio features used by the engine."""
+
+    __slots__ = ('tempo', 'energy', 'danceability', 'valence')
+
+    def __init__(self, tempo: Optional[float], energy: Optional[float] = None,
+                 danceability: Optional[float] = None, valence: Optional[float] = None):
+        self.tempo = tempo
+        self.energy = energy
+        self.danceability = danceability
+        self.valence = valence
+
+    @classmethod
+    def from_spotify(cls, features: Dict) -> 'AudioFeatures':
+        return cls(
+            tempo=features.get('tempo'),
+            energy=features.get('energy'),
+            danceability=features.get('danceability'),
+            valence=features.get('valence'),
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "tempo": self.tempo,
+            "energy": self.energy,
+            "danceability": self.danceability,
+            "valence": self.valence,
+        }
+
+
+class RecordCache:
+    """Bounded LRU cache for compact records.
+
+    With ``ttl`` set, ``get`` only returns entries younger than ``ttl`` seconds;
+    expired entries stay available through ``get_stale`` until evicted.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            try:
+                value, stored_at = self._entries[key]
+            except KeyError:
+                return default
+            if self._expired(stored_at):
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def get_stale(self, key: Hashable, default=None):
+        """Return an entry even if it has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None else entry[0]
+
+    def expires_in(self, key: Hashable) -> Optional[float]:
+        """Seconds until an entry expires (negative once it has); None without a TTL or entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self.ttl is None:
+                return None
+            return self.ttl - (time.monotonic() - entry[1])
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether ``get`` would return the entry: present and not expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._expired(entry[1])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
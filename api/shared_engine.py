@@ -0,0 +1,65 @@
+import logging
+import os
+import threading
+
+from lazy_imports import load_environment
+
+logger = logging.getLogger(__name__)
+
+_engine = None
+_engine_built = False
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide engine, built by the first request that needs it.
+
+    Handlers call this instead of building an engine at import, so a cold
+    start only pays for the Spotify and Groq clients, background threads and
+    genre indexes when a request actually uses them. Returns None if the
+    engine could not be built; that is not retried.
+    """
+    global _engine, _engine_built
+    if _engine_built:
+        return _engine
+    with _engine_lock:
+        if not _engine_built:
+            try:
+                from song_recommendations import SongRecommendationsEngine
+
+                _engine = SongRecommendationsEngine()
+            except Exception as e:
+                logger.error(f"Failed to initialize recommendations engine: {e}")
+            _engine_built = True
+    return _engine
+
+
+def current_engine():
+    """The engine if this process has already built one; never builds it."""
+    return _engine
+
+
+def health_status(deep: bool = True) -> dict:
+    """/health body: configuration, plus the engine's cached probe results when ``deep``.
+
+    Never builds the engine or calls an upstream, so a process that only
+    answers /health starts no clients, background threads or cache warming.
+    Probe results exist only in a process that has built its engine, so
+    the standalone health function passes ``deep=False`` and reports
+    configuration alone; deep health is served by index.py's /health.
+    """
+    load_environment()
+    response = {
+        "status": "healthy",
+        "spotify_configured": bool(os.getenv('SPOTIFY_CLIENT_ID') and os.getenv('SPOTIFY_CLIENT_SECRET')),
+        "groq_configured": bool(os.getenv('GROQ_API_KEY')),
+    }
+    if not deep:
+        return response
+    engine = current_engine()
+    response["engine_available"] = engine is not None
+    response["spotify_connected"] = engine is not None and engine.spotify_client is not None
+    if engine is not None:
+        # Cached background probe results; never calls upstream
+        response.update(engine.health.snapshot())
+    return response
@@ -1,16 +1,36 @@
+import contextvars
+import hashlib
 import logging
 import os
-from typing import Dict, List, Optional
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from spotipy.exceptions import SpotifyException
-from dotenv import load_dotenv
-import requests
-import json
-from groq import Groq
-
-# Load environment variables
-load_dotenv()
+import tempfile
+from typing import Dict, Iterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from lazy_imports import LazyModule, load_environment
+from genre_prompt import GenreCatalogue, compile_catalogue, normalize_prompt
+from genre_registry import load_registry
+from genre_vectors import FALLBACK_MIN_SCORE, SHORTLIST_MIN_SCORE, vectors_for
+from groq_batching import GenreBatcher
+from health_monitor import HealthMonitor
+from candidate_ranking import TopCandidates
+from circuit_breaker import BreakerRegistry, CircuitOpenError
+from upstream import RETRYABLE, UpstreamCaller, classify_error
+from records import ArtistRecord, AudioFeatures, RecordCache, TrackRecord
+from artist_graph import ArtistGraph
+from artist_neighbours import load_neighbours
+from catalog_snapshot import load_snapshot
+from call_budget import CallBudget
+from prefetch import Prefetcher
+from popularity import GENRE, PROMPT, SEED_ARTIST, PopularityTracker
+from cache_warmer import CacheWarmer
+from admission import Overloaded
+from fair_scheduler import BACKGROUND_USER, BATCH_USER, FairScheduler, current_user, verified_user_key
+
+# Heavy client libraries are imported on first use to keep cold starts fast
+spotipy = LazyModule('spotipy')
+spotipy_oauth2 = LazyModule('spotipy.oauth2')
+spotipy_exceptions = LazyModule('spotipy.exceptions')
+groq = LazyModule('groq')
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,33 +39,127 @@ logger = logging.getLogger(__name__)
 class SongRecommendationsEngine:
 
     def __init__(self):
+        load_environment()
+        # Per-attempt timeouts; UpstreamCaller decides whether an attempt is retried
+        self.spotify_timeout = float(os.getenv('SPOTIFY_TIMEOUT_S', '5'))
+        self.groq_timeout = float(os.getenv('GROQ_TIMEOUT_S', '10'))
+        self.token_refresher = None
         self.spotify_client = self._init_spotify_client()
-        self.song_cache = {}
+        # Caches hold compact records rather than raw spotipy JSON
+        self.song_cache = RecordCache(max_entries=4096)  # song_id -> AudioFeatures
+        self.track_cache = RecordCache(max_entries=4096)  # track_id -> TrackRecord
+        self.artist_cache = RecordCache(max_entries=2048)  # artist_id -> ArtistRecord
+        # Who a user token belongs to, as confirmed by Spotify; '' marks a rejected token
+        self.user_identities = RecordCache(
+            max_entries=4096, ttl=float(os.getenv('USER_IDENTITY_TTL_S', '600'))
+        )  # sha256(token) -> Spotify user id
+
+        # Optional read-only catalog (CATALOG_SNAPSHOT_PATH) mapped by every worker;
+        # its records are read in place, so they are never copied into the caches above
+        self.catalog_snapshot = load_snapshot()
         self.groq_client = self._init_groq_client()
-        self.test_spotify_connection()
-    
-        try:
-            # Try to load genres.json from the same directory as this file
-            import os
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            genres_path = os.path.join(current_dir, "genres.json")
-            with open(genres_path, "r") as f:
-                genres = json.load(f)
-            self.allowed_genres = set(map(str.lower, genres))  # normalize to lowercase
-            logger.info(f"Loaded {len(self.allowed_genres)} Spotify genres.")
-        except Exception as e:
-            logger.error(f"Failed to load genres: {e}")
-            self.allowed_genres = set()
+        # Every upstream call goes through one retry/credential-fallback policy,
+        # guarded by a circuit breaker per upstream endpoint class
+        self.breakers = BreakerRegistry(
+            window=int(os.getenv('CIRCUIT_WINDOW', '20')),
+            min_calls=int(os.getenv('CIRCUIT_MIN_CALLS', '5')),
+            failure_rate=float(os.getenv('CIRCUIT_FAILURE_RATE', '0.5')),
+            open_seconds=float(os.getenv('CIRCUIT_OPEN_SECONDS', '30')),
+        )
+        self.upstream = UpstreamCaller(
+            max_attempts=int(os.getenv('UPSTREAM_MAX_ATTEMPTS', '3')),
+            base_delay=float(os.getenv('UPSTREAM_BACKOFF_BASE_S', '0.2')),
+            max_delay=float(os.getenv('UPSTREAM_BACKOFF_MAX_S', '2.0')),
+            breakers=self.breakers,
+        )
+        # Concurrent upstream calls are shared fairly between users (and background
+        # work) instead of first come, first served
+        self.spotify_scheduler = self._build_scheduler('spotify', int(os.getenv('SPOTIFY_CONCURRENT_CALLS', '8')))
+        self.groq_scheduler = self._build_scheduler('groq', int(os.getenv('GROQ_CONCURRENT_CALLS', '4')))
+        # Genre search results, reused for GENRE_SEARCH_TTL_S and served stale when Spotify search is failing
+        self.genre_artist_cache = RecordCache(
+            max_entries=512, ttl=float(os.getenv('GENRE_SEARCH_TTL_S', '600'))
+        )  # genre -> tuple of ArtistRecord
+
+        # Related-artist graph grown from every artist and genre search fetched, plus an
+        # optional offline neighbour table (ARTIST_NEIGHBOURS_PATH); lets /recommendations
+        # answer without a search once it knows the seed's genres
+        graph_size = int(os.getenv('ARTIST_GRAPH_MAX_ARTISTS', '20000'))
+        self.artist_graph = (ArtistGraph(max_artists=graph_size, neighbours=load_neighbours())
+                             if graph_size > 0 else None)
+
+        # Genre fan-out searches share one pool; a request never searches more than the cap
+        self.max_genre_fanout = max(1, int(os.getenv('RECOMMENDATION_MAX_GENRE_FANOUT', '5')))
+        self.fanout_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(os.getenv('GENRE_FANOUT_WORKERS', '8'))), thread_name_prefix='genre-fanout'
+        )
+
+        # After /track, the follow-up /recommendations inputs are fetched in the background
+        self.prefetcher = None
+        prefetch_workers = int(os.getenv('RECOMMENDATION_PREFETCH_WORKERS', '2'))
+        if prefetch_workers > 0:
+            self.prefetcher = Prefetcher(
+                CallBudget(float(os.getenv('RECOMMENDATION_PREFETCH_BUDGET', '120'))),
+                max_workers=prefetch_workers,
+            )
 
-    def test_spotify_connection(self):
-        try:
-            # Simple test - get a popular track
-            results = self.spotify_client.track('4iV5W9uYEdYUVa79Axb7Rh')  # Hotel California
-            logging.info(f"Test successful: {results['name']}")
-            return True
-        except Exception as e:
-            logging.error(f"Connection test failed: {e}")
-            return False
+        # Compiled genre registry (genres.bin), mapped once per process and shared
+        self.genre_registry = load_registry()
+        self.allowed_genres = set(self.genre_registry.genres)
+
+        # Compile the Groq genre prompt once instead of on every request, and
+        # build its canonicalization index now rather than on the first answer
+        self.genre_catalogue = GenreCatalogue(self.allowed_genres)
+        logger.info(f"Genre index covers {len(self.genre_catalogue.index)} genres.")
+
+        # Groq only chooses among the genres whose keywords best match the prompt
+        self.genre_vectors = vectors_for(self.genre_registry)
+        self.genre_shortlist_size = int(os.getenv('GROQ_GENRE_SHORTLIST', '0'))
+
+        # Optional micro-batching of concurrent Groq lookups (disabled when the window is 0)
+        self.genre_batcher = None
+        batch_window_ms = float(os.getenv('GROQ_BATCH_WINDOW_MS', '0'))
+        if batch_window_ms > 0:
+            self.genre_batcher = GenreBatcher(
+                classify_batch=self._classify_genre_batch,
+                classify_single=self._classify_genre_single,
+                window_ms=batch_window_ms,
+                max_batch=int(os.getenv('GROQ_BATCH_MAX', '8')),
+            )
+
+        # Groq answers per normalized prompt
+        self.prompt_genre_cache = RecordCache(
+            max_entries=2048, ttl=float(os.getenv('PROMPT_GENRE_TTL_S', '86400'))
+        )  # normalized prompt -> genre
+
+        # Hot prompts, genres and seed artists are kept warm in the background
+        self.popularity = PopularityTracker(half_life=float(os.getenv('POPULARITY_HALF_LIFE_S', '3600')))
+        self.cache_warmer = CacheWarmer(
+            self,
+            self.popularity,
+            CallBudget(float(os.getenv('CACHE_WARM_BUDGET', '60'))),
+            interval=float(os.getenv('CACHE_WARM_INTERVAL_S', '300')),
+            top_n=int(os.getenv('CACHE_WARM_TOP_N', '20')),
+            snapshot_path=os.getenv('POPULARITY_SNAPSHOT_PATH',
+                                    os.path.join(tempfile.gettempdir(), 'vibecheck-popularity.json')),
+        )
+        self.cache_warmer.start()
+
+        # Upstream connectivity is probed in the background instead of blocking startup.
+        # Started last: its snapshot reads every component constructed above.
+        self.health = HealthMonitor(self, interval=float(os.getenv('HEALTH_PROBE_INTERVAL_S', '60')))
+        self.health.start()
+
+    def _build_scheduler(self, name: str, slots: int) -> Optional[FairScheduler]:
+        if slots <= 0:
+            return None
+        return FairScheduler(
+            name,
+            slots=slots,
+            max_per_user=int(os.getenv('FAIR_SCHEDULER_MAX_PER_USER', '0')) or None,
+            weights={BACKGROUND_USER: float(os.getenv('FAIR_SCHEDULER_BACKGROUND_WEIGHT', '0.5'))},
+            max_wait=float(os.getenv('FAIR_SCHEDULER_MAX_WAIT_S', '5')) or None,
+        )
 
     def _init_spotify_client(self):
         try:
@@ -57,11 +171,26 @@ class SongRecommendationsEngine:
                 logger.warning("Spotify credentials not found in environment variables.")
                 return None
 
-            auth_manager = SpotifyClientCredentials(
+            # Imported here because it subclasses spotipy's CacheHandler
+            from token_cache import TokenRefresher, build_token_cache
+
+            # Token shared between worker processes and refreshed ahead of expiry
+            token_cache = build_token_cache(client_id)
+            auth_manager = spotipy_oauth2.SpotifyClientCredentials(
                 client_id=client_id,
-                client_secret=client_secret
+                client_secret=client_secret,
+                cache_handler=token_cache,
+                requests_timeout=self.spotify_timeout,
+            )
+            # Retries are handled by UpstreamCaller, not by spotipy's session
+            sp = spotipy.Spotify(auth_manager=auth_manager, retries=0, status_retries=0,
+                                 requests_timeout=self.spotify_timeout)
+            self.token_refresher = TokenRefresher(
+                auth_manager,
+                token_cache,
+                refresh_margin=float(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN_S', '300')),
             )
-            sp = spotipy.Spotify(auth_manager=auth_manager)
+            self.token_refresher.start()
             logger.info("Spotify client initialized successfully.")
             return sp
         except Exception as e:
@@ -69,42 +198,80 @@ class SongRecommendationsEngine:
             return None
 
     def _get_spotify_client(self, user_token: str = None):
-        """Create a Spotify client with user token for higher API access"""
+        """Create a Spotify client with user token for higher API access.
+
+        The token is checked with Spotify first (once per token, see
+        _verified_user_id). A verified request is scheduled as its Spotify
+        user; an unverified one keeps its per-address key and uses client
+        credentials.
+        """
         if not user_token:
             logger.info("No user token provided, using client credentials")
             return self.spotify_client
 
+        user_id = self._verified_user_id(user_token)
+        if user_id is None:
+            logger.info("User token could not be verified, using client credentials")
+            return self.spotify_client
+        current_user.set(verified_user_key(user_id))
         try:
-            # When using a user's access token, pass it directly as auth parameter
-            sp = spotipy.Spotify(auth=user_token)
-            # Test the token by making a simple API call
-            sp.current_user()
-            logger.info("Successfully created Spotify client with user token")
-            return sp
+            # When using a user's access token, pass it directly as auth parameter.
+            # A 401 on a later call (expired token) falls back to client
+            # credentials for that call only (see _spotify_call).
+            return spotipy.Spotify(auth=user_token, retries=0, status_retries=0, requests_timeout=self.spotify_timeout)
         except Exception as e:
             logger.warning(f"Failed to create user Spotify client: {e}. Falling back to client credentials.")
             return self.spotify_client
 
-    def _init_groq_client(self) -> Optional[Groq]:
+    def _verified_user_id(self, user_token: str) -> Optional[str]:
+        """The Spotify user id a token belongs to, or None if Spotify did not confirm one.
+
+        The lookup runs under the caller's per-address key, so minting fresh
+        tokens buys no extra share of upstream calls. Rejected tokens are
+        remembered; transient failures are not.
+        """
+        token_hash = hashlib.sha256(user_token.encode()).hexdigest()
+        user_id = self.user_identities.get(token_hash)
+        if user_id is not None:
+            return user_id or None
+        try:
+            client = spotipy.Spotify(auth=user_token, retries=0, status_retries=0, requests_timeout=self.spotify_timeout)
+            profile = self.upstream.call('me', lambda sp: sp.current_user(), client,
+                                         breaker='spotify:me', scheduler=self.spotify_scheduler)
+            user_id = (profile or {}).get('id') or ''
+        except Overloaded:
+            raise
+        except Exception as e:
+            if classify_error(e) in RETRYABLE or isinstance(e, CircuitOpenError):
+                logger.warning(f"Could not verify user token: {e}")
+                return None
+            user_id = ''
+        self.user_identities.put(token_hash, user_id)
+        return user_id or None
+
+    def _spotify_call(self, op: str, fn, spotify_client):
+        """Run one Spotify call with retries and per-call client-credentials fallback"""
+        return self.upstream.call(op, fn, spotify_client, fallback_client=self.spotify_client,
+                                  breaker=f"spotify:{op}", scheduler=self.spotify_scheduler)
+
+    def _init_groq_client(self) -> Optional['groq.Groq']:
         try:
             api_key = os.getenv('GROQ_API_KEY')
             if not api_key:
                 logger.warning("GROQ_API_KEY not set; Groq features disabled.")
                 return None
-            client = Groq(api_key=api_key)
+            # UpstreamCaller is the only retry and timeout policy; the SDK's own
+            # defaults (2 retries, 60 s per attempt) would multiply under it
+            client = groq.Groq(api_key=api_key, max_retries=0, timeout=self.groq_timeout)
             logger.info("Groq client initialized successfully.")
             return client
         except Exception as e:
             logger.error(f"Failed to initialize Groq client: {e}")
             return None
 
-    def _normalize_genre(self, text: str) -> Optional[str]:
-        if not text:
-            return None
-        text_lower = text.strip().lower()
-        text_lower = text_lower.capitalize()
-        
-        return text_lower.split(',')[0].split('\n')[0].strip(' .') or None
+    def prompt_cache_key(self, prompt: str) -> str:
+        """prompt_genre_cache key; includes the registry version so a new genre list starts cold."""
+        return f"{self.genre_registry.version}:{normalize_prompt(prompt)}"
 
     def _genre_from_prompt_via_groq(
     self,
@@ -113,91 +280,156 @@ class SongRecommendationsEngine:
 ) -> Optional[str]:
         """Query Groq for a genre using only the allowed genres."""
 
-        if not self.groq_client:
-            return None
-
         if allowed_genres is None:
-            allowed_genres = self.allowed_genres or set()
+            catalogue = self.genre_catalogue
+        else:
+            catalogue = compile_catalogue(frozenset(allowed_genres))
 
-        if not allowed_genres:
+        if not len(catalogue):
             logger.warning("No allowed genres provided.")
             return None
 
-        try:
-            model = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
-
-            full_prompt = f"""
-            You are a music genre selector. Your job is to imagine what the user prompt would be like a choose the best fitting genre.
-            Return exactly one genre from this list and do not invent new genres: {sorted(list(allowed_genres))}.
-            Return only the genre name from the list. If unsure, respond with "none".
-            No extra words, no explanations. Example: "rock", not "Rock music".
+        if not self.groq_client:
+            return self._local_genre_fallback(prompt, catalogue)
 
-            User said: "{prompt}"
+        if allowed_genres is None:
+            self.popularity.record(PROMPT, normalize_prompt(prompt))
+            cached = self.prompt_genre_cache.get(self.prompt_cache_key(prompt))
+            if cached is not None:
+                return cached
 
-            Respond with exactly one genre name from the list only.
-            """
+        if allowed_genres is None:
+            if self.genre_batcher:
+                try:
+                    return self.genre_batcher.submit(prompt)
+                except Overloaded:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Groq batch genre extraction failed: {e}")
+                    return self._local_genre_fallback(prompt, self.genre_catalogue)
+            return self._classify_genre_single(prompt)
+        return self._classify_genre_single(prompt, catalogue)
+
+    def _shortlist_catalogue(self, prompt: str) -> GenreCatalogue:
+        """Catalogue of just the genres closest to the prompt, or the full one when none stands out"""
+        if self.genre_shortlist_size <= 0:
+            return self.genre_catalogue
+        ranked = self.genre_vectors.shortlist(prompt, self.genre_shortlist_size)
+        if not ranked or ranked[0][1] < SHORTLIST_MIN_SCORE:
+            return self.genre_catalogue
+        return compile_catalogue(frozenset(genre for genre, _ in ranked))
+
+    def _classify_genre_single(self, prompt: str, catalogue: GenreCatalogue = None) -> Optional[str]:
+        """One Groq completion for one prompt.
+
+        Without an explicit catalogue the model sees the prompt's shortlist of
+        genres (the full list when shortlisting is off), and the answer is
+        cached. When nothing on a shortlist fits, the model is asked once more
+        with the full list.
+        """
+        shared = catalogue is None
+        if shared:
+            catalogue = self._shortlist_catalogue(prompt)
+        try:
+            model = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
+            full_prompt = catalogue.build_prompt(prompt)
 
-            completion = self.groq_client.chat.completions.create(
+            completion = self.upstream.call('groq_completion', lambda client: client.chat.completions.create(
                 model=model,
                 messages=[{"role": "user", "content": full_prompt}],
                 temperature=0.2,
-                max_tokens=8,
+                max_tokens=4,  # a genre code, or at most a short genre name
                 top_p=1,
                 stream=False,
-            )
-
-            content = completion.choices[0].message.content.strip().lower()
-            normalized = self._normalize_genre(content)
-            return normalized
-
+            ), self.groq_client, breaker='groq:chat', scheduler=self.groq_scheduler)
+
+            content = completion.choices[0].message.content
+            genre = catalogue.parse(content)
+            if genre is None and shared and catalogue is not self.genre_catalogue:
+                # Nothing on the shortlist fit; the keyword ranking may have missed the right genre
+                logger.info("No genre on the prompt's shortlist fit; asking again with every genre")
+                genre = self._classify_genre_single(prompt, self.genre_catalogue)
+            if genre and shared:
+                self.prompt_genre_cache.put(self.prompt_cache_key(prompt), genre)
+            return genre
+
+        except Overloaded:
+            raise
         except Exception as e:
             logger.warning(f"Groq genre extraction failed: {e}")
-            return None
+            return self._local_genre_fallback(prompt, self.genre_catalogue if shared else catalogue)
+
+    def _local_genre_fallback(self, prompt: str, catalogue: GenreCatalogue) -> Optional[str]:
+        """Genre named in the prompt, else its closest genre by keywords; used when Groq can't answer"""
+        genre = catalogue.match_in_text(prompt)
+        if not genre:
+            best = self.genre_vectors.shortlist(prompt, 1, within=catalogue.genres)
+            if best and best[0][1] >= FALLBACK_MIN_SCORE:
+                genre = best[0][0]
+        if genre:
+            logger.info(f"Using local genre fallback: {genre}")
+        return genre
+
+    def _classify_genre_batch(self, prompts: List[str]) -> Dict[int, Optional[str]]:
+        """One structured Groq completion for several prompts; raises on failure.
+
+        Slots the model left out are absent from the result (the batcher
+        classifies them singly); slots it answered without a usable genre get
+        the local fallback.
+        """
+        catalogue = self.genre_catalogue
+        model = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
+        batch_prompt = catalogue.build_batch_prompt(prompts)
+        # Scheduled as the batch's own flow, not as the user whose thread happens to lead it
+        attribution = current_user.set(BATCH_USER)
+        try:
+            completion = self.upstream.call('groq_batch_completion', lambda client: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": batch_prompt}],
+                temperature=0.2,
+                max_tokens=6 * len(prompts),
+                top_p=1,
+                stream=False,
+            ), self.groq_client, breaker='groq:chat', scheduler=self.groq_scheduler)
+        finally:
+            current_user.reset(attribution)
+        content = completion.choices[0].message.content
+        genres = catalogue.parse_batch(content, len(prompts))
+        for index, genre in genres.items():
+            if genre:
+                self.prompt_genre_cache.put(self.prompt_cache_key(prompts[index]), genre)
+            else:
+                # "0" or an answer that names no genre: same local fallback as a single call
+                genres[index] = self._local_genre_fallback(prompts[index], catalogue)
+        return genres
 
     def find_artists_by_genre(self, genre: str, user_token: str = None, limit: int = 6) -> List[Dict]:
+        return list(self.iter_artists_by_genre(genre, user_token=user_token, limit=limit))
+
+    def iter_artists_by_genre(self, genre: str, user_token: str = None, limit: int = 6) -> Iterator[Dict]:
+        """Yield artists for a genre as soon as each one has been filtered"""
+        self.popularity.record(GENRE, genre)
         spotify_client = self._get_spotify_client(user_token)
         if not spotify_client:
             logger.error("No Spotify client available")
-            return []
+            return
         try:
-            query = f'genre:"{genre}"'
-            search_res = spotify_client.search(q=query, type='artist', limit=50)
-            artist_items = (search_res.get('artists') or {}).get('items', [])
-            results = []
-            for a in artist_items:
-                if not a:
-                    continue
-                popularity = a.get('popularity', 0)
-                images = a.get('images') or []
-                image_url = images[0]['url'] if images else None
-                results.append({
-                    "id": a.get('id'),
-                    "name": a.get('name'),
-                    "artist": genre,
-                    "album": "",
-                    "imageUrl": image_url,
-                    "popularity": popularity
-                })
-                if len(results) >= limit:
-                    break
-            return results
-        except SpotifyException as e:
+            for record in self._search_genre_artists(spotify_client, genre)[:limit]:
+                yield record.to_dict(genre)
+        except spotipy_exceptions.SpotifyException as e:
             logger.error(f"Spotify API error finding artists by genre: {e.http_status} - {e.msg}")
-            if e.http_status == 401 and user_token and spotify_client != self.spotify_client:
-                logger.info("Retrying with client credentials...")
-                return self.find_artists_by_genre(genre, user_token=None, limit=limit)
-            return []
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error finding artists by genre: {type(e).__name__} - {e}")
-            return []
 
     def get_song_tempo(self, song_id: str, user_token: str = None) -> Optional[float]:
         """Get the tempo of a song"""
         # Check cache first
-        if song_id in self.song_cache:
-            cached_tempo = self.song_cache[song_id].get('tempo')
-            logger.info(f"Returning cached tempo for {song_id}: {cached_tempo} BPM")
-            return cached_tempo
+        cached_features = self._cached_features(song_id)
+        if cached_features is not None:
+            logger.info(f"Returning cached tempo for {song_id}: {cached_features.tempo} BPM")
+            return cached_features.tempo
 
         # Try user token first, then fall back to client credentials
         spotify_client = self._get_spotify_client(user_token)
@@ -209,62 +441,58 @@ class SongRecommendationsEngine:
         try:
             # First verify the track exists
             logger.info(f"Fetching track info for {song_id}")
-            track = spotify_client.track(song_id)
-            logger.info(f"Track found: {track['name']} by {track['artists'][0]['name']}")
+            track = self._get_track_record(spotify_client, song_id)
+            if not track:
+                logger.error(f"Track {song_id} not found or has no artists")
+                return None
+            logger.info(f"Track found: {track.name} by {track.artist}")
             
             # Then get audio features
             logger.info(f"Fetching audio features for {song_id}")
-            features = spotify_client.audio_features([song_id])
+            features = self._spotify_call(
+                'audio_features', lambda sp: sp.audio_features([song_id]), spotify_client
+            )
+            
+            if (not features or not features[0]) and spotify_client is not self.spotify_client:
+                # Only this call is repeated with client credentials; the track lookup is kept
+                logger.info("No audio features with user token, retrying this call with client credentials...")
+                features = self._spotify_call(
+                    'audio_features', lambda sp: sp.audio_features([song_id]), self.spotify_client
+                )
             
             if not features or not features[0]:
                 logger.error(f"No audio features returned for {song_id}")
-                # If using user token and it failed, try with client credentials
-                if user_token and spotify_client != self.spotify_client:
-                    logger.info("Retrying with client credentials...")
-                    return self.get_song_tempo(song_id, user_token=None)
                 return None
                 
             feature_data = features[0]
             
-            if not feature_data:
-                logger.error(f"Audio features data is None for {song_id}")
-                if user_token and spotify_client != self.spotify_client:
-                    logger.info("Retrying with client credentials...")
-                    return self.get_song_tempo(song_id, user_token=None)
-                return None
-            
-            tempo = feature_data.get('tempo')
+            audio_features = AudioFeatures.from_spotify(feature_data)
+            tempo = audio_features.tempo
             
             if tempo is None:
                 logger.error(f"Tempo field is None in audio features for {song_id}")
                 logger.error(f"Available features: {list(feature_data.keys())}")
                 return None
             
-            # Cache the tempo
-            self.song_cache[song_id] = {'tempo': tempo}
+            # Cache the compact features record
+            self.song_cache.put(song_id, audio_features)
             logger.info(f"Successfully fetched tempo for {song_id}: {tempo} BPM")
             return tempo
             
-        except SpotifyException as e:
+        except spotipy_exceptions.SpotifyException as e:
             logger.error(f"Spotify API error for {song_id}: {e.http_status} - {e.msg}")
-            # If unauthorized and using user token, retry with client credentials
-            if e.http_status == 401 and user_token and spotify_client != self.spotify_client:
-                logger.info("Token unauthorized, retrying with client credentials...")
-                return self.get_song_tempo(song_id, user_token=None)
-            elif e.http_status == 404:
+            if e.http_status == 404:
                 logger.error(f"Track {song_id} not found. Check if the ID is valid.")
             elif e.http_status == 429:
-                logger.error(f"Rate limit exceeded. Wait before retrying.")
+                logger.error("Rate limit exceeded after retries.")
             return None
         except IndexError as e:
             logger.error(f"Index error fetching features for {song_id}: {e}")
             return None
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error fetching tempo for {song_id}: {type(e).__name__} - {e}")
-            # Last resort: try with client credentials if we were using user token
-            if user_token and spotify_client != self.spotify_client:
-                logger.info("Unexpected error, retrying with client credentials...")
-                return self.get_song_tempo(song_id, user_token=None)
             return None
 
     def find_songs_by_tempo(self, target_tempo: float, user_token: str = None) -> List[Dict]:
@@ -278,62 +506,214 @@ class SongRecommendationsEngine:
         try:
             # Use Spotify's recommendations API with tempo target
             logger.info(f"Fetching recommendations for tempo: {target_tempo} BPM")
-            recs = spotify_client.recommendations(
+            recs = self._spotify_call('recommendations', lambda sp: sp.recommendations(
                 seed_tracks=['4iV5W9uYEdYUVa79Axb7Rh'],  # Hotel California as seed
                 limit=20,  # Get more to filter by tempo
                 target_tempo=target_tempo,
                 min_tempo=max(0, target_tempo - 10),
                 max_tempo=target_tempo + 10
-            )
+            ), spotify_client)
             
             recommendations = []
             for track in recs.get("tracks", []):
-                recommendations.append({
-                    "id": track["id"],
-                    "name": track["name"],
-                    "artist": track["artists"][0]["name"],
-                    "album": track["album"]["name"],
-                    "imageUrl": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
-                })
+                record = TrackRecord.from_spotify(track)
+                self.track_cache.put(record.id, record)
+                recommendations.append(record.to_dict())
             
             # Return first 5 songs
             result = recommendations[:5]
             logger.info(f"Found {len(result)} songs with tempo around {target_tempo} BPM")
             return result
             
-        except SpotifyException as e:
+        except spotipy_exceptions.SpotifyException as e:
             logger.error(f"Spotify API error finding songs by tempo: {e.http_status} - {e.msg}")
-            # Retry with client credentials if user token failed
-            if e.http_status == 401 and user_token and spotify_client != self.spotify_client:
-                logger.info("Retrying with client credentials...")
-                return self.find_songs_by_tempo(target_tempo, user_token=None)
             return []
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error finding songs by tempo: {type(e).__name__} - {e}")
             return []
 
     def get_track_info(self, track_id: str) -> Optional[Dict]:
         """Get basic track information"""
+        cached_track = self._cached_track(track_id)
+        if cached_track is not None:
+            self.prefetch_recommendation_inputs(track_id)
+            return cached_track.to_dict()
+
         if not self.spotify_client:
             return None
             
         try:
-            track = self.spotify_client.track(track_id)
-            return {
-                "id": track["id"],
-                "name": track["name"],
-                "artist": track["artists"][0]["name"],
-                "album": track["album"]["name"],
-                "imageUrl": track["album"]["images"][0]["url"] if track["album"]["images"] else None
-            }
-        except SpotifyException as e:
+            record = self._get_track_record(self.spotify_client, track_id)
+            if record is None:
+                return None
+            self.prefetch_recommendation_inputs(track_id)
+            return record.to_dict()
+        except spotipy_exceptions.SpotifyException as e:
             logger.error(f"Spotify API error fetching track {track_id}: {e.http_status} - {e.msg}")
             return None
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error fetching track info for {track_id}: {type(e).__name__} - {e}")
             return None
 
-    def get_recommendations(self, selected_song_id: str = None, user_token: str = None) -> Dict:
+    def prefetch_recommendation_inputs(self, track_id: str) -> None:
+        """Warm the artist and genre-search caches a /recommendations call for this track will read"""
+        if self.prefetcher and self.spotify_client:
+            self.prefetcher.schedule(('recommendation_inputs', track_id),
+                                     lambda budget: self._prefetch_recommendation_inputs(track_id, budget))
+
+    def _prefetch_recommendation_inputs(self, track_id: str, budget: CallBudget) -> None:
+        track = self._cached_track(track_id)
+        if track is None or not track.artist_id:
+            return
+        artist = self._cached_artist(track.artist_id)
+        if artist is None:
+            if not budget.try_spend():
+                return
+            artist = self._get_artist_record(self.spotify_client, track.artist_id)
+        fanout = max(1, int(os.getenv('RECOMMENDATION_GENRE_FANOUT', '1')))
+        for genre in artist.genres[:fanout]:
+            if self.genre_artist_cache.get(genre) is not None:
+                continue
+            if not budget.try_spend():
+                return
+            self._search_genre_artists(self.spotify_client, genre)
+
+    def _cached_track(self, track_id: str) -> Optional[TrackRecord]:
+        """A track from the cache or the catalog snapshot, without calling Spotify"""
+        record = self.track_cache.get(track_id)
+        if record is None and self.catalog_snapshot is not None:
+            record = self.catalog_snapshot.track(track_id)
+        return record
+
+    def _cached_artist(self, artist_id: str) -> Optional[ArtistRecord]:
+        """An artist from the cache or the catalog snapshot, without calling Spotify"""
+        record = self.artist_cache.get(artist_id)
+        if record is None and self.catalog_snapshot is not None:
+            record = self.catalog_snapshot.artist(artist_id)
+        return record
+
+    def _cached_features(self, song_id: str) -> Optional[AudioFeatures]:
+        """Audio features from the cache or the catalog snapshot, without calling Spotify"""
+        features = self.song_cache.get(song_id)
+        if features is None and self.catalog_snapshot is not None:
+            features = self.catalog_snapshot.features(song_id)
+        return features
+
+    def has_track(self, track_id: str) -> bool:
+        """Whether track info can be served without calling Spotify"""
+        return self._cached_track(track_id) is not None
+
+    def _get_track_record(self, spotify_client, track_id: str) -> Optional[TrackRecord]:
+        """Fetch a track through the cache, storing it as a compact record"""
+        record = self._cached_track(track_id)
+        if record is not None:
+            return record
+        track = self._spotify_call('track', lambda sp: sp.track(track_id), spotify_client)
+        if not track or not track.get('artists'):
+            return None
+        record = TrackRecord.from_spotify(track)
+        self.track_cache.put(track_id, record)
+        return record
+
+    def _get_artist_record(self, spotify_client, artist_id: str) -> ArtistRecord:
+        """Fetch an artist through the cache, storing it as a compact record"""
+        record = self._cached_artist(artist_id)
+        if record is not None:
+            return record
+        artist = self._spotify_call('artist', lambda sp: sp.artist(artist_id), spotify_client)
+        record = ArtistRecord.from_spotify(artist)
+        self.artist_cache.put(artist_id, record)
+        if self.artist_graph is not None:
+            self.artist_graph.add_artist(record)
+        return record
+
+    def _search_genre_artists(self, spotify_client, genre: str, use_cache: bool = True) -> List[ArtistRecord]:
+        """Spotify genre search as compact records.
+
+        Results are reused for GENRE_SEARCH_TTL_S, and served past that when the
+        search circuit is open or the upstream keeps failing.
+        """
+        cached = self.genre_artist_cache.get(genre) if use_cache else None
+        if cached is not None:
+            return list(cached)
+        query = f'genre:"{self.genre_registry.search_term_for(genre)}"'
+        try:
+            search_res = self._spotify_call(
+                'search', lambda sp: sp.search(q=query, type='artist', limit=50), spotify_client
+            )
+        except Exception as e:
+            stale = self.genre_artist_cache.get_stale(genre)
+            if stale is not None and (isinstance(e, (CircuitOpenError, Overloaded)) or classify_error(e) in RETRYABLE):
+                logger.warning(f"Serving cached artists for genre '{genre}' after search failure: {e}")
+                return list(stale)
+            raise
+        artist_items = (search_res.get('artists') or {}).get('items', [])
+        records = [ArtistRecord.from_spotify(a) for a in artist_items if a]
+        self.genre_artist_cache.put(genre, tuple(records))
+        if self.artist_graph is not None:
+            self.artist_graph.add_search_results(genre, records)
+        return records
+
+    def _search_genre_candidates(self, spotify_client, genre: str, exclude_id: str) -> List[ArtistRecord]:
+        """Artists from one genre search within popularity 25-75, excluding the seed artist"""
+        return [
+            record for record in self._search_genre_artists(spotify_client, genre)
+            if record.id != exclude_id and 25 <= (record.popularity or 0) <= 75
+        ]
+
+    def _fan_out_genre_search(self, spotify_client, seed_artist: ArtistRecord, genres: List[str], want: int) -> TopCandidates:
+        """Search several seed genres concurrently and merge candidates into a bounded top-k.
+
+        Returns as soon as enough candidates have been collected; searches still in
+        flight are abandoned.
+        """
+        top = TopCandidates(want, seed_artist.popularity, seed_artist.genres)
+        futures = {}
+        try:
+            futures = {
+                # Each search runs in the request's context so it is scheduled as that user's work
+                self.fanout_executor.submit(contextvars.copy_context().run, self._search_genre_candidates,
+                                spotify_client, genre, seed_artist.id): genre
+                for genre in genres
+            }
+            for future in as_completed(futures):
+                genre = futures[future]
+                try:
+                    top.offer_all(future.result(), genre)
+                except spotipy_exceptions.SpotifyException as e:
+                    logger.warning(f"Genre search for '{genre}' failed: {e.http_status} - {e.msg}")
+                except CircuitOpenError as e:
+                    logger.warning(f"Genre search for '{genre}' skipped: {e}")
+                except Overloaded:
+                    raise
+                except Exception as e:
+                    # One broken genre must not cost the request the others' candidates
+                    logger.warning(f"Genre search for '{genre}' failed: {type(e).__name__} - {e}")
+                if top.full:
+                    break
+        finally:
+            # Searches that haven't started yet are dropped; running ones finish into the cache
+            for future in futures:
+                future.cancel()
+        return top
+
+    def get_recommendations(self, selected_song_id: str = None, user_token: str = None,
+                            genre_fanout: int = None) -> Dict:
+        """Recommend artists near the seed track's primary artist.
+
+        With ``genre_fanout`` > 1 (default from RECOMMENDATION_GENRE_FANOUT, capped
+        at RECOMMENDATION_MAX_GENRE_FANOUT) the seed artist's top genres are
+        searched concurrently and merged by popularity closeness and genre
+        overlap, instead of relying on the first genre alone.
+        """
+        if genre_fanout is None:
+            genre_fanout = int(os.getenv('RECOMMENDATION_GENRE_FANOUT', '1'))
+        genre_fanout = min(max(1, int(genre_fanout)), self.max_genre_fanout)
+
         if not selected_song_id:
             return {"success": False, "error": "No song ID provided", "seed_song_id": None}
 
@@ -347,57 +727,43 @@ class SongRecommendationsEngine:
 
         try:
             # 1) Get the track and its primary artist
-            track = spotify_client.track(selected_song_id)
-            if not track or not track.get('artists'):
+            track = self._get_track_record(spotify_client, selected_song_id)
+            if not track or not track.artist_id:
                 error_msg = f"Track not found or has no artists: {selected_song_id}"
                 logger.error(error_msg)
                 return {"success": False, "error": error_msg, "seed_song_id": selected_song_id}
 
-            primary_artist = track['artists'][0]
-            primary_artist_id = primary_artist['id']
+            primary_artist_id = track.artist_id
+            self.popularity.record(SEED_ARTIST, primary_artist_id)
 
             # 2) Fetch the artist details to get genres and popularity
-            artist_obj = spotify_client.artist(primary_artist_id)
-            artist_genres = artist_obj.get('genres', [])
-            artist_popularity = artist_obj.get('popularity')
-            logger.info(f"Seed artist: {artist_obj.get('name')} (pop {artist_popularity}), genres: {artist_genres}")
+            artist_obj = self._get_artist_record(spotify_client, primary_artist_id)
+            artist_genres = artist_obj.genres
+            artist_popularity = artist_obj.popularity
+            logger.info(f"Seed artist: {artist_obj.name} (pop {artist_popularity}), genres: {list(artist_genres)}")
 
             if not artist_genres:
-                error_msg = f"Seed artist has no genres: {artist_obj.get('name')}"
+                error_msg = f"Seed artist has no genres: {artist_obj.name}"
                 logger.warning(error_msg)
                 return {"success": False, "error": error_msg, "seed_song_id": selected_song_id}
 
             top_genre = artist_genres[0]
 
-            # 3) Search for artists by the top genre
-            # Use Spotify search with genre filter
-            query = f'genre:"{top_genre}"'
-            search_res = spotify_client.search(q=query, type='artist', limit=50)
-            artist_items = (search_res.get('artists') or {}).get('items', [])
-
-            # 4) Filter artists by popularity between 25 and 75 (inclusive) and exclude the seed artist
-            filtered = []
-            for a in artist_items:
-                if not a:
-                    continue
-                if a.get('id') == primary_artist_id:
-                    continue
-                popularity = a.get('popularity', 0)
-                if 25 <= popularity <= 75:
-                    images = a.get('images') or []
-                    image_url = images[0]['url'] if images else None
-                    # Reuse the existing front-end shape: name, artist, album, imageUrl
-                    # - name: artist name
-                    # - artist: top genre string
-                    # - album: empty for artists
-                    filtered.append({
-                        "id": a.get('id'),
-                        "name": a.get('name'),
-                        "artist": top_genre,
-                        "album": "",
-                        "imageUrl": image_url,
-                        "popularity": popularity
-                    })
+            from_graph = self._graph_recommendations(artist_obj, list(artist_genres[:genre_fanout]),
+                                                     selected_song_id)
+            if from_graph:
+                return from_graph
+
+            if genre_fanout > 1:
+                return self._fanned_out_recommendations(
+                    spotify_client, artist_obj, list(artist_genres[:genre_fanout]), selected_song_id
+                )
+
+            # 3) Search for artists by the top genre, then
+            # 4) filter by popularity between 25 and 75 (inclusive) and exclude the seed artist
+            candidates = self._search_genre_candidates(spotify_client, top_genre, primary_artist_id)
+            # Reuse the existing front-end shape (see ArtistRecord.to_dict)
+            filtered = [record.to_dict(top_genre) for record in candidates]
 
             # 5) Take the first 5
             recommendations = filtered[:5]
@@ -416,13 +782,56 @@ class SongRecommendationsEngine:
                 "artist_based": True
             }
 
-        except SpotifyException as e:
+        except spotipy_exceptions.SpotifyException as e:
             logger.error(f"Spotify API error in artist-based recommendations: {e.http_status} - {e.msg}")
-            # Retry with client credentials if user token failed
-            if e.http_status == 401 and user_token and spotify_client != self.spotify_client:
-                logger.info("Retrying with client credentials for artist-based recommendations...")
-                return self.get_recommendations(selected_song_id, user_token=None)
             return {"success": False, "error": f"Spotify error: {e.msg}", "seed_song_id": selected_song_id}
+        except CircuitOpenError as e:
+            logger.error(f"Spotify circuit open in artist-based recommendations: {e}")
+            return {"success": False, "error": "Spotify is temporarily unavailable", "seed_song_id": selected_song_id}
+        except Overloaded:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error in artist-based recommendations: {type(e).__name__} - {e}")
-            return {"success": False, "error": "Internal error creating recommendations", "seed_song_id": selected_song_id}
\ No newline at end of file
+            return {"success": False, "error": "Internal error creating recommendations", "seed_song_id": selected_song_id}
+
+    def _graph_recommendations(self, seed_artist: ArtistRecord, genres: List[str],
+                               selected_song_id: str) -> Optional[Dict]:
+        """Recommendations from the local artist graph, or None if it doesn't know enough artists yet."""
+        if self.artist_graph is None:
+            return None
+        related = self.artist_graph.related(seed_artist, genres, k=5, lookup=self._cached_artist)
+        if len(related) < 5:
+            return None
+        logger.info(f"Found {len(related)} artist recommendations in the artist graph for genres {genres}")
+        result = {
+            "success": True,
+            "songs": [record.to_dict(genre) for record, genre in related],
+            "seed_song_id": selected_song_id,
+            "genre": genres[0],
+            "artist_based": True,
+            "source": "artist_graph",
+        }
+        if len(genres) > 1:
+            result["genres"] = genres
+        return result
+
+    def _fanned_out_recommendations(self, spotify_client, seed_artist: ArtistRecord, genres: List[str],
+                                    selected_song_id: str) -> Dict:
+        top = self._fan_out_genre_search(spotify_client, seed_artist, genres, want=5)
+        recommendations = [record.to_dict(genre) for record, genre in top.ranked()]
+
+        if not recommendations:
+            error_msg = f"No artists found in genres {genres} within popularity 25-75"
+            logger.warning(error_msg)
+            return {"success": False, "error": error_msg, "seed_song_id": selected_song_id,
+                    "genre": genres[0], "genres": genres}
+
+        logger.info(f"Found {len(recommendations)} artist recommendations across genres {genres}")
+        return {
+            "success": True,
+            "songs": recommendations,
+            "seed_song_id": selected_song_id,
+            "genre": genres[0],
+            "genres": genres,
+            "artist_based": True
+        }
\ No newline at end of file
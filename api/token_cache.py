@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from spotipy.cache_handler import CacheHandler
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on this platform; caching still works per process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryTokenCache(CacheHandler):
+    """Process-local token cache (spotipy's behaviour without the .cache file)."""
+
+    def __init__(self):
+        self._token_info: Optional[Dict] = None
+
+    def get_cached_token(self):
+        return self._token_info
+
+    def save_token_to_cache(self, token_info):
+        self._token_info = token_info
+
+
+class SharedFileTokenCache(CacheHandler):
+    """Client-credentials token shared by every worker process on the host.
+
+    The token lives in one JSON file guarded by an flock'd lock file. Reads are
+    memoized per process and only hit the file again when its mtime changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self._token_info: Optional[Dict] = None
+        self._mtime: Optional[float] = None
+        self._thread_lock = threading.RLock()
+        self._held = 0  # nesting depth, so a save inside a locked refresh doesn't re-lock
+
+    @contextmanager
+    def locked(self, blocking: bool = True):
+        """Hold the cross-process lock; yields False if non-blocking and it is taken."""
+        if not self._thread_lock.acquire(blocking=blocking):
+            yield False
+            return
+        try:
+            fd = None
+            if fcntl is not None and not self._held:
+                try:
+                    fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+                except OSError as e:
+                    # Unwritable directory: the lock still serializes this process's threads
+                    logger.warning(f"Could not open token cache lock {self.lock_path}: {e}")
+            if fd is None:
+                self._held += 1
+                try:
+                    yield True
+                finally:
+                    self._held -= 1
+                return
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+                self._held += 1
+                try:
+                    yield True
+                finally:
+                    self._held -= 1
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+        finally:
+            self._thread_lock.release()
+
+    def get_cached_token(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return self._token_info
+        if mtime != self._mtime:
+            try:
+                with open(self.path, 'r') as f:
+                    self._token_info = json.load(f)
+                self._mtime = mtime
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read shared token cache {self.path}: {e}")
+        return self._token_info
+
+    def save_token_to_cache(self, token_info):
+        self._token_info = token_info
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            with self.locked():
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.spotify-token-')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(token_info, f)
+                os.replace(tmp_path, self.path)
+                self._mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logger.warning(f"Could not write shared token cache {self.path}: {e}")
+
+
+class TokenRefresher:
+    """Refreshes the client-credentials token in the background before it expires.
+
+    spotipy only fetches a new token once the cached one is within 60s of
+    expiry, on the request thread. Refreshing ``refresh_margin`` seconds
+    earlier keeps requests from ever blocking on accounts.spotify.com. With a
+    shared file cache only one process per host refreshes; the rest see the
+    new token through the file.
+    """
+
+    def __init__(self, auth_manager, cache: CacheHandler, refresh_margin: float = 300.0,
+                 max_sleep: float = 600.0, retry_delay: float = 15.0):
+        self.auth_manager = auth_manager
+        self.cache = cache
+        self.refresh_margin = refresh_margin
+        self.max_sleep = max_sleep
+        self.retry_delay = retry_delay
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='spotify-token-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def seconds_left(self) -> float:
+        token_info = self.cache.get_cached_token()
+        if not token_info or 'expires_at' not in token_info:
+            return 0.0
+        return token_info['expires_at'] - time.time()
+
+    def refresh_if_due(self) -> bool:
+        """Fetch a new token when inside the refresh margin; returns True if one was fetched."""
+        if self.seconds_left() > self.refresh_margin:
+            return False
+        locked = self.cache.locked(blocking=False) if isinstance(self.cache, SharedFileTokenCache) else None
+        if locked is None:
+            return self._fetch()
+        with locked as acquired:
+            # Another process is refreshing, or already has since we last looked
+            if not acquired or self.seconds_left() > self.refresh_margin:
+                return False
+            return self._fetch()
+
+    def _fetch(self) -> bool:
+        self.auth_manager.get_access_token(as_dict=False, check_cache=False)
+        logger.info("Refreshed Spotify client-credentials token in the background")
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh_if_due()
+                delay = min(self.max_sleep, max(self.retry_delay, self.seconds_left() - self.refresh_margin))
+            except Exception as e:
+                logger.warning(f"Background Spotify token refresh failed: {e}")
+                delay = self.retry_delay
+            self._stop.wait(delay)
+
+
+def build_token_cache(client_id: str) -> CacheHandler:
+    """Token cache selected by SPOTIFY_TOKEN_CACHE ('file', the default, or 'memory')."""
+    kind = os.getenv('SPOTIFY_TOKEN_CACHE', 'file').lower()
+    if kind == 'memory':
+        return MemoryTokenCache()
+    default_path = os.path.join(
+        tempfile.gettempdir(),
+        f"vibecheck-spotify-token-{hashlib.sha256(client_id.encode()).hexdigest()[:12]}.json",
+    )
+    return SharedFileTokenCache(os.getenv('SPOTIFY_TOKEN_CACHE_PATH', default_path))
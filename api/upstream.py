@@ -0,0 +1,135 @@
+import logging
+import random
+import sys
+import time
+from typing import Callable, Optional, TypeVar
+
+from circuit_breaker import BreakerRegistry
+from fair_scheduler import FairScheduler
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Error classes returned by classify_error
+UNAUTHORIZED = 'unauthorized'
+NOT_FOUND = 'not_found'
+RATE_LIMITED = 'rate_limited'
+SERVER_ERROR = 'server_error'
+NETWORK_ERROR = 'network_error'
+CLIENT_ERROR = 'client_error'
+
+RETRYABLE = {RATE_LIMITED, SERVER_ERROR, NETWORK_ERROR}
+
+
+def error_status(exc: Exception) -> Optional[int]:
+    """HTTP status of a spotipy (http_status) or Groq (status_code) error."""
+    status = getattr(exc, 'http_status', None)
+    if status is None:
+        status = getattr(exc, 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(exc: Exception) -> str:
+    status = error_status(exc)
+    if status == 401:
+        return UNAUTHORIZED
+    if status == 404:
+        return NOT_FOUND
+    if status == 429:
+        return RATE_LIMITED
+    if status is not None and status >= 500:
+        return SERVER_ERROR
+    if status is None and isinstance(exc, (OSError, TimeoutError)):
+        # requests' connection and timeout errors derive from OSError
+        return NETWORK_ERROR
+    if status is None and _is_groq_connection_error(exc):
+        return NETWORK_ERROR
+    return CLIENT_ERROR
+
+
+def _is_groq_connection_error(exc: Exception) -> bool:
+    """Groq's timeout and connection errors (httpx-based, so not OSError)."""
+    # groq is imported lazily; if it isn't loaded yet, no Groq call has raised
+    groq = sys.modules.get('groq')
+    return groq is not None and isinstance(exc, groq.APIConnectionError)
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    headers = getattr(exc, 'headers', None)
+    if headers is None:
+        response = getattr(exc, 'response', None)
+        headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamCaller:
+    """Retry/fallback policy applied to one upstream call at a time.
+
+    - 401 with a user client: the same call is retried once with the fallback
+      (client-credentials) client; nothing else is re-run.
+    - 429, 5xx and network errors: bounded exponential backoff with full jitter,
+      honouring Retry-After when present.
+    - 404 and other client errors: raised immediately.
+
+    When a breaker name is given, every attempt first passes that circuit
+    breaker; an open circuit raises CircuitOpenError without calling upstream.
+    Only retryable errors count as breaker failures.
+
+    When a scheduler is given, each attempt also waits for a slot from that
+    per-user fair scheduler; backoff sleeps don't hold a slot.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0,
+                 sleep: Callable[[float], None] = time.sleep, breakers: Optional[BreakerRegistry] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.breakers = breakers
+
+    def backoff_delay(self, attempt: int, exc: Exception) -> float:
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, op: str, fn: Callable[..., T], client, fallback_client=None, breaker: Optional[str] = None,
+             scheduler: Optional[FairScheduler] = None) -> T:
+        circuit = self.breakers.get(breaker) if self.breakers is not None and breaker else None
+        attempt = 0
+        while True:
+            if circuit:
+                circuit.before_call()
+            try:
+                if scheduler is not None:
+                    with scheduler.slot():
+                        result = fn(client)
+                else:
+                    result = fn(client)
+            except Exception as e:
+                kind = classify_error(e)
+                if circuit:
+                    if kind in RETRYABLE:
+                        circuit.record_failure()
+                    else:
+                        circuit.release()
+                if kind == UNAUTHORIZED and fallback_client is not None and client is not fallback_client:
+                    logger.info(f"{op}: user token rejected, retrying this call with client credentials")
+                    client = fallback_client
+                    continue
+                attempt += 1
+                if kind in RETRYABLE and attempt < self.max_attempts:
+                    delay = self.backoff_delay(attempt, e)
+                    logger.warning(f"{op}: {kind} ({e}); retry {attempt}/{self.max_attempts - 1} in {delay:.2f}s")
+                    self.sleep(delay)
+                    continue
+                raise
+            if circuit:
+                circuit.record_success()
+            return result
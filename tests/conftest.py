@@ -0,0 +1,31 @@
+import os
+import sys
+
+# The API modules import each other flatly, as they do when Vercel runs them
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+import pytest
+
+ENGINE_ENV = {
+    # No credentials, background threads or batching window: tests drive every upstream call
+    'SPOTIFY_CLIENT_ID': '',
+    'SPOTIFY_CLIENT_SECRET': '',
+    'GROQ_API_KEY': '',
+    'HEALTH_PROBE_INTERVAL_S': '0',
+    'GROQ_BATCH_WINDOW_MS': '0',
+    'SPOTIFY_TOKEN_CACHE': 'memory',
+    'RECOMMENDATION_PREFETCH_WORKERS': '0',
+    'CACHE_WARM_INTERVAL_S': '0',
+    'CATALOG_SNAPSHOT_PATH': '',
+    'ARTIST_NEIGHBOURS_PATH': '',
+}
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    for name, value in ENGINE_ENV.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv('POPULARITY_SNAPSHOT_PATH', str(tmp_path / 'popularity.json'))
+    from song_recommendations import SongRecommendationsEngine
+
+    return SongRecommendationsEngine()
@@ -0,0 +1,40 @@
+import pytest
+
+from admission import CHEAP, EXPENSIVE, NORMAL, AdmissionController, Overloaded
+
+
+def test_cheap_is_admitted_while_expensive_is_shed():
+    admission = AdmissionController(max_in_flight=2, max_expensive=1, max_cheap=4, max_queue=0)
+    admission.acquire(EXPENSIVE)
+
+    with pytest.raises(Overloaded) as shed:
+        admission.acquire(EXPENSIVE)
+    admission.acquire(CHEAP)
+    admission.acquire(NORMAL)
+
+    assert shed.value.retry_after >= 1
+    assert admission.snapshot()["in_flight"] == {"cheap": 1, "normal": 1, "expensive": 1}
+    assert admission.snapshot()["rejected"]["expensive"] == 1
+
+
+def test_queued_request_times_out_with_retry_after():
+    admission = AdmissionController(max_in_flight=1, max_queue=4, max_queue_wait=0.05)
+    admission.acquire(NORMAL)
+
+    with pytest.raises(Overloaded) as shed:
+        admission.acquire(NORMAL)
+
+    assert shed.value.retry_after >= 1
+    assert admission.snapshot()["queued"]["normal"] == 0
+
+
+def test_slot_is_released_when_the_request_raises():
+    admission = AdmissionController(max_in_flight=1, max_queue=0)
+
+    with pytest.raises(RuntimeError):
+        with admission.slot(NORMAL):
+            raise RuntimeError("handler failed")
+
+    with admission.slot(NORMAL):
+        assert admission.snapshot()["in_flight"]["normal"] == 1
+    assert admission.snapshot()["in_flight"]["normal"] == 0
@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+
+from artist_graph import ArtistGraph
+from artist_neighbours import ArtistNeighbours
+from build_artist_neighbours import build
+from records import ArtistRecord
+
+ARTISTS = {
+    'seed': (50, ('shoegaze', 'dream pop')),
+    'close': (40, ('shoegaze', 'dream pop')),
+    'near': (60, ('shoegaze',)),
+    'famous': (95, ('shoegaze', 'dream pop')),
+    'elsewhere': (50, ('polka',)),
+}
+
+
+def test_neighbour_table_round_trip():
+    encoded, _ = build(ARTISTS, k=3, workers=1, max_genre_size=100)
+    table = ArtistNeighbours(encoded)
+
+    assert len(table) == len(ARTISTS)
+    assert [artist_id for artist_id, _ in table.neighbours('seed')] == ['close', 'famous', 'near']
+    assert table.neighbours('elsewhere') == []
+    assert table.neighbours('unknown') == []
+
+
+def test_artist_graph_answers_from_the_neighbour_table():
+    encoded, _ = build(ARTISTS, k=3, workers=1, max_genre_size=100)
+    graph = ArtistGraph(neighbours=ArtistNeighbours(encoded))
+    records = {artist_id: ArtistRecord(artist_id, artist_id.title(), popularity, genres)
+               for artist_id, (popularity, genres) in ARTISTS.items()}
+
+    related = graph.related(records['seed'], ['shoegaze', 'dream pop'], k=2, lookup=records.get)
+
+    # 'famous' is a closer neighbour but outside the popularity range
+    assert [(record.id, genre) for record, genre in related] == [('close', 'shoegaze'), ('near', 'shoegaze')]
+    assert len(graph) == 0
@@ -0,0 +1,36 @@
+from catalog_snapshot import CatalogSnapshot, compile_snapshot
+from records import ArtistRecord, AudioFeatures, TrackRecord
+
+
+def test_snapshot_round_trip():
+    tracks = [
+        TrackRecord('t1', 'Só Danço Samba', 'João Gilberto', 'Getz/Gilberto',
+                    image_url='https://i.scdn.co/image/ab67616d0000b273abc', artist_id='a1'),
+        TrackRecord('t2', 'Untitled', 'Nobody', 'Demo'),
+    ]
+    artists = [ArtistRecord('a1', 'João Gilberto', 61, ('bossa nova', 'mpb'),
+                            image_url='https://i.scdn.co/image/ab6761610000e5ebdef')]
+    features = {'t1': AudioFeatures(121.993, energy=0.734, danceability=0.512)}
+
+    snapshot = CatalogSnapshot(compile_snapshot(tracks, artists, features))
+
+    track = snapshot.track('t1')
+    assert track.to_dict() == tracks[0].to_dict()
+    assert track.artist_id == 'a1'
+    assert snapshot.track('t2').image_url is None
+    assert snapshot.track('missing') is None
+    artist = snapshot.artist('a1')
+    assert artist.to_dict('bossa nova') == artists[0].to_dict('bossa nova')
+    assert artist.genres == ('bossa nova', 'mpb')
+    loaded = snapshot.features('t1')
+    assert (loaded.tempo, loaded.energy, loaded.danceability, loaded.valence) == (121.993, 0.734, 0.512, None)
+    assert loaded.to_dict() == features['t1'].to_dict()
+    assert snapshot.features('t2') is None
+
+
+def test_oversized_string_is_cut_on_a_character_boundary():
+    name = 'é' * 40000  # 80000 bytes of UTF-8; 0xFFFF is odd, so a byte cut would split a character
+
+    snapshot = CatalogSnapshot(compile_snapshot([TrackRecord('t1', name, 'Artist', 'Album')], []))
+
+    assert snapshot.track('t1').name == 'é' * (0xFFFF // 2)
@@ -0,0 +1,15 @@
+import pytest
+
+from codec import RequestBodyError, optional_int
+
+
+def test_optional_int_accepts_missing_and_integers():
+    assert optional_int({}, "genreFanout", minimum=1) is None
+    assert optional_int({"genreFanout": 3}, "genreFanout", minimum=1) == 3
+
+
+@pytest.mark.parametrize("value", ["3", 2.5, True, [2], 0, -1])
+def test_optional_int_rejects_non_integers_and_small_values(value):
+    with pytest.raises(RequestBodyError) as raised:
+        optional_int({"genreFanout": value}, "genreFanout", minimum=1)
+    assert raised.value.status_code == 400
@@ -0,0 +1,120 @@
+import contextvars
+import ipaddress
+import threading
+import time
+import types
+
+import pytest
+from spotipy.exceptions import SpotifyException
+
+import fair_scheduler
+import song_recommendations
+from admission import Overloaded
+from fair_scheduler import FairScheduler, SchedulerTimeout, bind_request_user, client_address, current_user
+
+
+class Request:
+    def __init__(self, peer, forwarded=None):
+        self.client_address = (peer, 40000)
+        self.headers = {'X-Forwarded-For': forwarded} if forwarded else {}
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(fair_scheduler, 'TRUSTED_PROXIES', [])
+
+    assert client_address(Request('203.0.113.9', forwarded='198.51.100.1')) == '203.0.113.9'
+
+
+def test_forwarded_for_is_read_from_the_right_behind_a_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(fair_scheduler, 'TRUSTED_PROXIES', [ipaddress.ip_network('10.0.0.0/8')])
+
+    # The left-most entry was written by the client; the proxy appended the real peer
+    request = Request('10.0.0.2', forwarded='198.51.100.1, 203.0.113.9, 10.0.0.7')
+    assert client_address(request) == '203.0.113.9'
+
+
+class UserSpotify:
+    """spotipy.Spotify stand-in whose /me accepts one token."""
+    profile_calls = 0
+
+    def __init__(self, auth, **kwargs):
+        self.auth = auth
+
+    def current_user(self):
+        UserSpotify.profile_calls += 1
+        if self.auth != 'good-token':
+            raise SpotifyException(401, -1, 'Invalid access token')
+        return {'id': 'listener'}
+
+
+def client_and_key(engine, user_token):
+    context = contextvars.copy_context()
+
+    def run():
+        bind_request_user(Request('203.0.113.9'))
+        return engine._get_spotify_client(user_token), current_user.get()
+
+    return context.run(run)
+
+
+def test_only_a_verified_token_gets_its_own_scheduling_key(engine, monkeypatch):
+    monkeypatch.setattr(fair_scheduler, 'TRUSTED_PROXIES', [])
+    monkeypatch.setattr(song_recommendations, 'spotipy', types.SimpleNamespace(Spotify=UserSpotify))
+    UserSpotify.profile_calls = 0
+
+    for token in ('made-up-1', 'made-up-2'):
+        client, key = client_and_key(engine, token)
+        assert client is engine.spotify_client
+        assert key == 'ip:203.0.113.9'
+
+    client, key = client_and_key(engine, 'good-token')
+    assert client.auth == 'good-token'
+    assert key == 'user:listener'
+
+    client_and_key(engine, 'good-token')
+    client_and_key(engine, 'made-up-1')
+    assert UserSpotify.profile_calls == 3
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_contending_users_are_served_alternately():
+    scheduler = FairScheduler('test', slots=1)
+    served = []
+
+    def call(user):
+        with scheduler.slot(user):
+            served.append(user)
+
+    scheduler.acquire('alice')
+    # Alice queues all her calls before Bob's first one arrives
+    threads = []
+    for user in ['alice'] * 3 + ['bob'] * 3:
+        thread = threading.Thread(target=call, args=(user,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: scheduler.snapshot()['queued'] == len(threads))
+    scheduler.release('alice')
+    for thread in threads:
+        thread.join()
+
+    assert served == ['bob', 'alice'] * 3
+
+
+def test_max_wait_sheds_the_call():
+    scheduler = FairScheduler('test', slots=1, max_wait=0.05)
+    scheduler.acquire('alice')
+
+    with pytest.raises(SchedulerTimeout) as shed:
+        scheduler.acquire('bob')
+
+    assert isinstance(shed.value, Overloaded)
+    assert shed.value.retry_after == 1
+    assert scheduler.snapshot()['queued'] == 0
+    scheduler.release('alice')
+    scheduler.acquire('bob')
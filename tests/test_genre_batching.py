@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from fair_scheduler import BATCH_USER, current_user
+
+
+class BatchGroq:
+    """Groq client stub that answers every completion with ``content``."""
+
+    def __init__(self, content):
+        self.content = content
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+
+
+def code_for(catalogue, genre):
+    return catalogue.genres.index(genre) + 1
+
+
+def test_partially_answered_batch_uses_local_fallback(engine):
+    catalogue = engine.genre_catalogue
+    jazz = code_for(catalogue, 'Jazz')
+    # Slot 1 answered, slot 2 "no genre", slot 3 unparseable, slot 4 missing
+    engine.groq_client = BatchGroq(f"1:{jazz}\n2:0\n3:???")
+    prompts = ["late night sax in a smoky club", "some blues guitar tonight",
+               "play me some reggae", "qqq zzz"]
+
+    genres = engine._classify_genre_batch(prompts)
+
+    assert genres[0] == 'Jazz'
+    assert genres[1] == 'Blues'
+    assert genres[2] == 'Reggae'
+    assert 3 not in genres
+    assert len(engine.groq_client.prompts) == 1
+
+
+
+def test_batch_call_is_not_charged_to_the_leader(engine):
+    catalogue = engine.genre_catalogue
+    engine.groq_client = BatchGroq(f"1:{code_for(catalogue, 'Jazz')}\n2:{code_for(catalogue, 'Blues')}")
+    charged = []
+    acquire = engine.groq_scheduler.acquire
+    engine.groq_scheduler.acquire = lambda user: (charged.append(user), acquire(user))[1]
+
+    current_user.set('user:leader')
+    engine._classify_genre_batch(["late night sax", "blues guitar"])
+
+    assert charged == [BATCH_USER]
+    assert current_user.get() == 'user:leader'
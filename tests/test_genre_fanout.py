@@ -0,0 +1,56 @@
+class SearchSpotify:
+    """Spotify client stub: one seed track and artist, and a genre search answering with nothing."""
+
+    def __init__(self, genres):
+        self.searches = []
+        self.artist_record = {"id": "seed", "name": "Seed", "popularity": 50, "genres": genres, "images": []}
+
+    def track(self, track_id):
+        return {"id": track_id, "name": "Song", "artists": [{"id": "seed", "name": "Seed"}],
+                "album": {"name": "Album", "images": []}}
+
+    def artist(self, artist_id):
+        return self.artist_record
+
+    def search(self, q, type, limit):
+        self.searches.append(q)
+        return {"artists": {"items": []}}
+
+
+def test_genre_fanout_is_capped(engine):
+    genres = [f"genre {i}" for i in range(50)]
+    engine.spotify_client = SearchSpotify(genres)
+    engine.artist_graph = None
+    engine.max_genre_fanout = 3
+
+    engine.get_recommendations(selected_song_id="track", genre_fanout=10 ** 9)
+
+    assert len(engine.spotify_client.searches) == 3
+
+
+class FlakySearchSpotify(SearchSpotify):
+    """Answers each genre search with one in-range artist, except ``broken`` which raises."""
+
+    def __init__(self, genres, broken):
+        super().__init__(genres)
+        self.broken = broken
+
+    def search(self, q, type, limit):
+        self.searches.append(q)
+        if self.broken in q:
+            raise ValueError("malformed search response")
+        name = q.split('"')[1] if '"' in q else q
+        return {"artists": {"items": [
+            {"id": f"artist-{name}", "name": f"Artist {name}", "popularity": 50, "genres": [name], "images": []}
+        ]}}
+
+
+def test_failed_genre_is_skipped(engine):
+    engine.spotify_client = FlakySearchSpotify(["rock", "jazz", "blues"], broken="jazz")
+    engine.artist_graph = None
+
+    result = engine.get_recommendations(selected_song_id="track", genre_fanout=3)
+
+    assert result["success"] is True
+    assert len(engine.spotify_client.searches) == 3
+    assert {song["id"] for song in result["songs"]} == {"artist-rock", "artist-blues"}
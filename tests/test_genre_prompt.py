@@ -0,0 +1,30 @@
+from genre_prompt import GenreCatalogue
+
+GENRES = ['Blues', 'Jazz', 'Synthwave']
+
+
+def test_parse_code_then_name():
+    catalogue = GenreCatalogue(GENRES)
+    assert catalogue.parse('2=Jazz') == 'Jazz'
+
+
+def test_parse_name_then_code():
+    catalogue = GenreCatalogue(GENRES)
+    assert catalogue.parse('Jazz=2') == 'Jazz'
+
+
+def test_parse_name_then_unknown_code_falls_back_to_name():
+    catalogue = GenreCatalogue(GENRES)
+    assert catalogue.parse('Synthwave=99') == 'Synthwave'
+
+
+def test_parse_bare_code_and_name():
+    catalogue = GenreCatalogue(GENRES)
+    assert catalogue.parse('1') == 'Blues'
+    assert catalogue.parse('synthwave') == 'Synthwave'
+
+
+def test_parse_no_genre():
+    catalogue = GenreCatalogue(GENRES)
+    assert catalogue.parse('0') is None
+    assert catalogue.parse('none') is None
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from genre_vectors import SHORTLIST_MIN_SCORE, GenreVectors
+
+DOCUMENTS = {
+    'Jazz': [('Jazz', 2.0), ('saxophone swing improvisation smoky club', 1.0)],
+    'Blues': [('Blues', 2.0), ('slide guitar delta heartbreak', 1.0)],
+    'Synthwave': [('Synthwave', 2.0), ('retro synthesizer neon night drive', 1.0)],
+    'Metal': [('Metal', 2.0), ('heavy distorted guitar gym', 1.0)],
+}
+
+
+def test_shortlist_ranks_the_closest_genre_first():
+    vectors = GenreVectors(DOCUMENTS)
+
+    ranked = vectors.shortlist("neon night drive with a synthesizer", 3)
+
+    assert ranked[0][0] == 'Synthwave'
+    assert [score for _, score in ranked] == sorted((score for _, score in ranked), reverse=True)
+
+
+def test_shortlist_is_bounded_by_k():
+    vectors = GenreVectors(DOCUMENTS)
+
+    ranked = vectors.shortlist("heavy guitar", 1)
+
+    assert len(ranked) == 1
+    assert ranked[0][0] == 'Metal'
+
+
+def test_shortlist_within_a_subset():
+    vectors = GenreVectors(DOCUMENTS)
+
+    assert [genre for genre, _ in vectors.shortlist("heavy guitar", 4, within={'Blues', 'Jazz'})] == ['Blues']
+
+
+def test_unrelated_prompt_scores_below_the_shortlist_minimum():
+    vectors = GenreVectors(DOCUMENTS)
+
+    assert vectors.shortlist("play me some music", 4) == []  # stopwords only
+    # "zzz" shares a trigram with "jazz", which is noise rather than a match
+    assert all(score < SHORTLIST_MIN_SCORE for _, score in vectors.shortlist("qqq zzz", 4))
+
+
+class ScriptedGroq:
+    """Groq client stub answering each completion with the next scripted reply."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        content = self.replies.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_shortlist_miss_is_retried_with_every_genre(engine):
+    engine.genre_shortlist_size = 12
+    jazz = engine.genre_catalogue.genres.index('Jazz') + 1
+    engine.groq_client = ScriptedGroq("0", str(jazz))
+    prompt = "late night sax in a smoky club"
+
+    assert engine._genre_from_prompt_via_groq(prompt) == 'Jazz'
+    shortlist_prompt, full_prompt = engine.groq_client.prompts
+    assert len(shortlist_prompt) < len(full_prompt)
+    assert engine.prompt_genre_cache.get(engine.prompt_cache_key(prompt)) == 'Jazz'
+
+
+def test_full_catalogue_by_default(engine):
+    assert engine.genre_shortlist_size == 0
+    engine.groq_client = ScriptedGroq("0")
+
+    assert engine._genre_from_prompt_via_groq("late night sax in a smoky club") is None
+    assert len(engine.groq_client.prompts) == 1
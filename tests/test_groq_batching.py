@@ -0,0 +1,100 @@
+import threading
+import time
+
+from groq_batching import GenreBatcher
+
+
+class Classifier:
+    """classify_batch/classify_single stand-ins that record every call."""
+
+    def __init__(self, answer_slots=None, error=None):
+        self.batches = []
+        self.singles = []
+        self.answer_slots = answer_slots
+        self.error = error
+
+    def batch(self, prompts):
+        self.batches.append(list(prompts))
+        if self.error:
+            raise self.error
+        slots = range(len(prompts)) if self.answer_slots is None else self.answer_slots
+        return {index: f"genre for {prompts[index]}" for index in slots}
+
+    def single(self, prompt):
+        self.singles.append(prompt)
+        return f"single for {prompt}"
+
+
+def submit_concurrently(batcher, prompts):
+    """Submit each prompt from its own thread; returns prompt -> answer or raised exception."""
+    results = {}
+
+    def run(prompt):
+        try:
+            results[prompt] = batcher.submit(prompt)
+        except Exception as e:
+            results[prompt] = e
+
+    threads = [threading.Thread(target=run, args=(prompt,)) for prompt in prompts]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)  # the first thread becomes leader
+    for thread in threads:
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+    return results
+
+
+def test_concurrent_submits_share_one_completion_after_the_window():
+    classifier = Classifier()
+    batcher = GenreBatcher(classifier.batch, classifier.single, window_ms=300, max_batch=8)
+    prompts = ["jazz", "metal", "folk"]
+
+    results = submit_concurrently(batcher, prompts)
+
+    assert classifier.batches == [prompts]
+    assert classifier.singles == []
+    assert results == {prompt: f"genre for {prompt}" for prompt in prompts}
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    classifier = Classifier()
+    batcher = GenreBatcher(classifier.batch, classifier.single, window_ms=60000, max_batch=3)
+
+    started = time.monotonic()
+    submit_concurrently(batcher, ["a", "b", "c"])
+
+    assert time.monotonic() - started < 5
+    assert classifier.batches == [["a", "b", "c"]]
+
+
+def test_unanswered_slots_are_classified_singly():
+    classifier = Classifier(answer_slots=[0, 2])
+    batcher = GenreBatcher(classifier.batch, classifier.single, window_ms=60000, max_batch=3)
+
+    results = submit_concurrently(batcher, ["a", "b", "c"])
+
+    assert results["b"] == "single for b"
+    assert classifier.singles == ["b"]
+
+
+def test_batch_failure_is_raised_in_every_caller():
+    error = TimeoutError("groq timed out")
+    classifier = Classifier(error=error)
+    batcher = GenreBatcher(classifier.batch, classifier.single, window_ms=60000, max_batch=3)
+
+    results = submit_concurrently(batcher, ["a", "b", "c"])
+
+    assert all(result is error for result in results.values())
+    assert len(classifier.batches) == 1
+    assert classifier.singles == []
+
+
+def test_engine_falls_back_locally_when_the_batch_fails(engine):
+    def unavailable(prompt):
+        raise TimeoutError("groq timed out")
+
+    engine.groq_client = object()
+    engine.genre_batcher = GenreBatcher(unavailable, unavailable, window_ms=0)
+
+    assert engine._genre_from_prompt_via_groq("smoky jazz club with a saxophone") == 'Jazz'
@@ -0,0 +1,7 @@
+def test_snapshot_reports_empty_artist_graph_and_registry(engine):
+    assert len(engine.artist_graph) == 0
+
+    snapshot = engine.health.snapshot()
+
+    assert snapshot["artist_graph"] == engine.artist_graph.snapshot()
+    assert snapshot["genre_registry"] == engine.genre_registry.snapshot()
@@ -0,0 +1,263 @@
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import http_responses
+from codec import RequestBodyError
+from fair_scheduler import SchedulerTimeout
+from http_responses import EventStream, negotiate_encoding, negotiate_stream_format, send_json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api', 'recommendations'))
+
+BIG = {"songs": [{"name": f"Song {i}", "artist": "Artist"} for i in range(100)]}
+
+
+class Handler:
+    """Records what send_json writes, in place of a BaseHTTPRequestHandler."""
+
+    def __init__(self, command='GET', headers=None):
+        self.command = command
+        self.headers = headers or {}
+        self.status = None
+        self.sent = {}
+        self.wfile = io.BytesIO()
+
+    def send_response(self, status):
+        self.status = status
+
+    def send_header(self, name, value):
+        self.sent[name] = value
+
+    def end_headers(self):
+        pass
+
+
+def respond(command='GET', headers=None, data=BIG, status=200, route='/track'):
+    handler = Handler(command, headers)
+    send_json(handler, status, data, route=route)
+    return handler
+
+
+def test_get_revalidates_with_etag():
+    first = respond()
+    assert first.status == 200
+    assert first.sent['Cache-Control'] == http_responses.CACHE_POLICIES['/track']
+
+    second = respond(headers={'If-None-Match': first.sent['ETag']})
+
+    assert second.status == 304
+    assert second.wfile.getvalue() == b''
+    assert second.sent['ETag'] == first.sent['ETag']
+    assert second.sent['Vary'] == 'Accept-Encoding'
+
+
+def test_post_is_never_cacheable_or_revalidated():
+    etag = respond().sent['ETag']
+
+    post = respond('POST')
+    assert post.status == 200
+    assert post.sent['Cache-Control'] == 'private, no-store'
+    assert 'ETag' not in post.sent
+
+    conditional = respond('POST', headers={'If-None-Match': etag})
+    assert conditional.status == 412
+    assert conditional.sent['Cache-Control'] == 'no-store'
+
+
+def test_head_sends_headers_only():
+    head = respond('HEAD')
+
+    assert head.status == 200
+    assert int(head.sent['Content-Length']) > 0
+    assert head.wfile.getvalue() == b''
+
+
+@pytest.mark.parametrize('route', sorted(http_responses.CACHE_POLICIES))
+def test_cache_policy_per_route(route):
+    assert respond(route=route).sent['Cache-Control'] == http_responses.CACHE_POLICIES[route]
+    assert respond(route=route, status=500).sent['Cache-Control'] == 'no-store'
+
+
+def test_gzip_negotiation():
+    handler = respond(headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert handler.sent['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(handler.wfile.getvalue())) == BIG
+    assert 'Content-Encoding' not in respond(data={"ok": True}, headers={'Accept-Encoding': 'gzip'}).sent
+    assert 'Content-Encoding' not in respond(headers={'Accept-Encoding': 'gzip;q=0'}).sent
+
+
+def test_brotli_preferred_when_available(monkeypatch):
+    monkeypatch.setattr(http_responses, 'brotli', object())
+    assert negotiate_encoding('gzip, br') == 'br'
+    assert negotiate_encoding('gzip, br;q=0') == 'gzip'
+
+    monkeypatch.setattr(http_responses, 'brotli', None)
+    assert negotiate_encoding('br') is None
+
+
+def test_brotli_body():
+    brotli = pytest.importorskip('brotli')
+    handler = respond(headers={'Accept-Encoding': 'br'})
+
+    assert handler.sent['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(handler.wfile.getvalue())) == BIG
+
+
+def test_stream_format_negotiation():
+    assert negotiate_stream_format(None, "sse") == 'sse'
+    assert negotiate_stream_format(None, True) == 'ndjson'
+    assert negotiate_stream_format('text/event-stream', None) == 'sse'
+    assert negotiate_stream_format('application/json', False) is None
+
+
+@pytest.mark.parametrize('requested', [[1], {"a": 1}, 1, "xml"])
+def test_invalid_stream_field_is_a_client_error(requested):
+    with pytest.raises(RequestBodyError) as error:
+        negotiate_stream_format(None, requested)
+    assert error.value.status_code == 400
+
+
+def test_ndjson_framing():
+    handler = Handler('POST')
+    stream = EventStream(handler, 'ndjson')
+    stream.send("genre", {"genre": "Jazz"})
+    stream.send("done", {"success": True})
+
+    assert handler.sent['Content-type'] == 'application/x-ndjson'
+    assert handler.sent['Cache-Control'] == 'no-store'
+    lines = handler.wfile.getvalue().split(b"\n")
+    assert lines[-1] == b''
+    assert [json.loads(line) for line in lines[:-1]] == [
+        {"event": "genre", "genre": "Jazz"}, {"event": "done", "success": True}]
+
+
+def test_sse_framing():
+    handler = Handler('POST')
+    stream = EventStream(handler, 'sse')
+    stream.send("artist", {"artist": {"name": "Miles Davis"}})
+
+    assert handler.sent['Content-type'] == 'text/event-stream'
+    event, data, blank, end = handler.wfile.getvalue().split(b"\n")
+    assert event == b"event: artist"
+    assert json.loads(data[len(b"data: "):]) == {"artist": {"name": "Miles Davis"}}
+    assert blank == end == b''
+
+
+class TrackEngine:
+    def has_track(self, track_id):
+        return True
+
+    def get_track_info(self, track_id):
+        if track_id == 'busy':
+            raise SchedulerTimeout("no spotify slot free within 5s", retry_after=5)
+        return {"id": track_id, "name": "Song"} if track_id == 'known' else None
+
+    def _genre_from_prompt_via_groq(self, prompt):
+        return 'Jazz'
+
+    def iter_artists_by_genre(self, genre, user_token=None, limit=6):
+        import index
+
+        self.streaming_admission = index.admission.snapshot()
+        yield {"name": "Miles Davis"}
+        raise RuntimeError("Spotify went away mid-stream")
+
+
+@pytest.fixture
+def server(monkeypatch):
+    import index
+
+    monkeypatch.setattr(index, 'get_engine', lambda: TrackEngine())
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), index.handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_get_track_is_cacheable(server):
+    with urllib.request.urlopen(f"{server}/track?trackId=known") as response:
+        assert json.loads(response.read()) == {"id": "known", "name": "Song"}
+        assert response.headers['Cache-Control'] == http_responses.CACHE_POLICIES['/track']
+        etag = response.headers['ETag']
+
+    request = urllib.request.Request(f"{server}/track?trackId=known", headers={'If-None-Match': etag})
+    with pytest.raises(urllib.error.HTTPError) as not_modified:
+        urllib.request.urlopen(request)
+    assert not_modified.value.code == 304
+
+    with pytest.raises(urllib.error.HTTPError) as missing:
+        urllib.request.urlopen(f"{server}/track?trackId=unknown")
+    assert missing.value.code == 404
+    assert missing.value.headers['Cache-Control'] == 'no-store'
+
+
+def post(server, path, body):
+    request = urllib.request.Request(f"{server}{path}", data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    return urllib.request.urlopen(request)
+
+
+def test_stream_does_not_hold_an_admission_slot(server, monkeypatch):
+    import index
+
+    engine = TrackEngine()
+    monkeypatch.setattr(index, 'get_engine', lambda: engine)
+    with post(server, "/prompt_recommendations", {"prompt": "smoky club", "stream": "sse"}) as response:
+        response.read()
+
+    assert engine.streaming_admission["in_flight"]["expensive"] == 0
+
+
+def test_shed_request_gets_retry_after(server, monkeypatch):
+    import index
+    from admission import NORMAL, AdmissionController
+
+    admission = AdmissionController(max_in_flight=1, max_queue=0)
+    monkeypatch.setattr(index, 'admission', admission)
+    admission.acquire(NORMAL)
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{server}/recommendations?songId=known")
+    assert error.value.code == 503
+    assert int(error.value.headers['Retry-After']) >= 1
+
+
+def test_stream_failure_is_reported_in_band(server):
+    with post(server, "/prompt_recommendations", {"prompt": "smoky club", "stream": "ndjson"}) as response:
+        assert response.status == 200
+        events = [json.loads(line) for line in response.read().splitlines()]
+
+    assert [event["event"] for event in events] == ["genre", "artist", "error"]
+    assert events[-1]["success"] is False
+
+
+def test_unhashable_stream_field_gets_400(server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(server, "/prompt_recommendations", {"prompt": "smoky club", "stream": [1]})
+    assert error.value.code == 400
+    assert "stream" in json.loads(error.value.read())["error"]
+
+
+def test_non_string_user_token_gets_400(server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(server, "/recommendations", {"songId": "known", "userToken": 1})
+    assert error.value.code == 400
+    assert json.loads(error.value.read())["error"] == "userToken must be a string"
+
+
+def test_upstream_queue_timeout_gets_503(server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{server}/track?trackId=busy")
+    assert error.value.code == 503
+    assert error.value.headers['Retry-After'] == '5'
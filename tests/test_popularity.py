@@ -0,0 +1,35 @@
+import json
+
+from popularity import GENRE, PROMPT, SEED_ARTIST, PopularityTracker
+
+
+def test_snapshot_never_contains_prompts(tmp_path):
+    path = str(tmp_path / 'popularity.json')
+    tracker = PopularityTracker()
+    tracker.record(PROMPT, 'songs for my private diary entry')
+    tracker.record(GENRE, 'Jazz')
+    tracker.record(SEED_ARTIST, 'artist1')
+
+    tracker.save(path)
+
+    with open(path) as f:
+        text = f.read()
+    assert 'diary' not in text
+    assert set(json.loads(text)) == {GENRE, SEED_ARTIST}
+    assert tracker.top(PROMPT, 5) == ['songs for my private diary entry']
+
+
+def test_prompts_in_old_snapshots_are_not_loaded(tmp_path):
+    path = tmp_path / 'popularity.json'
+    path.write_text(json.dumps({PROMPT: {'old prompt': [3.0, 0.0]}, GENRE: {'Jazz': [1.0, 0.0]}}))
+    tracker = PopularityTracker()
+
+    assert tracker.load(str(path))
+    assert tracker.top(PROMPT, 5) == []
+    assert tracker.top(GENRE, 5) == ['Jazz']
+
+
+def test_oversized_keys_are_not_tracked():
+    tracker = PopularityTracker(max_key_chars=20)
+    tracker.record(PROMPT, 'x' * 21)
+    assert tracker.top(PROMPT, 5) == []
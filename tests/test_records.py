@@ -0,0 +1,24 @@
+import time
+
+from records import RecordCache
+
+
+def test_expired_entries_are_not_contained():
+    cache = RecordCache(ttl=0.01)
+    cache.put('track', 'record')
+    assert 'track' in cache
+
+    time.sleep(0.02)
+
+    assert 'track' not in cache
+    assert cache.get('track') is None
+    assert cache.get_stale('track') == 'record'
+
+
+def test_contains_without_ttl():
+    cache = RecordCache(max_entries=1)
+    cache.put('first', 1)
+    cache.put('second', 2)
+
+    assert 'first' not in cache
+    assert 'second' in cache
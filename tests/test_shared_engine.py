@@ -0,0 +1,34 @@
+import os
+
+import lazy_imports
+import shared_engine
+from shared_engine import health_status
+
+
+class DotEnv:
+    """dotenv stand-in whose .env sets the Groq key."""
+
+    def load_dotenv(self):
+        os.environ['GROQ_API_KEY'] = 'from-dotenv'
+
+
+def test_shallow_health_reads_dotenv_first(monkeypatch):
+    monkeypatch.delenv('GROQ_API_KEY', raising=False)
+    monkeypatch.setattr(lazy_imports, 'dotenv', DotEnv())
+    monkeypatch.setattr(lazy_imports, '_env_loaded', False)
+    monkeypatch.setattr(shared_engine, '_engine', None)
+
+    status = health_status(deep=False)
+
+    assert status["groq_configured"] is True
+    assert set(status) == {"status", "spotify_configured", "groq_configured"}
+    assert shared_engine.current_engine() is None
+
+
+def test_deep_health_includes_probe_results_of_a_running_engine(engine, monkeypatch):
+    monkeypatch.setattr(shared_engine, '_engine', engine)
+
+    status = health_status()
+
+    assert status["engine_available"] is True
+    assert status["upstreams"] == engine.health.snapshot()["upstreams"]
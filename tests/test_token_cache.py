@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+
+from token_cache import SharedFileTokenCache, TokenRefresher
+
+
+class AuthManager:
+    """Stands in for SpotifyClientCredentials: each fetch saves a fresh one-hour token."""
+
+    def __init__(self, cache, delay=0.0):
+        self.cache = cache
+        self.delay = delay
+        self.fetches = 0
+
+    def get_access_token(self, as_dict=False, check_cache=False):
+        self.fetches += 1
+        time.sleep(self.delay)
+        self.cache.save_token_to_cache({"access_token": f"token-{self.fetches}", "expires_at": time.time() + 3600})
+        return f"token-{self.fetches}"
+
+
+def write_token(path, expires_in):
+    path.write_text(json.dumps({"access_token": "old", "expires_at": time.time() + expires_in}))
+
+
+def test_racing_refreshers_fetch_once(tmp_path):
+    path = tmp_path / 'token.json'
+    write_token(path, expires_in=10)
+    # Two caches on one file behave like two worker processes on one host
+    refreshers = []
+    for _ in range(2):
+        cache = SharedFileTokenCache(str(path))
+        refreshers.append(TokenRefresher(AuthManager(cache, delay=0.2), cache))
+    start = threading.Barrier(len(refreshers))
+    results = []
+
+    def refresh(refresher):
+        start.wait()
+        results.append(refresher.refresh_if_due())
+
+    threads = [threading.Thread(target=refresh, args=(refresher,)) for refresher in refreshers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False, True]
+    assert sum(refresher.auth_manager.fetches for refresher in refreshers) == 1
+    assert all(refresher.seconds_left() > 3000 for refresher in refreshers)
+
+
+def test_expired_file_is_refreshed(tmp_path):
+    path = tmp_path / 'token.json'
+    write_token(path, expires_in=-60)
+    cache = SharedFileTokenCache(str(path))
+    refresher = TokenRefresher(AuthManager(cache), cache)
+
+    assert refresher.refresh_if_due() is True
+    assert json.loads(path.read_text())["access_token"] == "token-1"
+    assert refresher.refresh_if_due() is False
+
+
+def test_corrupt_file_is_refreshed(tmp_path):
+    path = tmp_path / 'token.json'
+    path.write_text('{"access_token": "trunc')
+    cache = SharedFileTokenCache(str(path))
+    refresher = TokenRefresher(AuthManager(cache), cache)
+
+    assert cache.get_cached_token() is None
+    assert refresher.refresh_if_due() is True
+    assert cache.get_cached_token()["access_token"] == "token-1"
+
+
+def test_unwritable_file_falls_back_to_memory(tmp_path):
+    cache = SharedFileTokenCache(str(tmp_path / 'missing-dir' / 'token.json'))
+    refresher = TokenRefresher(AuthManager(cache), cache)
+
+    assert refresher.refresh_if_due() is True
+    assert cache.get_cached_token()["access_token"] == "token-1"
+    assert refresher.refresh_if_due() is False
@@ -0,0 +1,37 @@
+import groq
+import httpx
+import pytest
+
+from circuit_breaker import BreakerRegistry, CircuitOpenError
+from upstream import CLIENT_ERROR, NETWORK_ERROR, UpstreamCaller, classify_error
+
+REQUEST = httpx.Request('POST', 'https://api.groq.com/openai/v1/chat/completions')
+
+
+def test_groq_timeouts_and_connection_errors_are_network_errors():
+    assert classify_error(groq.APITimeoutError(request=REQUEST)) == NETWORK_ERROR
+    assert classify_error(groq.APIConnectionError(request=REQUEST)) == NETWORK_ERROR
+    assert classify_error(ValueError('bad answer')) == CLIENT_ERROR
+
+
+def test_groq_timeouts_open_the_breaker():
+    breakers = BreakerRegistry(window=20, min_calls=5, failure_rate=0.5, open_seconds=30)
+    caller = UpstreamCaller(max_attempts=3, sleep=lambda delay: None, breakers=breakers)
+    attempts = []
+
+    def timeout(client):
+        attempts.append(client)
+        raise groq.APITimeoutError(request=REQUEST)
+
+    with pytest.raises(groq.APITimeoutError):
+        caller.call('groq_completion', timeout, object(), breaker='groq:chat')
+    assert len(attempts) == 3  # retried like any other network error
+
+    with pytest.raises((groq.APITimeoutError, CircuitOpenError)):
+        caller.call('groq_completion', timeout, object(), breaker='groq:chat')
+    assert breakers.get('groq:chat').snapshot()['state'] == 'open'
+
+    calls_before = len(attempts)
+    with pytest.raises(CircuitOpenError):
+        caller.call('groq_completion', timeout, object(), breaker='groq:chat')
+    assert len(attempts) == calls_before
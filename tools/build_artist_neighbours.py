@@ -0,0 +1,187 @@
+"""Precompute every artist's nearest related artists from crawled Spotify data.
+
+Reads crawled Spotify payloads (JSON or JSON-lines files containing artist
+objects, search responses, or dicts of either, such as the perf fixtures)
+and writes, for each artist, its ``--k`` most related artists: the ones
+sharing the most, and the rarest, genres with it, scored the same way as the
+engine's ArtistGraph walk. The scoring is split across a process pool; the
+catalogue's adjacency arrays and the output tables live in shared memory,
+so nothing large is pickled between processes, and every artist's row is
+written by exactly one worker, so the file is byte-identical for any
+``--workers``.
+
+The engine maps the file read-only when ARTIST_NEIGHBOURS_PATH points at
+it; see api/artist_neighbours.py for the layout.
+
+    python tools/build_artist_neighbours.py crawl/*.jsonl --output artist_neighbours.bin
+    python tools/build_artist_neighbours.py --synthetic 200000 --workers 8   # time a build
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import random
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(TOOLS_DIR)
+sys.path.append(os.path.join(os.path.dirname(TOOLS_DIR), 'api'))
+
+from artist_neighbours import NO_NEIGHBOUR, compile_neighbours  # noqa: E402
+from parallel_build import SharedArray, default_workers, run_partitioned  # noqa: E402
+
+
+def iter_artists(payload):
+    """Every Spotify artist object (one with genres) anywhere inside a payload."""
+    if isinstance(payload, dict):
+        if payload.get('type') == 'artist' and 'genres' in payload and payload.get('id'):
+            yield payload
+            return
+        for value in payload.values():
+            yield from iter_artists(value)
+    elif isinstance(payload, list):
+        for value in payload:
+            yield from iter_artists(value)
+
+
+def load_crawl(paths):
+    """artist id -> (popularity, genres); later files win for artists seen twice."""
+    artists = {}
+    for path in paths:
+        with open(path) as f:
+            text = f.read()
+        try:
+            payloads = [json.loads(text)]
+        except ValueError:
+            payloads = [json.loads(line) for line in text.splitlines() if line.strip()]
+        for payload in payloads:
+            for artist in iter_artists(payload):
+                artists[artist['id']] = (int(artist.get('popularity') or 0), tuple(sorted(set(artist['genres']))))
+    return artists
+
+
+def synthetic_crawl(count, genres=None, seed=7):
+    """A catalogue with Zipf-distributed genre sizes, for timing builds without a crawl."""
+    rng = random.Random(seed)
+    genres = genres or max(50, count // 25)
+    weights = [1.0 / (rank + 1) for rank in range(genres)]
+    names = [f"genre {g}" for g in range(genres)]
+    artists = {}
+    for i in range(count):
+        picked = rng.choices(names, weights=weights, k=rng.randint(1, 5))
+        artists[f"artist{i:08d}"] = (rng.randint(0, 100), tuple(sorted(set(picked))))
+    return artists
+
+
+def build_tables(artists, max_genre_size):
+    """Compressed adjacency arrays (artist -> genres, genre -> artists) in shared memory."""
+    ids = sorted(artists)
+    genre_ids = {genre: g for g, genre in enumerate(sorted({g for _, genres in artists.values() for g in genres}))}
+    members = [[] for _ in genre_ids]
+    artist_offsets, artist_genres = [0], []
+    for index, artist_id in enumerate(ids):
+        for genre in artists[artist_id][1]:
+            members[genre_ids[genre]].append(index)
+        artist_genres.extend(genre_ids[genre] for genre in artists[artist_id][1])
+        artist_offsets.append(len(artist_genres))
+    genre_offsets, genre_members = [0], []
+    for rows in members:
+        if len(rows) <= max_genre_size:  # genres this broad say nothing about relatedness
+            genre_members.extend(rows)
+        genre_offsets.append(len(genre_members))
+    tables = {
+        'popularity': SharedArray.from_values('B', (artists[artist_id][0] for artist_id in ids)),
+        'artist_offsets': SharedArray.from_values('I', artist_offsets),
+        'artist_genres': SharedArray.from_values('I', artist_genres),
+        'genre_offsets': SharedArray.from_values('I', genre_offsets),
+        'genre_members': SharedArray.from_values('I', genre_members),
+    }
+    return ids, tables
+
+
+def score_range(start, end, specs, k):
+    """Worker: fill the neighbour rows of artists ``start``..``end`` in the shared output arrays."""
+    arrays = {name: SharedArray.attach(spec) for name, spec in specs.items()}
+    try:
+        popularity = arrays['popularity'].view
+        artist_offsets = arrays['artist_offsets'].view
+        artist_genres = arrays['artist_genres'].view
+        genre_offsets = arrays['genre_offsets'].view
+        genre_members = arrays['genre_members'].view
+        out_ids = arrays['neighbours'].view
+        out_scores = arrays['scores'].view
+        pairs = 0
+        for artist in range(start, end):
+            scores = {}
+            # Genres in id order, so float sums don't depend on how work was split
+            for genre in artist_genres[artist_offsets[artist]:artist_offsets[artist + 1]]:
+                first, last = genre_offsets[genre], genre_offsets[genre + 1]
+                if last - first < 2:
+                    continue
+                weight = 1.0 / math.sqrt(last - first)
+                for other in genre_members[first:last]:
+                    scores[other] = scores.get(other, 0.0) + weight
+            scores.pop(artist, None)
+            pairs += len(scores)
+            seed_popularity = popularity[artist]
+            top = heapq.nlargest(k, scores, key=lambda other: (scores[other], -abs(popularity[other] - seed_popularity), -other))
+            row = artist * k
+            for rank, other in enumerate(top):
+                out_ids[row + rank] = other
+                out_scores[row + rank] = scores[other]
+        return pairs
+    finally:
+        for shared in arrays.values():
+            shared.close()
+
+
+def build(artists, k, workers, max_genre_size):
+    """The encoded neighbour file for a crawl, and the number of artist pairs scored."""
+    ids, tables = build_tables(artists, max_genre_size)
+    tables['neighbours'] = SharedArray.create('I', len(ids) * k, fill=NO_NEIGHBOUR)
+    tables['scores'] = SharedArray.create('f', len(ids) * k)
+    try:
+        specs = {name: shared.spec for name, shared in tables.items()}
+        pairs = sum(run_partitioned(score_range, len(ids), workers, specs, k))
+        return compile_neighbours(ids, k, tables['neighbours'].tobytes(), tables['scores'].tobytes()), pairs
+    finally:
+        for shared in tables.values():
+            shared.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='*', help='crawled Spotify payloads (JSON or JSON lines)')
+    parser.add_argument('--synthetic', type=int, default=0, help='build from N generated artists instead')
+    parser.add_argument('--output', default='artist_neighbours.bin', help='file to write')
+    parser.add_argument('--k', type=int, default=20, help='neighbours kept per artist')
+    parser.add_argument('--workers', type=int, default=default_workers(), help='processes (default: CPU count)')
+    parser.add_argument('--max-genre-size', type=int, default=5000,
+                        help='ignore genres with more artists than this when relating artists')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        artists = synthetic_crawl(args.synthetic)
+    elif args.inputs:
+        artists = load_crawl(args.inputs)
+    else:
+        parser.error('give crawl files or --synthetic N')
+
+    start = time.perf_counter()
+    encoded, pairs = build(artists, args.k, args.workers, args.max_genre_size)
+    elapsed = time.perf_counter() - start
+
+    tmp_path = args.output + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(encoded)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {args.output}: {len(artists)} artists, k={args.k}, {len(encoded)} bytes, "
+          f"sha256 {hashlib.sha256(encoded).hexdigest()[:16]}")
+    print(f"Scored {pairs} artist pairs in {elapsed:.2f}s with {args.workers} worker(s)")
+
+
+if __name__ == '__main__':
+    main()
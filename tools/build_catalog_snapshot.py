@@ -0,0 +1,99 @@
+"""Build the memory-mapped catalog snapshot the engine serves track and artist lookups from.
+
+Reads crawled Spotify payloads (JSON or JSON-lines files containing track,
+artist and audio-features objects, search responses, or dicts of any of
+these, such as the perf fixtures) and writes them in the catalog snapshot
+format (see api/catalog_snapshot.py). Point CATALOG_SNAPSHOT_PATH at the
+output; every worker maps the same file, so adding workers does not add
+copies of the catalogue.
+
+    python tools/build_catalog_snapshot.py crawl/*.jsonl --output catalog.bin
+    python tools/build_catalog_snapshot.py tools/perf_fixtures/spotify.json --check catalog.bin
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'api'))
+
+
+def iter_objects(payload):
+    """Every Spotify track, artist and audio-features object anywhere inside a payload."""
+    if isinstance(payload, dict):
+        kind = payload.get('type')
+        if payload.get('id') and (
+            (kind == 'track' and payload.get('artists') and payload.get('album'))
+            or (kind == 'artist' and 'genres' in payload)
+            or kind == 'audio_features'
+        ):
+            yield kind, payload
+            if kind != 'track':
+                return
+        for value in payload.values():
+            yield from iter_objects(value)
+    elif isinstance(payload, list):
+        for value in payload:
+            yield from iter_objects(value)
+
+
+def load_crawl(paths):
+    """(tracks, artists, features) by id; later files win for objects seen twice."""
+    from records import ArtistRecord, AudioFeatures, TrackRecord
+
+    tracks, artists, features = {}, {}, {}
+    for path in paths:
+        with open(path) as f:
+            text = f.read()
+        try:
+            payloads = [json.loads(text)]
+        except ValueError:
+            payloads = [json.loads(line) for line in text.splitlines() if line.strip()]
+        for payload in payloads:
+            for kind, obj in iter_objects(payload):
+                if kind == 'track':
+                    tracks[obj['id']] = TrackRecord.from_spotify(obj)
+                elif kind == 'artist':
+                    artists[obj['id']] = ArtistRecord.from_spotify(obj)
+                else:
+                    features[obj['id']] = AudioFeatures.from_spotify(obj)
+    return tracks, artists, features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help='crawled Spotify payloads (JSON or JSON lines)')
+    parser.add_argument('--output', default='catalog.bin', help='file to write')
+    parser.add_argument('--check', metavar='PATH', help='exit non-zero if PATH differs from what would be written')
+    args = parser.parse_args()
+
+    from catalog_snapshot import CatalogSnapshot, compile_snapshot
+
+    tracks, artists, features = load_crawl(args.inputs)
+    encoded = compile_snapshot(tracks.values(), artists.values(), features)
+    snapshot = CatalogSnapshot(encoded)
+    summary = (f"{snapshot.track_count} tracks ({sum(1 for t in tracks if t in features)} with audio features), "
+               f"{snapshot.artist_count} artists, {len(encoded)} bytes, version {snapshot.version}")
+
+    if args.check:
+        try:
+            with open(args.check, 'rb') as f:
+                current = f.read()
+        except OSError:
+            current = b''
+        if current != encoded:
+            sys.exit(f"{args.check} is out of date; rebuild it with tools/build_catalog_snapshot.py")
+        print(f"{args.check} is up to date: {summary}")
+        return
+
+    tmp_path = args.output + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(encoded)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {args.output}: {summary}, sha256 {hashlib.sha256(encoded).hexdigest()[:16]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Compile api/genres.json and api/genre_metadata.json into api/genres.bin.
+
+The engine maps the compiled registry instead of parsing JSON on every
+start. Run this after editing either source file and commit the result:
+
+    python tools/build_genre_registry.py           # rewrite api/genres.bin
+    python tools/build_genre_registry.py --check   # exit 1 if genres.bin is stale
+
+The output is deterministic, so --check can run in CI.
+"""
+import argparse
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'api'))
+
+
+def main():
+    from genre_registry import REGISTRY_PATH, GenreRegistry, compile_sources
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=REGISTRY_PATH, help='registry file to write (default: api/genres.bin)')
+    parser.add_argument('--check', action='store_true', help='only verify that the output is up to date')
+    args = parser.parse_args()
+
+    compiled = compile_sources()
+    registry = GenreRegistry(compiled)
+
+    if args.check:
+        try:
+            with open(args.output, 'rb') as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current != compiled:
+            print(f"{args.output} is out of date; run python tools/build_genre_registry.py")
+            sys.exit(1)
+        print(f"{args.output} is up to date (version {registry.version})")
+        return
+
+    tmp_path = args.output + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(compiled)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {args.output}: {len(registry)} genres, {registry.snapshot()['aliases']} aliases, "
+          f"{len(compiled)} bytes, version {registry.version}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Fail when importing an API handler exceeds its cold-start budget.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter
+(best of several runs, so .pyc compilation and disk noise don't count) and
+compares the module's cumulative import time with the budget. Modules are
+given as names importable from api/ or as paths to handler files, such as
+``recommendations/index.py``; by default every Vercel handler is checked.
+``http.server`` is imported first, as the Python runtime does before it
+loads a handler, so only the handler's own imports are timed.
+
+A handler also fails if importing it loads the engine or a heavy client
+library (spotipy, groq, dotenv): those belong to the first request, not
+to every cold start.
+
+    python tools/check_import_time.py [--budget-ms 60] [--runs 7] [module ...]
+
+Exits with status 1 if any module is over budget or loads what it shouldn't.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+DEFAULT_MODULES = [
+    'recommendations/index.py',
+    'recommendations/health.py',
+    'recommendations/track.py',
+    'recommendations/recommendations.py',
+    'recommendations/prompt_recommendations.py',
+]
+DEFERRED_MODULES = ('song_recommendations', 'spotipy', 'groq', 'dotenv')
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def resolve(target):
+    """(module name, extra sys.path entry) for a module name or a handler file path."""
+    if target.endswith('.py'):
+        path = os.path.join(API_DIR, target)
+        return os.path.splitext(os.path.basename(path))[0], os.path.dirname(path)
+    return target, API_DIR
+
+
+def measure_import(target):
+    """(cumulative import time in microseconds, deferred modules it loaded) from one fresh interpreter."""
+    module, directory = resolve(target)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([directory, API_DIR]))
+    code = (f'import http.server; import {module}; import sys; '
+            f'print(",".join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=API_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {target} failed:\n{proc.stderr}")
+    loaded = [name for name in proc.stdout.strip().split(',') if name]
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match and match.group(4) == module:
+            return int(match.group(2)), loaded
+    raise RuntimeError(f"no importtime entry for {target}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', '60')))
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--allow-deferred', action='store_true',
+                        help='do not fail modules that load the engine or client libraries (e.g. song_recommendations)')
+    args = parser.parse_args()
+
+    failed = False
+    for target in args.modules:
+        runs = [measure_import(target) for _ in range(args.runs)]
+        best_ms = min(us for us, _ in runs) / 1000.0
+        loaded = sorted({name for _, names in runs for name in names})
+        problems = []
+        if best_ms > args.budget_ms:
+            problems.append('OVER BUDGET')
+        if loaded and not args.allow_deferred:
+            problems.append(f"loads {', '.join(loaded)}")
+        print(f"{target:<42} {best_ms:8.1f} ms  (budget {args.budget_ms:.0f} ms)  {'; '.join(problems) or 'ok'}")
+        failed = failed or bool(problems)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""Compare genre classification strategies on a labeled prompt corpus.
+
+Each strategy resolves every prompt in the corpus to a genre and is scored
+on accuracy (the answer is one of the prompt's acceptable genres, or no
+genre for prompts labeled with none), how often it answers at all, latency
+per prompt, throughput and Groq input tokens.
+
+Corpora:
+  heldout.jsonl  (default) written without reference to the genre keywords;
+                 report scores on this one
+  tuning.jsonl   the prompts the keywords in genre_metadata.json were written
+                 against, so the vector strategies score optimistically on it
+The report also gives the corpus's keyword overlap: the share of prompt words
+that appear in the keywords of the prompt's own genres.
+
+Strategies:
+  text_match        genre named verbatim in the prompt (no model)
+  vectors@T         best keyword-vector match if its similarity is at least T (no model)
+  local_fallback    what the engine answers when Groq is unavailable
+  groq_full         _genre_from_prompt_via_groq offering every genre
+  groq_shortlist@K  _genre_from_prompt_via_groq offering the K closest genres
+
+The Groq strategies only run when --groq names where answers come from:
+  stub      an oracle that answers correctly whenever a right genre
+            is offered and "0" otherwise, after a latency modeled on input
+            size; since a "0" from a shortlist is retried with every genre,
+            shortlists only differ from groq_full in tokens and latency here
+  recorded  answers replayed from --recording, keyed by model and exact prompt
+  live      the real API (needs GROQ_API_KEY); add --record --recording FILE
+            to save answers for later replay
+
+    python tools/genre_bench/run.py [--corpus FILE] [--groq stub|recorded|live]
+        [--recording FILE [--record]] [--shortlist 6,12,24]
+        [--thresholds 0.1,0.2,0.3] [--json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.join(ROOT_DIR, 'api'))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+CORPUS_PATH = os.path.join(BENCH_DIR, 'heldout.jsonl')
+
+_CATALOGUE_LINE = re.compile(r'^Genres \(code=name\): (.*)$', re.MULTILINE)
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def keyword_overlap(corpus, registry):
+    """Share of labeled prompts' words that appear in their own genres' keywords."""
+    from genre_vectors import _STOPWORDS, _TOKEN
+
+    keywords = {genre: set(_TOKEN.findall(registry.keywords(genre_id).lower()))
+                for genre_id, genre in enumerate(registry.genres)}
+    words = shared = 0
+    for row in corpus:
+        if not row["genres"]:
+            continue
+        prompt_words = {word for word in _TOKEN.findall(row["prompt"].lower()) if word not in _STOPWORDS}
+        genre_words = set().union(*(keywords.get(genre, set()) for genre in row["genres"]))
+        words += len(prompt_words)
+        shared += len(prompt_words & genre_words)
+    return shared / words if words else 0.0
+
+
+def request_text(content):
+    return content.rsplit('Request: ', 1)[-1].strip() if 'Request: ' in content else content.strip()
+
+
+def offered_genres(content):
+    """code -> genre from the catalogue line of a genre prompt."""
+    match = _CATALOGUE_LINE.search(content)
+    if not match:
+        return {}
+    return dict(entry.split('=', 1) for entry in match.group(1).split(';') if '=' in entry)
+
+
+def _completion(content, prompt_tokens):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens),
+    )
+
+
+class BenchGroq:
+    """Groq client for the benchmark: counts calls and input tokens, and answers by ``mode``."""
+
+    def __init__(self, mode, labels, recording=None, real=None, latency_ms=5.0, ms_per_1k_tokens=20.0):
+        from groq_prompt_report import estimate_tokens
+
+        self.mode = mode
+        self.labels = labels
+        self.recording = recording if recording is not None else {}
+        self.real = real
+        self.latency_ms = latency_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.estimate_tokens = estimate_tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.misses = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.models = SimpleNamespace(list=lambda: [])
+
+    def reset(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def _create(self, model, messages, **kwargs):
+        content = messages[-1]["content"]
+        if self.mode == 'live':
+            completion = self.real.chat.completions.create(model=model, messages=messages, **kwargs)
+            tokens = completion.usage.prompt_tokens
+            answer = completion.choices[0].message.content
+            self.recording[recording_key(model, content)] = {"prompt": request_text(content), "answer": answer}
+        elif self.mode == 'recorded':
+            entry = self.recording.get(recording_key(model, content))
+            if entry is None:
+                self.misses.append(request_text(content))
+                raise LookupError(f"no recorded answer for {request_text(content)!r}")
+            tokens, answer = self.estimate_tokens(content), entry["answer"]
+        else:
+            tokens = self.estimate_tokens(content)
+            time.sleep((self.latency_ms + self.ms_per_1k_tokens * tokens / 1000.0) / 1000.0)
+            acceptable = set(self.labels.get(request_text(content), ()))
+            answer = next((code for code, genre in offered_genres(content).items() if genre in acceptable), '0')
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += tokens
+        return _completion(answer, tokens)
+
+
+def recording_key(model, content):
+    return f"{model}:{hashlib.sha256(content.encode('utf-8')).hexdigest()[:20]}"
+
+
+def build_engine():
+    os.environ.setdefault('HEALTH_PROBE_INTERVAL_S', '0')
+    os.environ.setdefault('CACHE_WARM_INTERVAL_S', '0')
+    os.environ.setdefault('RECOMMENDATION_PREFETCH_WORKERS', '0')
+    os.environ.setdefault('SPOTIFY_TOKEN_CACHE', 'memory')
+    os.environ['GROQ_BATCH_WINDOW_MS'] = '0'  # one prompt at a time, so latencies are per prompt
+    from song_recommendations import SongRecommendationsEngine
+
+    return SongRecommendationsEngine()
+
+
+def run_strategy(name, classify, corpus, groq=None):
+    if groq is not None:
+        groq.reset()
+    correct = answered = 0
+    latencies = []
+    wrong = []
+    started = time.perf_counter()
+    for row in corpus:
+        start = time.perf_counter()
+        genre = classify(row["prompt"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        answered += genre is not None
+        if (genre in row["genres"]) if row["genres"] else genre is None:
+            correct += 1
+        else:
+            wrong.append({"prompt": row["prompt"], "answer": genre, "expected": row["genres"]})
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    count = len(corpus)
+    return {
+        "strategy": name,
+        "prompts": count,
+        "accuracy": correct / count,
+        "answered": answered / count,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(count - 1, int(0.95 * count))],
+        "throughput_per_s": count / elapsed if elapsed else None,
+        "groq_calls": groq.calls if groq is not None else 0,
+        "tokens_per_prompt": groq.prompt_tokens / count if groq is not None else 0,
+        "wrong": wrong,
+    }
+
+
+def strategies(engine, groq, shortlist_sizes, thresholds):
+    """(name, classify, groq client or None) for every strategy to compare; no Groq ones without ``groq``."""
+    catalogue = engine.genre_catalogue
+    vectors = engine.genre_vectors
+
+    def vector_match(threshold):
+        def classify(prompt):
+            best = vectors.shortlist(prompt, 1)
+            return best[0][0] if best and best[0][1] >= threshold else None
+        return classify
+
+    def via_groq(size):
+        def classify(prompt):
+            engine.genre_shortlist_size = size
+            engine.prompt_genre_cache.clear()
+            return engine._genre_from_prompt_via_groq(prompt)
+        return classify
+
+    yield 'text_match', catalogue.match_in_text, None
+    for threshold in thresholds:
+        yield f'vectors@{threshold:g}', vector_match(threshold), None
+    yield 'local_fallback', lambda prompt: engine._local_genre_fallback(prompt, catalogue), None
+    if groq is None:
+        return
+    yield 'groq_full', via_groq(0), groq
+    for size in shortlist_sizes:
+        yield f'groq_shortlist@{size}', via_groq(size), groq
+
+
+def print_table(results, mode, corpus_name, overlap):
+    print(f"corpus={corpus_name} prompts={results[0]['prompts'] if results else 0} "
+          f"keyword_overlap={overlap:.0%} groq={mode or 'off'}")
+    header = f"{'strategy':<20} {'accuracy':>8} {'answered':>8} {'p50 ms':>8} {'p95 ms':>8} {'prompts/s':>10} {'tokens':>7}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        throughput = f"{r['throughput_per_s']:.0f}" if r['throughput_per_s'] else '-'
+        print(f"{r['strategy']:<20} {r['accuracy']:>8.1%} {r['answered']:>8.1%} {r['p50_ms']:>8.3f} "
+              f"{r['p95_ms']:>8.3f} {throughput:>10} {r['tokens_per_prompt']:>7.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groq', choices=('stub', 'recorded', 'live'),
+                        help='also run the Groq strategies, answered by this source')
+    parser.add_argument('--record', action='store_true', help='with --groq live, save answers to --recording')
+    parser.add_argument('--recording', help='recorded answers file (--groq recorded, or --groq live --record)')
+    parser.add_argument('--corpus', default=CORPUS_PATH, help='labeled prompts (JSON lines)')
+    parser.add_argument('--shortlist', default='6,12,24', help='comma-separated shortlist sizes to compare')
+    parser.add_argument('--thresholds', default='0.1,0.2,0.3', help='comma-separated vector similarity thresholds')
+    parser.add_argument('--stub-latency-ms', type=float, default=5.0, help='stub: fixed latency per call')
+    parser.add_argument('--stub-ms-per-1k-tokens', type=float, default=20.0, help='stub: latency per 1k input tokens')
+    parser.add_argument('--verbose', action='store_true', help='list the prompts each strategy got wrong')
+    parser.add_argument('--json', action='store_true', help='print a JSON report instead of a table')
+    args = parser.parse_args()
+    if (args.groq == 'recorded' or args.record) and not args.recording:
+        parser.error('--groq recorded and --record need --recording FILE')
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    corpus = load_corpus(args.corpus)
+    labels = {row["prompt"]: row["genres"] for row in corpus}
+    recording = {}
+    if args.groq == 'recorded':
+        with open(args.recording) as f:
+            recording = json.load(f)
+    elif args.groq != 'live':
+        os.environ['GROQ_API_KEY'] = ''  # only --groq live may reach the network
+
+    engine = build_engine()
+    if args.groq == 'live' and engine.groq_client is None:
+        sys.exit("--groq live needs GROQ_API_KEY")
+    groq = None
+    if args.groq:
+        groq = BenchGroq(args.groq, labels, recording=recording, real=engine.groq_client,
+                         latency_ms=args.stub_latency_ms, ms_per_1k_tokens=args.stub_ms_per_1k_tokens)
+        engine.groq_client = groq
+
+    shortlist_sizes = [int(size) for size in args.shortlist.split(',') if size]
+    thresholds = [float(t) for t in args.thresholds.split(',') if t]
+    overlap = keyword_overlap(corpus, engine.genre_registry)
+    results = [run_strategy(name, classify, corpus, client)
+               for name, classify, client in strategies(engine, groq, shortlist_sizes, thresholds)]
+
+    if args.record and args.groq == 'live':
+        with open(args.recording, 'w') as f:
+            json.dump(recording, f, indent=1, sort_keys=True)
+        print(f"Recorded {len(recording)} answers to {args.recording}", file=sys.stderr)
+    if groq is not None and groq.misses:
+        print(f"{len(groq.misses)} prompts had no recorded answer (counted as wrong); re-record with --groq live --record",
+              file=sys.stderr)
+
+    if args.json:
+        print(json.dumps({"corpus": args.corpus, "keyword_overlap": overlap, "groq": args.groq,
+                          "results": results}, indent=2))
+        return
+    print_table(results, args.groq, os.path.basename(args.corpus), overlap)
+    if args.verbose:
+        for r in results:
+            for miss in r["wrong"]:
+                print(f"  {r['strategy']}: {miss['prompt']!r} -> {miss['answer']} (expected {miss['expected'] or 'none'})")
+
+
+if __name__ == '__main__':
+    main()
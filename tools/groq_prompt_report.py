@@ -0,0 +1,125 @@
+"""Compare input tokens and latency of the legacy and compiled Groq genre prompts.
+
+Offline (default) the token counts are estimated with a word/punctuation split,
+which tracks BPE tokenizers closely for this kind of text. With GROQ_API_KEY set
+and --live, both prompts are sent to Groq and the reported usage and end-to-end
+latency are used instead.
+
+    python tools/groq_prompt_report.py [--live] [--repeat N] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from genre_prompt import GenreCatalogue
+from genre_registry import load_registry
+
+SAMPLE_PROMPTS = [
+    "late night drive through the city with neon lights",
+    "sunday morning coffee and rain on the window",
+    "getting hyped before a big game",
+    "heartbroken but trying to dance it off",
+]
+
+
+def legacy_prompt(prompt, allowed_genres):
+    """The prompt _genre_from_prompt_via_groq built before the catalogue was precompiled."""
+    return f"""
+            You are a music genre selector. Your job is to imagine what the user prompt would be like a choose the best fitting genre.
+            Return exactly one genre from this list and do not invent new genres: {sorted(list(allowed_genres))}.
+            Return only the genre name from the list. If unsure, respond with "none".
+            No extra words, no explanations. Example: "rock", not "Rock music".
+
+            User said: "{prompt}"
+
+            Respond with exactly one genre name from the list only.
+            """
+
+
+def estimate_tokens(text):
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def load_legacy_genres():
+    """The lowercased genres.json categories the legacy prompt listed."""
+    genres_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api', 'genres.json')
+    with open(genres_path, "r") as f:
+        data = json.load(f)
+    categories = data.get('categories', []) if isinstance(data, dict) else data
+    return set(map(str.lower, categories))
+
+
+def measure_live(client, model, text, repeat):
+    tokens, latencies = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completion = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": text}],
+            temperature=0.2,
+            max_tokens=8,
+            top_p=1,
+            stream=False,
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        tokens.append(completion.usage.prompt_tokens)
+    return statistics.mean(tokens), statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--live', action='store_true', help='call Groq for real token usage and latency')
+    parser.add_argument('--repeat', type=int, default=3, help='live calls per prompt variant')
+    parser.add_argument('--json', action='store_true', help='print a JSON report instead of a table')
+    args = parser.parse_args()
+
+    genres = load_legacy_genres()
+    # The same catalogue the engine compiles: the registry's display names
+    catalogue = GenreCatalogue(load_registry().genres)
+
+    client = None
+    model = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
+    if args.live:
+        from groq import Groq
+        client = Groq(api_key=os.environ['GROQ_API_KEY'], max_retries=0)  # SDK retries would skew latencies
+
+    rows = []
+    for prompt in SAMPLE_PROMPTS:
+        row = {"prompt": prompt}
+        for variant, text in (("before", legacy_prompt(prompt, genres)), ("after", catalogue.build_prompt(prompt))):
+            if client:
+                tokens, latency_ms = measure_live(client, model, text, args.repeat)
+            else:
+                tokens, latency_ms = estimate_tokens(text), None
+            row[f"{variant}_tokens"] = tokens
+            row[f"{variant}_latency_ms"] = latency_ms
+        rows.append(row)
+
+    report = {
+        "mode": "live" if client else "estimate",
+        "genres": len(genres),
+        "rows": rows,
+        "mean_before_tokens": statistics.mean(r["before_tokens"] for r in rows),
+        "mean_after_tokens": statistics.mean(r["after_tokens"] for r in rows),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"mode={report['mode']} genres={report['genres']}")
+    print(f"{'prompt':<55} {'tokens before':>13} {'tokens after':>12} {'ms before':>10} {'ms after':>9}")
+    for r in rows:
+        before_ms = f"{r['before_latency_ms']:.0f}" if r['before_latency_ms'] is not None else '-'
+        after_ms = f"{r['after_latency_ms']:.0f}" if r['after_latency_ms'] is not None else '-'
+        print(f"{r['prompt'][:55]:<55} {r['before_tokens']:>13.0f} {r['after_tokens']:>12.0f} {before_ms:>10} {after_ms:>9}")
+    print(f"mean input tokens: {report['mean_before_tokens']:.0f} -> {report['mean_after_tokens']:.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""Concurrency-sweep load generator for the recommendations HTTP routes.
+
+Serves ``api/recommendations/index.py`` in-process with local stand-in Spotify
+and Groq upstreams (with injected latency), replays a weighted traffic mix at
+increasing concurrency levels and writes a JSON report per level: throughput,
+latency percentiles, error rate and resident-memory growth.
+
+    python tools/loadgen.py --levels 1,4,16,64 --duration 10 \\
+        --mix track=4,recommendations=3,prompt_recommendations=2,health=1 \\
+        --spotify-latency-ms 80 --groq-latency-ms 250 --output loadgen-report.json
+
+Pass ``--url`` to drive an already running server instead (memory is then not
+measured, and the server talks to whatever upstreams it is configured with).
+Client and in-process server share one interpreter, so compare reports from
+the same machine and settings rather than reading absolute numbers.
+"""
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'api'))
+sys.path.append(os.path.join(ROOT_DIR, 'api', 'recommendations'))
+
+DEFAULT_MIX = 'track=4,recommendations=3,prompt_recommendations=2,health=1'
+PROMPTS = [
+    "late night drive through the city",
+    "sunny beach party with friends",
+    "rainy sunday reading by the window",
+    "heavy gym session",
+    "slow dance at a wedding",
+]
+
+
+def _fake_id(prefix, n):
+    return hashlib.sha1(f"{prefix}{n}".encode()).hexdigest()[:22]
+
+
+class StandInSpotify:
+    """Spotify-shaped responses after an injected delay; never touches the network."""
+
+    def __init__(self, latency_ms, jitter_ms=0.0, error_rate=0.0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if self.error_rate and random.random() < self.error_rate:
+            from spotipy.exceptions import SpotifyException
+            raise SpotifyException(503, -1, "stand-in upstream error")
+
+    def _artist(self, n, genres=('indie rock', 'rock')):
+        return {
+            "id": _fake_id('artist', n),
+            "name": f"Artist {n}",
+            "popularity": 20 + (n * 7) % 70,
+            "genres": list(genres),
+            "images": [{"url": f"https://i.scdn.co/image/{_fake_id('img', n)}"}],
+        }
+
+    def track(self, track_id):
+        self._wait()
+        n = int(hashlib.sha1(track_id.encode()).hexdigest(), 16) % 1000
+        return {
+            "id": track_id,
+            "name": f"Track {track_id[:6]}",
+            "artists": [{"id": _fake_id('artist', n), "name": f"Artist {n}"}],
+            "album": {"name": f"Album {n}", "images": [{"url": f"https://i.scdn.co/image/{_fake_id('cover', n)}"}]},
+        }
+
+    def artist(self, artist_id):
+        self._wait()
+        return self._artist(int(hashlib.sha1(artist_id.encode()).hexdigest(), 16) % 1000)
+
+    def search(self, q, type='artist', limit=50):
+        self._wait()
+        base = int(hashlib.sha1(q.encode()).hexdigest(), 16) % 1000
+        return {"artists": {"items": [self._artist(base + i) for i in range(limit)]}}
+
+    def audio_features(self, ids):
+        self._wait()
+        return [{"tempo": 120.0, "energy": 0.5, "danceability": 0.5, "valence": 0.5} for _ in ids]
+
+
+class StandInGroq:
+    """Groq client stand-in answering with a genre code after an injected delay."""
+
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000.0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.models = SimpleNamespace(list=lambda: [])
+
+    def _create(self, messages, **kwargs):
+        time.sleep(self.latency)
+        content = messages[0]["content"]
+        if "Requests:\n" in content:
+            count = content.split("Requests:\n", 1)[1].count("\n") + 1
+            answer = "\n".join(f"{i}:1" for i in range(1, count + 1))
+        else:
+            answer = "1"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))])
+
+
+def rss_bytes():
+    """Current resident set size of this process (Linux), falling back to peak RSS."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def start_in_process_server(args):
+    os.environ.setdefault('HEALTH_PROBE_INTERVAL_S', '0')
+    os.environ.setdefault('SPOTIFY_TOKEN_CACHE', 'memory')
+    import index
+    from shared_engine import get_engine
+
+    engine = get_engine()
+    if engine is None:
+        raise SystemExit("the recommendations engine could not be built")
+    engine.spotify_client = StandInSpotify(args.spotify_latency_ms, args.spotify_jitter_ms, args.spotify_error_rate)
+    engine.groq_client = StandInGroq(args.groq_latency_ms)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), index.handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='loadgen-server', daemon=True).start()
+    return server, engine
+
+
+def parse_mix(spec):
+    mix = []
+    for part in spec.split(','):
+        route, _, weight = part.partition('=')
+        mix.append((route.strip(), float(weight or 1)))
+    return mix
+
+
+def build_request(route, track_pool):
+    if route == 'health':
+        return 'GET', '/health', None
+    if route == 'track':
+        return 'POST', '/track', {"trackId": random.choice(track_pool)}
+    if route == 'recommendations':
+        return 'POST', '/recommendations', {"songId": random.choice(track_pool)}
+    if route == 'prompt_recommendations':
+        return 'POST', '/prompt_recommendations', {"prompt": random.choice(PROMPTS)}
+    raise ValueError(f"unknown route in mix: {route}")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_level(host, port, concurrency, duration, mix, track_pool, timeout):
+    routes = [route for route, _ in mix]
+    weights = [weight for _, weight in mix]
+    samples = []  # (route, latency_s, ok, shed)
+    samples_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        local = []
+        while time.monotonic() < deadline:
+            route = random.choices(routes, weights)[0]
+            method, path, body = build_request(route, track_pool)
+            payload = json.dumps(body).encode() if body is not None else None
+            headers = {'Content-Type': 'application/json'} if payload else {}
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = 200 <= response.status < 400
+                shed = response.status == 503 and response.getheader('Retry-After') is not None
+                if response.will_close:
+                    conn.close()
+                    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+            except Exception:
+                ok = shed = False
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=timeout)
+            local.append((route, time.perf_counter() - start, ok, shed))
+        conn.close()
+        with samples_lock:
+            samples.extend(local)
+
+    rss_before = rss_bytes()
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    rss_after = rss_bytes()
+
+    def summarize(rows):
+        latencies = sorted(latency * 1000 for _, latency, _, _ in rows)
+        errors = sum(1 for _, _, ok, _ in rows if not ok)
+        shed = sum(1 for _, _, _, was_shed in rows if was_shed)
+        return {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 2) if elapsed else None,
+            "error_rate": round(errors / len(rows), 4) if rows else None,
+            # Requests refused by admission control (503 + Retry-After); included in error_rate
+            "shed_rate": round(shed / len(rows), 4) if rows else None,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 2) if latencies else None,
+                "p90": round(percentile(latencies, 90), 2) if latencies else None,
+                "p99": round(percentile(latencies, 99), 2) if latencies else None,
+                "max": round(latencies[-1], 2) if latencies else None,
+                "mean": round(statistics.mean(latencies), 2) if latencies else None,
+            },
+        }
+
+    level = {"concurrency": concurrency, "duration_s": round(elapsed, 2), **summarize(samples)}
+    level["routes"] = {route: summarize([s for s in samples if s[0] == route]) for route in routes}
+    level["rss_bytes_before"] = rss_before
+    level["rss_bytes_after"] = rss_after
+    level["rss_growth_bytes"] = rss_after - rss_before
+    return level
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', default='1,2,4,8,16,32', help='comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='route=weight pairs')
+    parser.add_argument('--track-pool', type=int, default=200, help='distinct track ids to draw from')
+    parser.add_argument('--spotify-latency-ms', type=float, default=80.0)
+    parser.add_argument('--spotify-jitter-ms', type=float, default=20.0)
+    parser.add_argument('--spotify-error-rate', type=float, default=0.0)
+    parser.add_argument('--groq-latency-ms', type=float, default=250.0)
+    parser.add_argument('--timeout', type=float, default=30.0, help='client socket timeout in seconds')
+    parser.add_argument('--url', help='target an already running server instead of the in-process one')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    mix = parse_mix(args.mix)
+    track_pool = [_fake_id('track', i) for i in range(args.track_pool)]
+
+    engine = None
+    if args.url:
+        target = urlparse(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        server, engine = start_in_process_server(args)
+        host, port = server.server_address
+
+    levels = []
+    for concurrency in (int(c) for c in args.levels.split(',')):
+        level = run_level(host, port, concurrency, args.duration, mix, track_pool, args.timeout)
+        if engine is not None:
+            level["upstream_calls"] = {"spotify": engine.spotify_client.calls}
+        if args.url:
+            for key in ("rss_bytes_before", "rss_bytes_after", "rss_growth_bytes"):
+                level.pop(key)
+        levels.append(level)
+        print(f"concurrency={concurrency:<4} rps={level['throughput_rps']:<8} "
+              f"p50={level['latency_ms']['p50']}ms p99={level['latency_ms']['p99']}ms "
+              f"errors={level['error_rate']} shed={level['shed_rate']}", file=sys.stderr)
+
+    report = {
+        "generated_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "target": args.url or "in-process",
+        "config": {
+            "mix": dict(mix),
+            "duration_s": args.duration,
+            "track_pool": args.track_pool,
+            "spotify_latency_ms": args.spotify_latency_ms,
+            "spotify_jitter_ms": args.spotify_jitter_ms,
+            "spotify_error_rate": args.spotify_error_rate,
+            "groq_latency_ms": args.groq_latency_ms,
+        },
+        "levels": levels,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
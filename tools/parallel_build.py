@@ -0,0 +1,112 @@
+"""Helpers for offline index builds that split work across processes.
+
+Large inputs and outputs live in ``multiprocessing.shared_memory`` blocks
+viewed as typed arrays, so workers attach to them by name instead of
+receiving pickled copies, and write their results in place. Work is split
+into contiguous index ranges; each range is written by exactly one worker,
+so the merged output is the same whatever the worker count or completion
+order.
+"""
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Iterable, List, Tuple
+
+
+def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+    """Attach to a block without registering it with this process's resource tracker.
+
+    Only the creating process unlinks. A registration made by a worker would
+    make the tracker report the block as leaked, or remove the parent's
+    registration, when the worker is done with it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedArray:
+    """A typed array (``array`` typecodes) backed by a named shared memory block."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, typecode: str, length: int, owner: bool):
+        self.shm = shm
+        self.typecode = typecode
+        self.length = length
+        self.owner = owner
+        itemsize = memoryview(b'\0' * 8).cast(typecode).itemsize
+        self.view = shm.buf[:length * itemsize].cast(typecode)
+
+    @classmethod
+    def create(cls, typecode: str, length: int, fill=None) -> 'SharedArray':
+        itemsize = memoryview(b'\0' * 8).cast(typecode).itemsize
+        shm = shared_memory.SharedMemory(create=True, size=max(1, length * itemsize))
+        shared = cls(shm, typecode, length, owner=True)
+        if fill:
+            shm.buf[:length * itemsize] = (array(typecode, [fill]) * length).tobytes()
+        return shared
+
+    @classmethod
+    def from_values(cls, typecode: str, values: Iterable) -> 'SharedArray':
+        data = array(typecode, values)
+        shared = cls.create(typecode, len(data))
+        shared.shm.buf[:len(data) * data.itemsize] = data.tobytes()
+        return shared
+
+    @classmethod
+    def attach(cls, spec: Tuple[str, str, int]) -> 'SharedArray':
+        name, typecode, length = spec
+        return cls(_attach_untracked(name), typecode, length, owner=False)
+
+    @property
+    def spec(self) -> Tuple[str, str, int]:
+        """What a worker needs to attach: (name, typecode, length)."""
+        return self.shm.name, self.typecode, self.length
+
+    def tobytes(self) -> bytes:
+        return self.view.tobytes()
+
+    def close(self) -> None:
+        self.view.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def partition(count: int, parts: int) -> List[Tuple[int, int]]:
+    """Split ``range(count)`` into at most ``parts`` contiguous, near-equal (start, end) ranges."""
+    parts = max(1, min(parts, count))
+    size, extra = divmod(count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return [r for r in ranges if r[0] < r[1]]
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def run_partitioned(task: Callable, count: int, workers: int, *args, chunks_per_worker: int = 4) -> List:
+    """Run ``task(start, end, *args)`` over ``range(count)``; results come back in range order.
+
+    ``task`` must be a module-level function so it can be sent to the pool,
+    and ``args`` should be small (shared array specs, parameters). With one
+    worker the task runs in this process, which keeps profiling simple.
+    Several chunks per worker even out ranges that take longer than others.
+    """
+    ranges = partition(count, max(1, workers) * chunks_per_worker)
+    if workers <= 1:
+        return [task(start, end, *args) for start, end in ranges]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(task, start, end, *args) for start, end in ranges]
+        return [future.result() for future in futures]
@@ -0,0 +1,378 @@
+"""Recorded-fixture performance regression gate for SongRecommendationsEngine.
+
+Replays recorded Spotify and Groq responses through the engine, one fresh
+engine per scenario, and measures CPU time, peak traced allocations and the
+number of upstream calls per endpoint. Results are compared with the committed
+baseline; the exit status is 1 when any scenario regresses beyond tolerance,
+makes an upstream call the baseline didn't, or hits an unrecorded request.
+
+    python tools/perf_gate.py                    # compare with tools/perf_baseline.json
+    python tools/perf_gate.py --update-baseline  # accept the current numbers
+    python tools/perf_gate.py --record           # refresh fixtures from the real APIs
+
+--record needs SPOTIFY_CLIENT_ID/SECRET and GROQ_API_KEY and overwrites
+tools/perf_fixtures/. CPU numbers are machine-dependent: regenerate the
+baseline on the machine that runs the gate.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'api'))
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(TOOLS_DIR, 'perf_fixtures')
+BASELINE_PATH = os.path.join(TOOLS_DIR, 'perf_baseline.json')
+
+HOTEL_CALIFORNIA = '4iV5W9uYEdYUVa79Axb7Rh'
+BLINDING_LIGHTS = '0VjIjW4GlUZAMYd2vXMi3b'
+
+
+def _scenario_track_cold(engine):
+    engine.get_track_info(HOTEL_CALIFORNIA)
+
+
+def _scenario_track_warm(engine):
+    for _ in range(10):
+        engine.get_track_info(HOTEL_CALIFORNIA)
+
+
+def _scenario_recommendations(engine):
+    engine.get_recommendations(HOTEL_CALIFORNIA, genre_fanout=1)
+    engine.get_recommendations(BLINDING_LIGHTS, genre_fanout=1)
+
+
+def _scenario_recommendations_fanout(engine):
+    engine.get_recommendations(HOTEL_CALIFORNIA, genre_fanout=3)
+
+
+def _scenario_track_then_recommendations(engine):
+    from call_budget import CallBudget
+    from prefetch import Prefetcher
+
+    # The usual client flow: /recommendations should be served from what /track prefetched
+    engine.prefetcher = Prefetcher(CallBudget(60), max_workers=1)
+    engine.get_track_info(HOTEL_CALIFORNIA)
+    engine.prefetcher.wait_idle(timeout=5)
+    engine.get_recommendations(HOTEL_CALIFORNIA, genre_fanout=1)
+
+
+def _scenario_recommendations_after_expiry(engine):
+    # Once the genre search has expired, the artist graph still answers without searching again
+    engine.get_recommendations(HOTEL_CALIFORNIA, genre_fanout=1)
+    engine.genre_artist_cache.clear()
+    engine.get_recommendations(HOTEL_CALIFORNIA, genre_fanout=1)
+
+
+def _scenario_prompt_recommendations(engine):
+    for prompt in ("late night drive through the city", "heavy gym session"):
+        genre = engine._genre_from_prompt_via_groq(prompt)
+        if genre:
+            engine.find_artists_by_genre(genre)
+
+
+def _scenario_repeated_prompt(engine):
+    # Same request phrased differently: one Groq call, then the prompt cache
+    for prompt in ("Heavy gym session", "heavy  gym session!"):
+        genre = engine._genre_from_prompt_via_groq(prompt)
+        if genre:
+            engine.find_artists_by_genre(genre)
+
+
+SCENARIOS = {
+    'track_info_cold': _scenario_track_cold,
+    'track_info_warm': _scenario_track_warm,
+    'recommendations': _scenario_recommendations,
+    'recommendations_fanout3': _scenario_recommendations_fanout,
+    'track_then_recommendations': _scenario_track_then_recommendations,
+    'recommendations_after_expiry': _scenario_recommendations_after_expiry,
+    'prompt_recommendations': _scenario_prompt_recommendations,
+    'repeated_prompt': _scenario_repeated_prompt,
+}
+
+
+def spotify_key(method, args, kwargs):
+    if method == 'search':
+        return f"search:{kwargs.get('q', args[0] if args else '').lower()}"
+    if method == 'audio_features':
+        ids = args[0] if args else kwargs.get('tracks')
+        return f"audio_features:{','.join(ids if isinstance(ids, list) else [ids])}"
+    return f"{method}:{args[0]}"
+
+
+def groq_key(messages):
+    """The user's request line, so catalogue edits don't invalidate fixtures."""
+    from genre_prompt import normalize_prompt
+
+    content = messages[-1]["content"].rstrip()
+    return normalize_prompt(content.rsplit('Request: ', 1)[-1] if 'Request: ' in content else content)
+
+
+class FixtureSpotify:
+    """Spotify client that replays (or records through ``real``) payloads keyed per call."""
+
+    METHODS = ('track', 'artist', 'search', 'audio_features')
+
+    def __init__(self, fixtures, real=None):
+        self.fixtures = fixtures
+        self.real = real
+        self.calls = Counter()
+        self.misses = []
+        self._lock = threading.Lock()
+
+    def __getattr__(self, method):
+        if method not in self.METHODS:
+            raise AttributeError(method)
+
+        def call(*args, **kwargs):
+            key = spotify_key(method, args, kwargs)
+            with self._lock:
+                self.calls[f"spotify.{method}"] += 1
+            if self.real is not None:
+                payload = getattr(self.real, method)(*args, **kwargs)
+                self.fixtures[key] = payload
+                return payload
+            if key not in self.fixtures:
+                self.misses.append(key)
+                raise LookupError(f"no recorded Spotify response for {key}")
+            return json.loads(json.dumps(self.fixtures[key]))  # fresh objects, like a real response
+
+        return call
+
+
+class FixtureGroq:
+    """Groq client replaying recorded answers, stored as genre names rather than codes."""
+
+    def __init__(self, fixtures, real=None, catalogue=None):
+        self.fixtures = fixtures
+        self.real = real
+        self.catalogue = catalogue
+        self.calls = Counter()
+        self.misses = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.models = SimpleNamespace(list=lambda: [])
+
+    def _create(self, messages, **kwargs):
+        key = groq_key(messages)
+        with self._lock:
+            self.calls["groq.chat"] += 1
+        if self.real is not None:
+            completion = self.real.chat.completions.create(messages=messages, **kwargs)
+            answer = self.catalogue.parse(completion.choices[0].message.content)
+            self.fixtures[key] = answer or '0'
+        elif key not in self.fixtures:
+            self.misses.append(key)
+            raise LookupError(f"no recorded Groq answer for {key!r}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.fixtures[key]))])
+
+
+def load_fixtures():
+    fixtures = {}
+    for name in ('spotify', 'groq'):
+        with open(os.path.join(FIXTURES_DIR, f'{name}.json')) as f:
+            fixtures[name] = json.load(f)
+    return fixtures
+
+
+def build_engine(fixtures, record=False):
+    from song_recommendations import SongRecommendationsEngine
+
+    engine = SongRecommendationsEngine()
+    if record:
+        engine.spotify_client = FixtureSpotify(fixtures['spotify'], real=engine.spotify_client)
+        engine.groq_client = FixtureGroq(fixtures['groq'], real=engine.groq_client, catalogue=engine.genre_catalogue)
+    else:
+        engine.spotify_client = FixtureSpotify(fixtures['spotify'])
+        engine.groq_client = FixtureGroq(fixtures['groq'])
+    return engine
+
+
+def settle_background_threads(engine):
+    """Wait for abandoned fan-out searches so their allocations land in this scenario."""
+    engine.fanout_executor.shutdown(wait=True)
+
+
+def time_once(scenario, fixtures):
+    engine = build_engine(fixtures)
+    gc.collect()
+    gc.disable()  # a collection landing in one sample is noise, not a regression
+    try:
+        start = time.process_time()
+        scenario(engine)
+        settle_background_threads(engine)
+        return (time.process_time() - start) * 1000
+    finally:
+        gc.enable()
+
+
+def peak_once(scenario, fixtures):
+    engine = build_engine(fixtures)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        scenario(engine)
+        settle_background_threads(engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(scenarios, fixtures, repeats):
+    """Time every scenario ``repeats`` times, round-robin, and keep the fastest run.
+
+    Noise on a shared machine comes in bursts that only ever add time. Taking
+    one sample of each scenario per round spreads a scenario's samples over the
+    whole run, so a burst can't slow all of them, and the minimum is the most
+    repeatable estimate.
+    """
+    results = {}
+    for name, scenario in scenarios.items():
+        # An untimed first run takes lazy imports and first-call caches out of the samples
+        engine = build_engine(fixtures)
+        scenario(engine)
+        settle_background_threads(engine)
+        results[name] = {
+            "cpu_ms": float('inf'),
+            "peak_alloc_kib": float('inf'),
+            "upstream_calls": dict(sorted((engine.spotify_client.calls + engine.groq_client.calls).items())),
+            "fixture_misses": sorted(set(engine.spotify_client.misses + engine.groq_client.misses)),
+        }
+
+    for _ in range(repeats):
+        for name, scenario in scenarios.items():
+            results[name]["cpu_ms"] = min(results[name]["cpu_ms"], time_once(scenario, fixtures))
+    # Thread scheduling moves the peak around in fan-out scenarios; keep the lowest
+    for _ in range(5):
+        for name, scenario in scenarios.items():
+            results[name]["peak_alloc_kib"] = min(results[name]["peak_alloc_kib"], peak_once(scenario, fixtures))
+
+    for result in results.values():
+        result["cpu_ms"] = round(result["cpu_ms"], 3)
+        result["peak_alloc_kib"] = round(result["peak_alloc_kib"] / 1024, 1)
+    return results
+
+
+def compare(current, baseline, cpu_tolerance, alloc_tolerance, cpu_floor_ms, alloc_floor_kib):
+    problems = []
+    for name, result in current.items():
+        if result["fixture_misses"]:
+            problems.append(f"{name}: unrecorded upstream requests {result['fixture_misses']}")
+        base = baseline.get(name)
+        if base is None:
+            problems.append(f"{name}: no baseline (run with --update-baseline)")
+            continue
+        for endpoint, count in result["upstream_calls"].items():
+            if count > base["upstream_calls"].get(endpoint, 0):
+                problems.append(f"{name}: {endpoint} calls {base['upstream_calls'].get(endpoint, 0)} -> {count}")
+        cpu, base_cpu = result["cpu_ms"], base["cpu_ms"]
+        if cpu > base_cpu * (1 + cpu_tolerance) and cpu - base_cpu > cpu_floor_ms:
+            problems.append(f"{name}: cpu {base_cpu}ms -> {cpu}ms")
+        alloc, base_alloc = result["peak_alloc_kib"], base["peak_alloc_kib"]
+        if alloc > base_alloc * (1 + alloc_tolerance) and alloc - base_alloc > alloc_floor_kib:
+            problems.append(f"{name}: peak allocations {base_alloc}KiB -> {alloc}KiB")
+    return problems
+
+
+def record(fixtures):
+    for name, scenario in SCENARIOS.items():
+        engine = build_engine(fixtures, record=True)
+        scenario(engine)
+        print(f"recorded {name}: {dict(engine.spotify_client.calls + engine.groq_client.calls)}", file=sys.stderr)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for kind in ('spotify', 'groq'):
+        with open(os.path.join(FIXTURES_DIR, f'{kind}.json'), 'w') as f:
+            json.dump(dict(sorted(fixtures[kind].items())), f, indent=1)
+            f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--record', action='store_true', help='record fixtures from the real APIs')
+    parser.add_argument('--update-baseline', action='store_true', help='write the current results as the baseline')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='run only these scenarios')
+    parser.add_argument('--repeats', type=int, default=15, help='timed runs per scenario (the fastest is kept)')
+    parser.add_argument('--cpu-tolerance', type=float, default=1.0, help='allowed relative CPU increase')
+    parser.add_argument('--alloc-tolerance', type=float, default=0.15, help='allowed relative allocation increase')
+    parser.add_argument('--cpu-floor-ms', type=float, default=2.0, help='ignore CPU increases smaller than this')
+    parser.add_argument('--alloc-floor-kib', type=float, default=32.0, help='ignore allocation increases smaller than this')
+    parser.add_argument('--output', help='also write the results JSON here')
+    args = parser.parse_args()
+
+    # Set and dict layouts follow the hash seed, which moves allocation peaks between runs
+    if os.environ.get('PYTHONHASHSEED') != '0':
+        os.environ['PYTHONHASHSEED'] = '0'
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    # Background threads and batching would make call counts and timings nondeterministic
+    os.environ['HEALTH_PROBE_INTERVAL_S'] = '0'
+    os.environ['GROQ_BATCH_WINDOW_MS'] = '0'
+    os.environ['SPOTIFY_TOKEN_CACHE'] = 'memory'
+    os.environ['RECOMMENDATION_PREFETCH_WORKERS'] = '0'
+    os.environ['CACHE_WARM_INTERVAL_S'] = '0'
+    os.environ['CATALOG_SNAPSHOT_PATH'] = ''  # measure the upstream paths, not a local catalog
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.record:
+        record({'spotify': {}, 'groq': {}})
+        return
+
+    # Replay never talks to the real APIs, even when credentials are configured
+    for var in ('SPOTIFY_CLIENT_ID', 'SPOTIFY_CLIENT_SECRET', 'GROQ_API_KEY'):
+        os.environ[var] = ''
+    logging.disable(logging.CRITICAL)
+
+    fixtures = load_fixtures()
+    names = args.scenario or list(SCENARIOS)
+    current = measure({name: SCENARIOS[name] for name in names}, fixtures, args.repeats)
+
+    for name, result in current.items():
+        calls = ', '.join(f"{k}={v}" for k, v in result["upstream_calls"].items()) or 'none'
+        print(f"{name:<26} cpu={result['cpu_ms']:>8}ms peak={result['peak_alloc_kib']:>8}KiB calls: {calls}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+
+    if args.update_baseline:
+        missing = {name: r["fixture_misses"] for name, r in current.items() if r["fixture_misses"]}
+        if missing:
+            print(f"Not updating the baseline; unrecorded upstream requests: {missing}")
+            sys.exit(1)
+        baseline = {}
+        if os.path.exists(BASELINE_PATH) and args.scenario:
+            with open(BASELINE_PATH) as f:
+                baseline = json.load(f)["scenarios"]
+        for result in current.values():
+            result.pop("fixture_misses")
+        baseline.update(current)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({"python": sys.version.split()[0], "scenarios": dict(sorted(baseline.items()))}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {os.path.relpath(BASELINE_PATH, ROOT_DIR)}")
+        return
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)["scenarios"]
+    problems = compare(current, baseline, args.cpu_tolerance, args.alloc_tolerance,
+                       args.cpu_floor_ms, args.alloc_floor_kib)
+    if problems:
+        print("\nPerformance regressions:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == '__main__':
+    main()